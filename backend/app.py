@@ -1,34 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify
 from flask_cors import CORS
-from dotenv import load_dotenv
+from werkzeug.exceptions import UnsupportedMediaType
+from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
+import math
 from datetime import datetime
+from functools import wraps
 import os
 
-# Load environment variables
-load_dotenv()
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configure CORS
-cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
-CORS(app, origins=cors_origins, supports_credentials=True)
+from config import config
+from utils.compression import CompressionMiddleware
+from utils.json_provider import FastJSONProvider
+from routes.auth import auth_bp
+from routes.livekit_routes import livekit_bp
+from utils.auth import require_auth, user_roles, get_shared_supabase_client, supabase_unavailable
+from utils import deadline
+from utils.cache import cache_stats, get_cache
+from utils.circuit_breaker import CircuitOpenError, circuit_snapshots, get_circuit_breaker
+from utils.health import get_health_probe
+from utils.hedging import get_hedger
+from utils.livekit_service import get_livekit_service
+from utils.memory import get_memory_profiler, memory_summary, top_types
+from utils.room_analytics import get_room_analytics
+from utils.room_pool import get_room_pool
+from utils.profiler import ProfilerBusyError, format_collapsed, sample_stacks
+from utils.single_flight import get_single_flight
+from utils.uploads import BoundedRequest
+from routes.assemblyai_stt import assemblyai_stt_bp, load_stt_sdk
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Import and register blueprints
-from routes.auth import auth_bp
-from routes.livekit_routes import livekit_bp
-from utils.auth import require_auth, create_supabase_client
-from routes.assemblyai_stt import assemblyai_stt_bp
+# Health, profile and debug routes served from the application root
+core_bp = Blueprint('core', __name__)
 
-@app.route('/health', methods=['GET'])
+@core_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
@@ -36,10 +41,37 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat(),
         'service': 'AITutor Backend API',
         'version': '1.0.0',
-        'features': ['auth', 'profile', 'livekit']
+        'features': ['auth', 'profile', 'livekit'],
+        'upstreams': circuit_snapshots(),
+        'caches': cache_stats(),
+        'hedging': get_hedger().snapshot(),
+        'memory': memory_summary()
     })
 
-@app.route('/profile', methods=['GET'])
+@core_bp.route('/livez', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process is serving requests, no upstream I/O"""
+    return jsonify({'status': 'alive'}), 200
+
+@core_bp.route('/readyz', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: upstream reachability from the background health probe,
+    refreshed every HEALTH_PROBE_INTERVAL seconds
+    """
+    checks = get_health_probe().snapshot()
+    groups = {}
+    for name, check in checks.items():
+        groups.setdefault(name.split(':', 1)[0], []).append(check['ok'])
+    # A sharded upstream ('livekit:<url>' checks) is usable while any shard is
+    ready = all(any(results) for results in groups.values())
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'checks': checks,
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200 if ready else 503
+
+@core_bp.route('/profile', methods=['GET'])
 @require_auth
 def get_profile():
     """Get user profile"""
@@ -61,16 +93,30 @@ def get_profile():
         
         logger.info(f"Looking up profile for user ID: {user_id}")
         
+        # Profile updates in any worker invalidate every worker's copy
+        profile_cache = get_cache('profiles')
+        cached_profile = profile_cache.get(user_id)
+        if cached_profile is not None:
+            return jsonify({'profile': cached_profile}), 200
+        
         # Get user profile from database
-        supabase = create_supabase_client()
+        supabase = get_shared_supabase_client()
         
         # First, check if profiles table exists and has data
         try:
-            profile_response = supabase.table('profiles').select('*').eq('id', user_id).execute()
+            # Concurrent reloads for the same user share one query
+            profile_response = get_single_flight().do(
+                ('profile', user_id),
+                get_hedger().call,
+                'supabase/profiles',
+                get_circuit_breaker('supabase').call,
+                supabase.table('profiles').select('*').eq('id', user_id).execute
+            )
             logger.info(f"Profile query response: {profile_response}")
             
             if profile_response.data and len(profile_response.data) > 0:
                 profile = profile_response.data[0]
+                profile_cache.set(user_id, profile)
                 return jsonify({'profile': profile}), 200
             else:
                 # If no profile exists, create a basic one from auth user data
@@ -91,8 +137,11 @@ def get_profile():
                 
                 # Try to create profile
                 try:
-                    create_response = supabase.table('profiles').insert(basic_profile).execute()
+                    create_response = get_circuit_breaker('supabase').call(
+                        supabase.table('profiles').insert(basic_profile).execute
+                    )
                     if create_response.data:
+                        profile_cache.set(user_id, create_response.data[0])
                         return jsonify({'profile': create_response.data[0]}), 200
                 except Exception as create_error:
                     logger.error(f"Failed to create profile: {create_error}")
@@ -101,6 +150,14 @@ def get_profile():
                 
         except Exception as query_error:
             logger.error(f"Database query error: {query_error}")
+            # Serve the last profile read for this user, even if expired
+            cached_profile = profile_cache.get(user_id, allow_stale=True)
+            if cached_profile is not None:
+                return jsonify({
+                    'profile': cached_profile,
+                    'note': 'Cached profile data (database unavailable)'
+                }), 200
+            
             # Return user data from auth as fallback
             email = getattr(user, 'email', None) or (user.get('email') if isinstance(user, dict) else None)
             user_metadata = getattr(user, 'user_metadata', {}) or (user.get('user_metadata', {}) if isinstance(user, dict) else {})
@@ -120,7 +177,7 @@ def get_profile():
         logger.error(f"Get profile error: {str(e)}")
         return jsonify({'error': 'Failed to retrieve profile'}), 500
 
-@app.route('/profile', methods=['PUT'])
+@core_bp.route('/profile', methods=['PUT'])
 @require_auth
 def update_profile():
     """Update user profile"""
@@ -161,15 +218,17 @@ def update_profile():
         logger.info(f"Updating profile for user {user_id} with data: {update_data}")
         
         # Update profile in database
-        supabase = create_supabase_client()
+        supabase = get_shared_supabase_client()
+        
+        breaker = get_circuit_breaker('supabase')
         
         try:
             # First check if profile exists
-            existing = supabase.table('profiles').select('id').eq('id', user_id).execute()
+            existing = breaker.call(supabase.table('profiles').select('id').eq('id', user_id).execute)
             
             if existing.data and len(existing.data) > 0:
                 # Update existing profile
-                response = supabase.table('profiles').update(update_data).eq('id', user_id).execute()
+                response = breaker.call(supabase.table('profiles').update(update_data).eq('id', user_id).execute)
             else:
                 # Create new profile with update data
                 email = getattr(user, 'email', None) or (user.get('email') if isinstance(user, dict) else None)
@@ -179,9 +238,10 @@ def update_profile():
                     'created_at': datetime.utcnow().isoformat(),
                     **update_data
                 }
-                response = supabase.table('profiles').insert(create_data).execute()
+                response = breaker.call(supabase.table('profiles').insert(create_data).execute)
             
             if response.data and len(response.data) > 0:
+                get_cache('profiles').set(user_id, response.data[0])
                 return jsonify({
                     'message': 'Profile updated successfully',
                     'profile': response.data[0]
@@ -190,6 +250,8 @@ def update_profile():
                 logger.error(f"Update response has no data: {response}")
                 return jsonify({'error': 'Failed to update profile - no data returned'}), 500
                 
+        except CircuitOpenError as e:
+            return supabase_unavailable(e, 'Profile service temporarily unavailable')
         except Exception as db_error:
             logger.error(f"Database operation failed: {db_error}")
             return jsonify({'error': f'Database operation failed: {str(db_error)}'}), 500
@@ -200,7 +262,7 @@ def update_profile():
 
 
 # ADDITIONAL DEBUGGING ENDPOINT:
-@app.route('/debug/user', methods=['GET'])
+@core_bp.route('/debug/user', methods=['GET'])
 @require_auth
 def debug_user():
     """Debug endpoint to see user structure"""
@@ -215,34 +277,231 @@ def debug_user():
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def enabled_by(flag):
+    """Hide a profiling endpoint entirely unless its config flag is set"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config[flag]:
+                return jsonify({'error': 'Endpoint not found'}), 404
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+@core_bp.route('/debug/cpu-profile', methods=['GET'])
+@enabled_by('PROFILER_ENABLED')
+@require_auth
+def cpu_profile():
+    """
+    Sample the stacks of this worker's other threads and return collapsed
+    stacks (text/plain) for flamegraph.pl or speedscope.
+    
+    Query parameters:
+        seconds: sampling duration (default 10, capped at PROFILER_MAX_SECONDS)
+        interval: seconds between samples (default 0.01, at most seconds)
+        idle: include threads blocked in I/O or on locks ('true'/'false')
+    """
+    user = request.current_user
+    if current_app.config['PROFILER_ROLE'] not in user_roles(user):
+        return jsonify({'error': 'Insufficient permissions'}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval', 0.01))
+    except ValueError:
+        return jsonify({'error': 'seconds and interval must be numbers'}), 400
+    if not (math.isfinite(seconds) and math.isfinite(interval)) or seconds <= 0 or interval <= 0:
+        return jsonify({'error': 'seconds and interval must be positive numbers'}), 400
+    seconds = min(seconds, current_app.config['PROFILER_MAX_SECONDS'])
+    # A long interval would park this thread, and hold the profiler lock, past seconds
+    interval = min(max(interval, 0.001), seconds)
+    
+    try:
+        stacks = sample_stacks(seconds, interval, include_idle=request.args.get('idle', 'false').lower() == 'true')
+    except ProfilerBusyError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    user_id = user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+    logger.warning(f"CPU profile of {seconds}s taken by user {user_id}")
+    return Response(format_collapsed(stacks), mimetype='text/plain')
+
+@core_bp.route('/debug/memory', methods=['GET'])
+@enabled_by('MEMORY_PROFILER_ENABLED')
+@require_auth
+def memory_profile():
+    """
+    This worker's memory report: RSS and traced totals, the source lines
+    that held the most in recent tracing windows (or, tracing continuously,
+    grew most since the first snapshot and between recent ones), retained
+    allocations per route and gc statistics.
+    
+    Query parameters:
+        snapshot: take a snapshot now, or open the next tracing window early
+            when none is open ('true'/'false')
+        objects: also count live objects by type; walks the whole heap ('true'/'false')
+    """
+    if current_app.config['PROFILER_ROLE'] not in user_roles(request.current_user):
+        return jsonify({'error': 'Insufficient permissions'}), 403
+    
+    profiler = get_memory_profiler()
+    if request.args.get('snapshot', 'false').lower() == 'true':
+        profiler.take_snapshot()
+    report = profiler.report()
+    if request.args.get('objects', 'false').lower() == 'true':
+        report['objects'] = [{'type': name, 'count': count} for name, count in top_types(profiler.top_n)]
+    return jsonify(report)
         
-@app.errorhandler(404)
+@core_bp.app_errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
     return jsonify({'error': 'Endpoint not found'}), 404
 
-@app.errorhandler(500)
+@core_bp.app_errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
     logger.error(f"Internal server error: {error}")
     return jsonify({'error': 'Internal server error'}), 500
 
-@app.before_request
+@core_bp.before_app_request
 def log_request_info():
     """Log request information"""
     logger.info(f"{request.method} {request.url} - {request.remote_addr}")
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(livekit_bp, url_prefix='/livekit')
-app.register_blueprint(assemblyai_stt_bp, url_prefix='/assemblyai_stt')
+@core_bp.before_app_request
+def start_request_deadline():
+    """Start the request's time budget, before require_auth spends any of it"""
+    config = current_app.config
+    deadline.start(config['REQUEST_DEADLINES'].get(request.endpoint, config['REQUEST_DEADLINE']))
 
+@core_bp.teardown_app_request
+def clear_request_deadline(error):
+    deadline.clear()
 
-if __name__ == '__main__':
-    # Get configuration from environment or use defaults
-    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-    host = os.getenv('FLASK_HOST', '0.0.0.0')
-    port = int(os.getenv('FLASK_PORT', 5000))
+@core_bp.before_app_request
+def sample_request_memory():
+    """Note traced memory at the start of a sampled request (MEMORY_SAMPLE_RATE)"""
+    profiler = get_memory_profiler()
+    if profiler is not None:
+        request.memory_sample = profiler.begin_request()
+
+@core_bp.teardown_app_request
+def record_request_memory(error):
+    started = getattr(request, 'memory_sample', None)
+    if started is not None:
+        get_memory_profiler().end_request(request.endpoint, started)
+
+@core_bp.before_app_request
+def read_request_body():
+    """
+    Read JSON bodies here, within the endpoint's size limit. Routes catch
+    Exception around get_json, which would turn a 413 raised there into a
+    500. Views marked with accepts_upload only take multipart bodies, which
+    they parse as they stream; anything else is rejected unread.
+    """
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'upload_class', None) is not None and request.mimetype != 'multipart/form-data':
+        raise UnsupportedMediaType('Uploads must be sent as multipart/form-data')
+    if not request.is_json:
+        return
+    data = request.get_data(cache=True)
+    limit = request.max_content_length
+    if request.content_length is None and limit is not None and len(data) >= limit:
+        # Werkzeug stops reading a chunked body at the limit without an
+        # error; reading past it raises 413 instead of parsing a truncated body
+        request.stream.read(1)
+
+@core_bp.app_errorhandler(413)
+def body_too_large(error):
+    """Bodies over MAX_CONTENT_LENGTH or the endpoint's BODY_LIMITS entry"""
+    logger.warning(f"Body too large: {request.method} {request.path} ({request.content_length} bytes)")
+    return jsonify({'error': 'Request body too large', 'maxBytes': request.max_content_length}), 413
+
+@core_bp.app_errorhandler(415)
+def unsupported_upload(error):
+    """Uploads rejected by their header"""
+    return jsonify({'error': error.description}), 415
+
+@core_bp.app_errorhandler(deadline.DeadlineExceeded)
+def deadline_exceeded(error):
+    """Upstream calls that did not fit in what was left of the request's budget"""
+    logger.warning(f"Deadline exceeded: {request.method} {request.path}")
+    return jsonify({'error': 'Request deadline exceeded'}), 504
+
+def create_app(config_name=None):
+    """
+    Application factory: build a Flask app from the named config
+    ('development', 'production', 'testing'; FLASK_CONFIG by default)
+    """
+    config_name = config_name or os.getenv('FLASK_CONFIG', 'default')
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    
+    # Configure logging
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # Use orjson for request parsing and jsonify when installed
+    app.json = FastJSONProvider(app)
+    
+    # Per-endpoint body limits and header-checked upload containers
+    app.request_class = BoundedRequest
+    
+    # Configure CORS
+    CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
     
-    logger.info(f"Starting Flask app on {host}:{port} (debug={debug_mode})")
-    app.run(debug=debug_mode, host=host, port=port)
\ No newline at end of file
+    # Configure response compression (gzip/brotli via Accept-Encoding)
+    if app.config['COMPRESSION_ENABLED']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            level=app.config['COMPRESSION_LEVEL'],
+            brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY']
+        )
+    
+    # Take the client address and scheme from trusted proxies' X-Forwarded-* headers
+    if app.config['TRUSTED_PROXIES']:
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+    
+    # Register blueprints
+    app.register_blueprint(core_bp)
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(livekit_bp, url_prefix='/livekit')
+    app.register_blueprint(assemblyai_stt_bp, url_prefix='/assemblyai_stt')
+    
+    return app
+
+
+def warm_up(app):
+    """
+    Create shared clients and import heavy SDKs ahead of the first request.
+    Called per worker after fork (see gunicorn.conf.py); failures are logged
+    rather than raised so a missing credential only affects its own routes.
+    """
+    steps = [
+        ('Supabase client', get_shared_supabase_client),
+        ('LiveKit service', get_livekit_service),
+        ('health probe', get_health_probe),
+        ('room pool', get_room_pool),
+        ('memory profiler', get_memory_profiler),
+        ('room analytics', get_room_analytics)
+    ]
+    if app.config['WARM_UP_STT']:
+        steps.append(('STT SDK', lambda app: load_stt_sdk()))
+    
+    for name, step in steps:
+        try:
+            step(app)
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {e}")
+
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    logger.info(f"Starting Flask app on {app.config['HOST']}:{app.config['PORT']} (debug={app.debug})")
+    app.run(debug=app.debug, host=app.config['HOST'], port=app.config['PORT'])
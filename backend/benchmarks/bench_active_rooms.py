@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+/livekit/active-rooms query cost vs. fleet size: full scan vs. RoomIndex pages.
+
+The "scan" column decodes and formats every room per request (the previous
+behaviour); "index" serves a filtered page from a prebuilt RoomIndex and
+formats only the rooms on that page.
+
+Usage:
+    python benchmarks/bench_active_rooms.py --rooms 1000 10000 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import SUBJECTS, TUTOR_TYPES, format_room, make_rooms
+from utils.room_index import RoomIndex
+from utils.room_metadata import RoomMetadataCache
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+    return pick(50), pick(99)
+
+
+def scan(rooms, filters, limit):
+    formatted = [format_room(room) for room in rooms]
+    matches = [room for room in formatted if all(room.get(k) == v for k, v in filters.items())]
+    return matches[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'rooms':>7} {'scan p50':>10} {'scan p99':>10} {'index p50':>10} {'index p99':>10} {'build ms':>9} {'rebuild ms':>10}")
+    for count in args.rooms:
+        rooms = make_rooms(count)
+        cache = RoomMetadataCache()
+        index = RoomIndex(cache)
+
+        start = time.perf_counter()
+        index.update(rooms)
+        build = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        index.update(rooms)  # unchanged rooms skip metadata decoding
+        rebuild = (time.perf_counter() - start) * 1000
+
+        queries = []
+        for _ in range(args.requests):
+            filters = {}
+            if rng.random() < 0.7:
+                filters['subject'] = rng.choice(SUBJECTS)
+            if rng.random() < 0.5:
+                filters['tutorType'] = rng.choice(TUTOR_TYPES)
+            queries.append(filters)
+
+        scan_samples = []
+        for filters in queries[:max(10, args.requests // 10)]:
+            start = time.perf_counter()
+            scan(rooms, filters, args.limit)
+            scan_samples.append(time.perf_counter() - start)
+
+        index_samples = []
+        for filters in queries:
+            after = None
+            for _ in range(3):  # first three pages
+                start = time.perf_counter()
+                page, after, _ = index.query(filters, limit=args.limit, after=after)
+                [cache.format_room(room) for room in page]
+                index_samples.append(time.perf_counter() - start)
+                if after is None:
+                    break
+
+        scan_p50, scan_p99 = percentiles(scan_samples)
+        index_p50, index_p99 = percentiles(index_samples)
+        print(f"{count:>7} {scan_p50:>9.2f}ms {scan_p99:>9.2f}ms {index_p50:>9.3f}ms {index_p99:>9.3f}ms "
+              f"{build:>9.1f} {rebuild:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Request body limits and upload header checks under abusive uploads.
+
+Sends --concurrency simultaneous requests of each kind straight to the WSGI
+app, first with the limits disabled (no MAX_CONTENT_LENGTH, uploads stored
+unchecked) and then with the defaults:
+  - an oversized JSON body to /auth/signin
+  - a non-audio file to /assemblyai_stt/transcribe
+  - a raw application/octet-stream body to /assemblyai_stt/transcribe
+  - a chunked JSON body with no Content-Length
+Reports status codes, how many body bytes the app read and the peak Python
+heap (tracemalloc) during the run.
+
+Usage:
+    python benchmarks/bench_body_limits.py --size-mb 20 --concurrency 16
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'False')
+
+from werkzeug.test import EnvironBuilder
+
+from app import create_app
+
+
+class CountingInput(io.BytesIO):
+    """wsgi.input that counts the bytes the app reads"""
+
+    def __init__(self, data, counter):
+        super().__init__(data)
+        self.counter = counter
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.counter.append(len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        self.counter.append(count)
+        return count
+
+    def readline(self, size=-1):
+        data = super().readline(size)
+        self.counter.append(len(data))
+        return data
+
+
+def requests(size):
+    junk = b'%PDF-1.7\n' + os.urandom(size)
+    big_json = json.dumps({'email': 'a' * size, 'password': 'x'}).encode()
+    return {
+        'json': EnvironBuilder(path='/auth/signin', method='POST', data=big_json,
+                               content_type='application/json').get_environ(),
+        'upload': EnvironBuilder(path='/assemblyai_stt/transcribe', method='POST',
+                                 data={'file': (io.BytesIO(junk), 'notes.pdf')}).get_environ(),
+        'raw': EnvironBuilder(path='/assemblyai_stt/transcribe', method='POST', data=junk,
+                              content_type='application/octet-stream').get_environ(),
+        'chunked': dict(EnvironBuilder(path='/auth/signin', method='POST', data=big_json,
+                                       content_type='application/json').get_environ(),
+                        CONTENT_LENGTH='', HTTP_TRANSFER_ENCODING='chunked', **{'wsgi.input_terminated': True}),
+    }
+
+
+def run(app, environ, body, concurrency):
+    counter, statuses = [], Counter()
+
+    def one():
+        env = dict(environ, **{'wsgi.input': CountingInput(body, counter)})
+        status = []
+        for _ in app(env, lambda s, h, e=None: status.append(s)):
+            pass
+        statuses[status[0].split()[0]] += 1
+
+    threads = [threading.Thread(target=one) for _ in range(concurrency)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statuses, sum(counter), len(body) * concurrency, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    environs = {name: (environ, environ['wsgi.input'].read())
+                for name, environ in requests(int(args.size_mb * 1024 * 1024)).items()}
+    print(f"{'limits':>6} {'request':>8} {'statuses':>16} {'read MB':>8} {'sent MB':>8} {'peak heap MB':>12} {'s':>6}")
+    for label in ('off', 'on'):
+        app = create_app('production')
+        if label == 'off':
+            app.config['MAX_CONTENT_LENGTH'] = None
+            app.config['BODY_LIMITS'] = {}
+            # A plain wrapper hides the view's upload_class from BoundedRequest
+            view = app.view_functions['assemblyai_stt.transcribe_audio']
+            app.view_functions['assemblyai_stt.transcribe_audio'] = lambda *a, **kw: view(*a, **kw)
+        logging.disable(logging.CRITICAL)
+        for name, (environ, body) in environs.items():
+            statuses, read, sent, peak, elapsed = run(app, environ, body, args.concurrency)
+            codes = ','.join(f'{code}x{count}' for code, count in sorted(statuses.items()))
+            print(f"{label:>6} {name:>8} {codes:>16} {read / 2**20:>8.1f} {sent / 2**20:>8.1f} "
+                  f"{peak / 2**20:>12.1f} {elapsed:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compression benchmark: CPU cost vs. bytes saved on /livekit/active-rooms payloads.
+
+Usage:
+    python benchmarks/bench_compression.py --rooms 100 1000 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import active_rooms_response
+from utils.compression import CompressionMiddleware, brotli
+
+
+def time_call(fn, repeat):
+    """Return the best-of-N wall time for fn() in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def codecs():
+    """Yield (label, compress_fn) pairs for every codec/level under test"""
+    for level in (1, 6, 9):
+        yield f"gzip-{level}", lambda data, level=level: zlib.compress(data, level)
+    if brotli is not None:
+        for quality in (1, 4, 11):
+            yield f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)
+
+
+def bench_codecs(body, repeat):
+    print(f"{'codec':<10} {'bytes':>10} {'ratio':>7} {'ms':>9} {'MB/s':>9}")
+    for label, fn in codecs():
+        compressed = fn(body)
+        elapsed = time_call(lambda: fn(body), repeat)
+        print(f"{label:<10} {len(compressed):>10} {len(body) / len(compressed):>7.1f} "
+              f"{elapsed * 1000:>9.2f} {len(body) / elapsed / 1e6:>9.1f}")
+
+
+def bench_streaming(body, repeat, chunk_size=16 * 1024):
+    """Measure the middleware's incremental path with a chunked body"""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return iter(chunks)
+
+    for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+        middleware = CompressionMiddleware(app)
+        environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': encoding}
+
+        def run():
+            return b''.join(middleware(environ, lambda status, headers, exc_info=None: None))
+
+        size = len(run())
+        elapsed = time_call(run, repeat)
+        print(f"stream-{encoding:<4} {size:>10} {len(body) / size:>7.1f} "
+              f"{elapsed * 1000:>9.2f} {len(body) / elapsed / 1e6:>9.1f}  ({len(chunks)} chunks)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli not installed: only gzip is measured\n")
+
+    for count in args.rooms:
+        body = json.dumps(active_rooms_response(count)).encode('utf-8')
+        print(f"== {count} rooms, {len(body)} bytes uncompressed ==")
+        bench_codecs(body, args.repeat)
+        bench_streaming(body, args.repeat)
+        print()
+
+
+if __name__ == '__main__':
+    main()
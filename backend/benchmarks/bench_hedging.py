@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Hedged reads and request deadlines against a LiveKit fake with a slow tail.
+
+A fraction (--slow-ratio) of the fake's requests take --slow-ms instead of
+--latency-ms. Room info lookups are made from --threads threads, first
+without hedging and then with it, reporting latency percentiles and how
+many extra requests hedging sent.
+
+Then makes one ListRooms call against a fake that always answers slowly,
+with and without a request deadline, to show the call giving up once the
+budget is spent instead of waiting for LIVEKIT_TIMEOUT.
+
+Usage:
+    python benchmarks/bench_hedging.py --calls 2000 --slow-ratio 0.03 --slow-ms 250
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeLiveKit
+from utils import deadline
+from utils.hedging import Hedger
+from utils.livekit_service import LiveKitService
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def service(fake, hedger=None, timeout=10):
+    return LiveKitService(api_key='key', api_secret='secret-' + 'x' * 26, server_url=fake.url,
+                          timeout=timeout, hedger=hedger)
+
+
+def run(fake, hedger, args):
+    lk = service(fake, hedger)
+    names = list(fake.rooms)
+
+    def lookup(i):
+        start = time.perf_counter()
+        assert lk.get_room_info(names[i % len(names)])['success']
+        return (time.perf_counter() - start) * 1000
+
+    # Warm up: the hedger needs latency samples before it hedges
+    for i in range(50):
+        lookup(i)
+    before = fake.requests
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(lookup, range(args.calls)))
+    return latencies, fake.requests - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--slow-ratio', type=float, default=0.03)
+    parser.add_argument('--slow-ms', type=float, default=250)
+    parser.add_argument('--budget-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    fake = FakeLiveKit(rooms=50, latency=args.latency_ms / 1000).start()
+    fake.slow_ratio = args.slow_ratio
+    fake.slow_latency = args.slow_ms / 1000
+
+    print(f"{'':>10} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  {'requests':>8}  (ms)")
+    for label, hedger in (('unhedged', None), ('hedged', Hedger())):
+        latencies, requests = run(fake, hedger, args)
+        print(f"{label:>10} " + ' '.join(f"{percentile(latencies, p):>7.1f}" for p in (50, 95, 99, 100))
+              + f"  {requests:>8}")
+        if hedger is not None:
+            print(f"{'':>10} {hedger.snapshot()}")
+    fake.stop()
+
+    slow = FakeLiveKit(rooms=10, latency=2.0).start()
+    lk = service(slow, timeout=10)
+    for label, budget in (('no deadline', 0), (f'{args.budget_ms:.0f} ms budget', args.budget_ms / 1000)):
+        deadline.start(budget)
+        start = time.perf_counter()
+        result = lk.list_active_rooms()
+        elapsed = (time.perf_counter() - start) * 1000
+        deadline.clear()
+        outcome = 'ok' if result['success'] else 'deadline exceeded' if result.get('deadlineExceeded') else result['error']
+        print(f"ListRooms against a 2 s upstream, {label}: {outcome} after {elapsed:.0f} ms")
+    slow.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+JSON serialisation benchmark: Flask's stdlib provider vs. FastJSONProvider.
+
+Measures jsonify-style response encoding and request parsing for payloads
+shaped like the real endpoints (room lists, room info, tokens, profiles).
+
+Usage:
+    python benchmarks/bench_json.py --rooms 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.payloads import active_rooms_response
+from utils.json_provider import FastJSONProvider, orjson
+
+
+def payloads(rooms):
+    listing = active_rooms_response(rooms)
+    return {
+        f"active-rooms ({rooms})": listing,
+        'room-info': {'success': True, 'room': listing['rooms'][0]},
+        'generate-token': {
+            'success': True,
+            'token': 'eyJhbGciOiJIUzI1NiJ9.' + 'x' * 300,
+            'participant': {'name': 'alice', 'role': 'student', 'userId': str(uuid.uuid4())},
+            'room': {'name': 'room-000001', 'serverUrl': 'wss://example.livekit.cloud'},
+            'expiresAt': time.time() + 3600
+        },
+        'profile (datetime)': {
+            'profile': {
+                'id': uuid.uuid4(),
+                'email': 'user@example.com',
+                'full_name': 'Jane Doe',
+                'avatar_url': None,
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow()
+            }
+        }
+    }
+
+
+def best_of(fn, number, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=1000)
+    args = parser.parse_args()
+
+    providers = []
+    for label, cls in (('flask default', DefaultJSONProvider), ('fast/stdlib', FastJSONProvider), ('fast/orjson', FastJSONProvider)):
+        if label == 'fast/orjson' and orjson is None:
+            continue
+        app = Flask(__name__)
+        provider = cls(app)
+        if label == 'fast/stdlib':
+            provider.use_orjson = False
+        providers.append((label, app, provider))
+
+    if orjson is None:
+        print("orjson not installed: only the stdlib paths are measured\n")
+
+    print(f"{'payload':<22} {'provider':<14} {'encode us':>10} {'decode us':>10} {'bytes':>9}")
+    for name, payload in payloads(args.rooms).items():
+        number = 20 if 'active-rooms' in name else 2000
+        for label, app, provider in providers:
+            with app.app_context():
+                body = provider.response(payload).get_data()
+                encode = best_of(lambda: provider.response(payload), number)
+                decode = best_of(lambda: provider.loads(body), number)
+            print(f"{name:<22} {label:<14} {encode:>10.1f} {decode:>10.1f} {len(body):>9}")
+
+
+if __name__ == '__main__':
+    main()
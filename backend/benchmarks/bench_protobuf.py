@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+JSON vs protobuf Twirp transport for large ListRooms responses.
+
+For each room count, encodes a synthetic ListRoomsResponse the way LiveKit
+sends it in each transport and reports body size (raw and gzip) and the
+client-side cost of turning it into the rooms list the routes consume:
+  - json:     json.loads (and orjson.loads when installed)
+  - protobuf: ParseFromString plus message_to_dict, which is what
+              LiveKitService does with LIVEKIT_TRANSPORT=protobuf;
+              json_format.MessageToDict is shown for comparison.
+              message_to_dict skips the fields in OMITTED_FIELDS, so the
+              check compares the fields routes read.
+Then times list_active_rooms end to end against a local fake in both modes.
+
+Needs livekit-protocol (pip install livekit-protocol).
+
+Usage:
+    python benchmarks/bench_protobuf.py --rooms 1000 5000 20000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeLiveKit
+from benchmarks.payloads import make_rooms
+from utils import livekit_protobuf
+from utils.livekit_service import LiveKitService
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# What the routes read from a room
+ROUTE_FIELDS = ('name', 'sid', 'numParticipants', 'maxParticipants', 'creationTime', 'metadata', 'emptyTimeout')
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not livekit_protobuf.available():
+        parser.error('livekit-protocol is not installed')
+    json_format = livekit_protobuf.json_format
+    _, response_type = livekit_protobuf.MESSAGES['ListRooms']
+
+    print(f"{'rooms':>7} {'json KB':>9} {'pb KB':>8} {'json gz':>8} {'pb gz':>7}  "
+          f"{'json.loads':>10} {'orjson':>7} {'pb parse':>9} {'pb->dict':>9} {'MessageToDict':>13}  (ms)")
+    for count in args.rooms:
+        rooms = make_rooms(count)
+        message = json_format.ParseDict({'rooms': rooms}, response_type(), ignore_unknown_fields=True)
+        as_json = json.dumps({'rooms': rooms}, separators=(',', ':')).encode('utf-8')
+        as_protobuf = message.SerializeToString()
+
+        decoded = livekit_protobuf.decode_response('ListRooms', as_protobuf)['rooms']
+        assert [{key: room[key] for key in ROUTE_FIELDS} for room in decoded] == \
+            [{key: room[key] for key in ROUTE_FIELDS} for room in json.loads(as_json)['rooms']]
+
+        def parse_only():
+            response_type().ParseFromString(as_protobuf)
+
+        def message_to_dict():
+            parsed = response_type()
+            parsed.ParseFromString(as_protobuf)
+            json_format.MessageToDict(parsed)
+
+        timings = [
+            best_of(lambda: json.loads(as_json), args.repeat),
+            best_of(lambda: orjson.loads(as_json), args.repeat) if orjson else None,
+            best_of(parse_only, args.repeat),
+            best_of(lambda: livekit_protobuf.decode_response('ListRooms', as_protobuf), args.repeat),
+            best_of(message_to_dict, max(1, args.repeat // 2)),
+        ]
+        print(f"{count:>7} {len(as_json) / 1024:>9.0f} {len(as_protobuf) / 1024:>8.0f} "
+              f"{len(gzip.compress(as_json)) / 1024:>8.0f} {len(gzip.compress(as_protobuf)) / 1024:>7.0f}  "
+              + ' '.join('      n/a' if t is None else f"{t:>{w}.1f}"
+                         for t, w in zip(timings, (10, 7, 9, 9, 13))))
+
+    print('\nlist_active_rooms end to end against FakeLiveKit (the fake caches encoded rooms):')
+    for count in args.rooms:
+        fake = FakeLiveKit(rooms=count, latency=0).start()
+        row = []
+        for transport in ('json', 'protobuf'):
+            service = LiveKitService(api_key='key', api_secret='secret-' + 'x' * 26, server_url=fake.url,
+                                     transport=transport)
+            result = service.list_active_rooms()
+            assert result['success'] and len(result['rooms']) == count
+            row.append(f"{transport} {best_of(service.list_active_rooms, args.repeat):.0f} ms")
+        fake.stop()
+        print(f"{count:>7} rooms: " + ', '.join(row))
+
+
+if __name__ == '__main__':
+    main()
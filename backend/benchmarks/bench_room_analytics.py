@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Room analytics ingestion and rollup cost as traffic grows.
+
+Simulates --days of tutoring sessions straight against RoomAnalytics (no
+HTTP). Each simulated hour, --rooms-per-hour sessions start with a random
+subject (out of --subjects distinct names) and 1-4 participants who join
+and leave, and sessions last 10-90 minutes. Half the updates come in as
+webhook events and half as ListRooms snapshots polled every --poll seconds.
+The run is repeated for each --scale multiplier of rooms per hour.
+
+For each scale it prints the events folded in and their rate, the size of
+the SQLite file, the number of bucket and bucket subject rows, and the
+median time of a 7-day daily rollup and a 30-day hourly rollup. The rows,
+and therefore the rollup time, depend on the time range and not on the
+number of sessions.
+
+Usage:
+    python benchmarks/bench_room_analytics.py --days 30 --rooms-per-hour 50 --scale 1 4 16
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.room_analytics import RoomAnalytics
+
+
+def simulate(analytics, days, rooms_per_hour, subjects, poll, rng, end):
+    """Feed ``days`` of sessions ending at ``end``; returns the number of updates folded in"""
+    begin = end - days * 86400
+    sessions = []
+    for i in range(int(days * 24 * rooms_per_hour)):
+        started = begin + rng.random() * days * 86400
+        metadata = json.dumps({'subject': f"Subject {rng.randrange(subjects)}", 'sessionType': 'tutoring'})
+        sessions.append({
+            'sid': f"RM_{i:08x}", 'name': f"room-{i:08x}", 'metadata': metadata,
+            'started': started, 'ended': min(started + rng.uniform(600, 5400), end),
+            'participants': rng.randint(1, 4), 'webhooks': i % 2 == 0
+        })
+
+    events = []  # (time, kind, session, participants)
+    for session in sessions:
+        if not session['webhooks']:
+            continue
+        events.append((session['started'], 'room_started', session, 0))
+        for n in range(1, session['participants'] + 1):
+            events.append((session['started'] + n * 30, 'participant_joined', session, n))
+        events.append((session['ended'], 'room_finished', session, 0))
+    events.sort(key=lambda event: event[0])
+
+    polled = [s for s in sessions if not s['webhooks']]
+    polled.sort(key=lambda s: s['started'])
+    updates, next_event, now = 0, 0, begin
+    while now <= end:
+        while next_event < len(events) and events[next_event][0] <= now:
+            at, kind, session, count = events[next_event]
+            analytics.record_webhook({
+                'event': kind, 'createdAt': at,
+                'room': {'sid': session['sid'], 'name': session['name'], 'metadata': session['metadata'],
+                         'creationTime': int(session['started']), 'numParticipants': count}
+            })
+            next_event += 1
+            updates += 1
+        live = [
+            {'sid': s['sid'], 'name': s['name'], 'metadata': s['metadata'], 'creationTime': int(s['started']),
+             'numParticipants': min(s['participants'], int((now - s['started']) // 30))}
+            for s in polled if s['started'] <= now < s['ended']
+        ]
+        analytics.observe(live, now)
+        updates += len(live) + 1
+        now += poll
+    return updates, len(sessions)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=float, default=14)
+    parser.add_argument('--rooms-per-hour', type=float, default=20)
+    parser.add_argument('--scale', type=float, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--subjects', type=int, default=200, help='distinct subject names')
+    parser.add_argument('--poll', type=float, default=60, help='seconds between simulated polls')
+    parser.add_argument('--repeat', type=int, default=20, help='rollups timed per query')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    end = time.time()
+    print(f"{'rooms/h':>8} {'sessions':>9} {'updates':>9} {'updates/s':>10} {'db MB':>7} "
+          f"{'buckets':>8} {'subjects':>9} {'7d daily ms':>12} {'30d hourly ms':>14}")
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as directory:
+            analytics = RoomAnalytics(os.path.join(directory, 'analytics.db'), retention_days=max(args.days, 30))
+            rng = random.Random(42)
+            start = time.perf_counter()
+            updates, sessions = simulate(analytics, args.days, args.rooms_per_hour * scale, args.subjects,
+                                         args.poll, rng, end)
+            elapsed = time.perf_counter() - start
+
+            conn = analytics._connect()
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            buckets = conn.execute('SELECT count(*) FROM buckets').fetchone()[0]
+            subjects = conn.execute('SELECT count(*) FROM bucket_subjects').fetchone()[0]
+            size = os.path.getsize(analytics.path)
+            daily = timed(lambda: analytics.rollup(end - 7 * 86400, end, 86400), args.repeat)
+            hourly = timed(lambda: analytics.rollup(end - 30 * 86400, end, 3600), args.repeat)
+            print(f"{args.rooms_per_hour * scale:>8.0f} {sessions:>9} {updates:>9} {updates / elapsed:>10.0f} "
+                  f"{size / 2**20:>7.2f} {buckets:>8} {subjects:>9} {daily * 1000:>12.2f} {hourly * 1000:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark for chat and whiteboard room history.
+
+Generates a busy room: pen strokes as random walks, chat messages between
+them, and a whiteboard clear every so often. Reports:
+  - stroke storage and replay bytes with points as JSON pairs against
+    delta encoding
+  - ingestion throughput with batched writes against one transaction
+    per event
+  - what a late joiner downloads, and how long the read takes: a full
+    replay against the compacted snapshot plus delta
+  - with two writers sharing the file (as two workers do), whether a
+    reader polling with cursors receives every event exactly once
+
+Usage:
+    python benchmarks/bench_room_history.py --events 20000 --clear-every 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.room_history import RoomHistory, parse_event, serialize_event
+
+
+def stroke(rng):
+    x, y = rng.uniform(0, 600), rng.uniform(0, 400)
+    points = []
+    for _ in range(rng.randint(20, 200)):
+        x = min(600, max(0, x + rng.gauss(0, 3)))
+        y = min(400, max(0, y + rng.gauss(0, 3)))
+        points.append([round(x, 2), round(y, 2)])
+    return {'kind': 'whiteboard', 'type': 'stroke', 'tool': 'pen', 'width': 2, 'color': '#ffffff', 'points': points}
+
+
+def room_events(count, clear_every, rng):
+    for i in range(count):
+        if i and i % clear_every == 0:
+            yield {'kind': 'whiteboard', 'type': 'clear'}
+        elif rng.random() < 0.1:
+            yield {'kind': 'chat', 'text': ' '.join(rng.choice(['so', 'the', 'slope', 'is', 'two', 'ok']) for _ in range(8))}
+        else:
+            yield stroke(rng)
+
+
+def payload_bytes(events, encoding, history):
+    return len(json.dumps([serialize_event(event, encoding, history.scale) for event in events]))
+
+
+def two_writers(path, events, rng):
+    """
+    Interleave appends and flushes of two stores on one file while a reader
+    polls with its cursor; returns (events appended, missed, duplicated).
+    Both stores run in this process and can hand out the same event id, so
+    events are told apart by id and user.
+    """
+    writers = [RoomHistory(path), RoomHistory(path)]
+    reader = RoomHistory(path, max_delta=len(events) * 2)
+    cursor, seen = 0, []
+    for i, event in enumerate(events):
+        writers[i % 2].append('shared', f'user-{i % 2}', [event])
+        writer = rng.choice(writers)
+        if rng.random() < 0.2:
+            writer.flush()
+        if rng.random() < 0.3:
+            result = reader.read('shared', after=cursor)
+            seen.extend((e['id'], e['userId']) for e in result['events'])
+            cursor = result['cursor']
+    for writer in writers:
+        writer.flush()
+    seen.extend((e['id'], e['userId']) for e in reader.read('shared', after=cursor)['events'])
+    return len(events), len(events) - len(set(seen)), len(seen) - len(set(seen))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--clear-every', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--unbatched', type=int, default=2000, help='events written one transaction each')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    directory = tempfile.mkdtemp()
+    try:
+        history = RoomHistory(os.path.join(directory, 'history.db'), batch_size=args.batch_size,
+                              max_delta=args.events * 2)
+        raw = list(room_events(args.events, args.clear_every, rng))
+        parsed = [parse_event(event) for event in raw]
+
+        strokes = [(r, p) for r, p in zip(raw, parsed) if p['type'] == 'stroke']
+        json_points = sum(len(json.dumps(r['points'])) for r, _ in strokes)
+        delta_points = sum(len(p['points']) for _, p in strokes)
+        point_count = sum(len(r['points']) for r, _ in strokes)
+        print(f"strokes: {len(strokes)}, {point_count} points; stored points {json_points / 1e6:.1f} MB as JSON, "
+              f"{delta_points / 1e6:.2f} MB delta-encoded ({json_points / delta_points:.1f}x smaller, "
+              f"{delta_points / point_count:.1f} bytes per point)")
+
+        start = time.perf_counter()
+        for event in parsed[:args.unbatched]:
+            history.append('unbatched', 'user-1', [event])
+            history.flush()
+        unbatched = args.unbatched / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for event in parsed:
+            history.append('room', 'user-1', [event])
+            if len(history._pending) >= args.batch_size:
+                history.flush()
+        history.flush()
+        batched = len(parsed) / (time.perf_counter() - start)
+        print(f"ingest: {batched:,.0f} events/s batched ({args.batch_size} per transaction), "
+              f"{unbatched:,.0f} events/s unbatched")
+
+        reader = RoomHistory(history.path, max_delta=args.events * 2)
+        for label, read in (('full replay', lambda: reader.read('room', after=0)),
+                            ('snapshot + delta', lambda: reader.read('room'))):
+            start = time.perf_counter()
+            result = read()
+            elapsed = (time.perf_counter() - start) * 1000
+            events = result['events'] + result.get('snapshot', {}).get('chat', []) + \
+                result.get('snapshot', {}).get('strokes', [])
+            print(f"late joiner, {label:>16}: {len(events):>6} events, "
+                  f"{payload_bytes(events, 'absolute', reader) / 1e6:6.2f} MB as pairs, "
+                  f"{payload_bytes(events, 'delta', reader) / 1e6:6.2f} MB delta-encoded, read {elapsed:.0f} ms")
+
+        appended, missed, duplicated = two_writers(os.path.join(directory, 'shared.db'), parsed[:2000], rng)
+        print(f"two writers: {appended} events appended, polling reader missed {missed}, "
+              f"received {duplicated} twice")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
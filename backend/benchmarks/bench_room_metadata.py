@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Room metadata decoding: json.loads per room per request vs. RoomMetadataCache.
+
+Reports the time to format a full room list with the old per-request parse,
+with a cold cache and with a warm cache, plus retained memory per cached
+record compared with keeping the decoded dicts.
+
+Usage:
+    python benchmarks/bench_room_metadata.py --rooms 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import format_room, make_rooms
+from utils.room_metadata import RoomMetadataCache
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def retained_bytes(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rooms = make_rooms(args.rooms)
+
+    baseline = best_of(lambda: [format_room(room) for room in rooms], args.repeat)
+
+    def cold():
+        cache = RoomMetadataCache()
+        return [cache.format_room(room) for room in rooms]
+    cold_ms = best_of(cold, args.repeat)
+
+    warm_cache = RoomMetadataCache()
+    [warm_cache.format_room(room) for room in rooms]
+    warm_ms = best_of(lambda: [warm_cache.format_room(room) for room in rooms], args.repeat)
+
+    def build_cache():
+        cache = RoomMetadataCache()
+        for room in rooms:
+            cache.get(room['sid'], room['metadata'])
+        return cache
+    cache_bytes = retained_bytes(build_cache)
+    dict_bytes = retained_bytes(lambda: {room['sid']: json.loads(room['metadata']) for room in rooms})
+
+    print(f"rooms:                    {args.rooms}")
+    print(f"json.loads per request:   {baseline:8.2f} ms")
+    print(f"cache, cold:              {cold_ms:8.2f} ms")
+    print(f"cache, warm:              {warm_ms:8.2f} ms  ({baseline / warm_ms:.1f}x faster)")
+    print(f"retained per record:      {cache_bytes / args.rooms:8.0f} B  (decoded dicts only: {dict_bytes / args.rooms:.0f} B)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Wall-clock benchmark for segmented transcription of long recordings.
+
+Synthesises a speech-like WAV (bursts of modulated noise separated by short
+pauses over a quiet noise floor), then transcribes it with a fake STT whose
+latency is a fixed overhead plus a cost per second of audio: once as a
+single call, and segmented at several target lengths and pool sizes.
+Reports segment count, silence detection time and speedup over the single
+call, and checks that segment texts come back in audio order.
+
+Usage:
+    python benchmarks/bench_segmented_stt.py --minutes 10 --targets 120 60 30 15 --workers 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeSTT
+from utils import vad
+from utils.transcription import transcribe_segmented
+
+RATE = 16000
+
+
+def synthesize(path, minutes, seed=7):
+    """Write a mono 16-bit WAV of utterances (1-12 s) and pauses (0.2-1.5 s)"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * RATE)
+    audio = rng.normal(0, 10 ** (-65 / 20), total).astype(np.float32)
+    position = 0
+    while position < total:
+        length = int(rng.uniform(1, 12) * RATE)
+        end = min(total, position + length)
+        t = np.arange(end - position) / RATE
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+        audio[position:end] += 0.1 * envelope * rng.normal(0, 1, end - position)
+        position = end + int(rng.uniform(0.2, 1.5) * RATE)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, default=10)
+    parser.add_argument('--targets', type=float, nargs='+', default=[120, 60, 30, 15],
+                        help='target segment lengths in seconds')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--stt-latency', type=float, default=300, help='fixed STT overhead per call in ms')
+    parser.add_argument('--stt-per-second', type=float, default=10,
+                        help='STT processing time per second of audio in ms')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        synthesize(path, args.minutes)
+        stt = FakeSTT(latency=args.stt_latency / 1000, per_second=args.stt_per_second / 1000)
+        AgentSession, assemblyai = stt()
+
+        def transcribe(segment_path):
+            AgentSession(stt=assemblyai.STT()).stt.transcribe(segment_path)
+            # Return the segment length so the stitched order can be checked
+            return f"{stt.audio_seconds(segment_path):.3f}"
+
+        audio = vad.read_wav(path)
+        start = time.perf_counter()
+        vad.speech_frames(vad.frame_energy_db(audio))
+        vad_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        transcribe(path)
+        whole = time.perf_counter() - start
+        print(f"audio: {args.minutes:.0f} min, silence detection {vad_ms:.1f} ms, "
+              f"single STT call {whole * 1000:.0f} ms")
+        print(f"{'target s':>9} {'workers':>8} {'segments':>9} {'longest s':>10} {'wall ms':>9} {'speedup':>8}  order")
+
+        failed = False
+        for target in args.targets:
+            for workers in args.workers:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    start = time.perf_counter()
+                    result = transcribe_segmented(path, transcribe, pool, min_audio_seconds=0,
+                                                  target_seconds=target, max_seconds=target * 2)
+                    wall = time.perf_counter() - start
+                segments = result['segments']
+                in_order = all(
+                    abs(float(segment['text']) - (segment['end'] - segment['start'])) < 0.01
+                    and (i == 0 or segment['start'] >= segments[i - 1]['end'])
+                    for i, segment in enumerate(segments)
+                )
+                failed |= not in_order
+                longest = max(segment['end'] - segment['start'] for segment in segments)
+                print(f"{target:>9.0f} {workers:>8} {len(segments):>9} {longest:>10.1f} "
+                      f"{wall * 1000:>9.0f} {whole / wall:>7.1f}x  {'ok' if in_order else 'FAIL'}")
+    finally:
+        os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Checks and timings for ShardedLiveKitService against several local Twirp fakes.
+
+Starts one FakeLiveKit per shard, each seeded with a different number of
+rooms, and verifies that:
+  - list_active_rooms merges every shard, queried in parallel
+  - create_room places rooms on the least-loaded shard
+  - tokens are signed with the owning shard's credentials
+  - get_room_info and delete_room go to the owning shard only
+  - an unreachable shard is skipped for listings and placement
+
+Then reports merged ListRooms latency against querying shards one by one.
+Exits non-zero if a check fails.
+
+Usage:
+    python benchmarks/bench_sharding.py --shards 3 --rooms 200 --latency 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeLiveKit
+from utils.circuit_breaker import CircuitBreaker
+from utils.livekit_service import LiveKitService, ShardedLiveKitService
+
+
+def build(fakes, latency):
+    shards = [
+        LiveKitService(
+            api_key=f"key-{i}",
+            api_secret=f"secret-{i}-" + 'x' * 24,
+            server_url=fake.url,
+            timeout=max(1.0, latency * 20),
+            breaker=CircuitBreaker(f"livekit:{fake.url}", min_calls=2, open_seconds=30)
+        )
+        for i, fake in enumerate(fakes)
+    ]
+    # load_ttl=0: every placement sees current loads
+    return ShardedLiveKitService(shards, load_ttl=0)
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, name, ok, detail=''):
+        if not ok:
+            self.failed += 1
+        print(f"  {'PASS' if ok else 'FAIL'}  {name}" + (f"  ({detail})" if detail else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=3)
+    parser.add_argument('--rooms', type=int, default=200, help='rooms on the busiest shard')
+    parser.add_argument('--latency', type=float, default=20, help='fake LiveKit latency in ms')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    if args.shards < 2:
+        parser.error('--shards must be at least 2')
+
+    latency = args.latency / 1000
+    # Shard i starts with fewer rooms than shard i-1; the last one is empty
+    seeded = [args.rooms * (args.shards - 1 - i) // (args.shards - 1) for i in range(args.shards)]
+    fakes = [
+        FakeLiveKit(rooms=count, latency=latency, name_prefix=f"shard{i}", seed=i).start()
+        for i, count in enumerate(seeded)
+    ]
+    service = build(fakes, latency)
+    checks = Checks()
+
+    print(f"shards: {args.shards}, seeded rooms: {seeded}, latency: {args.latency:.0f} ms")
+
+    result = service.list_active_rooms()
+    checks.check('list_active_rooms merges all shards',
+                 result['success'] and len(result['rooms']) == sum(seeded),
+                 f"{len(result.get('rooms', []))} of {sum(seeded)} rooms")
+
+    placed = []
+    for n in range(args.shards):
+        name = f"placed-{n}"
+        created = service.create_room(name)
+        placed.append((name, next(i for i, fake in enumerate(fakes) if name in fake.rooms)))
+        checks.check(f"create_room {name}", created['success'] and created['room']['serverUrl'] == fakes[placed[-1][1]].url)
+    checks.check('first room goes to the least-loaded shard', placed[0][1] == args.shards - 1,
+                 f"placed on shard {placed[0][1]}")
+
+    name, owner = placed[0]
+    token = service.generate_access_token(name, 'student')
+    claims = jwt.decode(token, f"secret-{owner}-" + 'x' * 24, algorithms=['HS256'])
+    checks.check('token signed with the owning shard credentials', claims['iss'] == f"key-{owner}")
+    checks.check('server_url_for points at the owning shard', service.server_url_for(name) == fakes[owner].url)
+
+    before = [fake.requests for fake in fakes]
+    info = service.get_room_info(name)
+    after = [fake.requests for fake in fakes]
+    routed = [a - b for a, b in zip(after, before)]
+    checks.check('get_room_info only calls the owning shard',
+                 info['success'] and routed[owner] == 1 and sum(routed) == 1, f"calls per shard {routed}")
+
+    # A room this process never saw is found by asking every shard
+    fresh = build(fakes, latency)
+    existing = next(iter(fakes[0].rooms))
+    checks.check('unknown room is looked up on every shard', fresh.get_room_info(existing)['success'])
+    checks.check('missing room reports not found', not fresh.get_room_info('no-such-room')['success'])
+
+    deleted = service.delete_room(name)
+    checks.check('delete_room removes the room from its shard', deleted['success'] and name not in fakes[owner].rooms)
+
+    def timed(fn):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    parallel_ms = timed(service.list_active_rooms)
+    sequential_ms = timed(lambda: [shard.list_active_rooms() for shard in service.shards])
+    print(f"  ListRooms across {args.shards} shards: parallel {parallel_ms:.1f} ms, sequential {sequential_ms:.1f} ms")
+
+    down = fakes[-1]
+    down.stop()
+    partial = service.list_active_rooms()
+    checks.check('listing survives an unreachable shard',
+                 partial['success'] and len(partial['rooms']) == sum(len(fake.rooms) for fake in fakes[:-1]))
+    created = service.create_room('after-outage')
+    checks.check('placement skips the unreachable shard',
+                 created['success'] and created['room']['serverUrl'] != down.url)
+
+    for fake in fakes[:-1]:
+        fake.stop()
+
+    print('all checks passed' if not checks.failed else f"{checks.failed} check(s) failed")
+    sys.exit(1 if checks.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
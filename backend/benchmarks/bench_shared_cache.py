@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Per-process against shared caching across worker processes.
+
+Starts N worker processes that each serve a stream of reads over a skewed
+(Zipf-like) key set through a TieredCache, loading misses from a fake
+origin with a fixed latency. Reports, per CACHE_BACKEND:
+  - origin loads (what reaches Supabase or LiveKit) and L1/L2 hit rates
+  - reads per second across all workers
+Then measures how long a write in one process takes to drop the stale L1
+copy in another (the sqlite backend's log is polled every --poll seconds).
+
+The redis backend needs a server and the redis package: --redis-url.
+
+Usage:
+    python benchmarks/bench_shared_cache.py --workers 2 4 8 --keys 5000 --reads 5000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import RedisCacheBackend, SQLiteCacheBackend, TieredCache, _Invalidations
+
+
+def make_cache(backend_name, args, directory):
+    if backend_name == 'memory':
+        return TieredCache('profiles', max_entries=args.l1_size, ttl=args.ttl)
+    if backend_name == 'redis':
+        backend = RedisCacheBackend(args.redis_url, prefix=f'bench-{os.getppid()}:')
+    else:
+        backend = SQLiteCacheBackend(os.path.join(directory, 'cache.db'), poll_interval=args.poll)
+    caches = {}
+    invalidations = _Invalidations(backend, caches)
+    caches['profiles'] = TieredCache('profiles', max_entries=args.l1_size, ttl=args.ttl,
+                                     backend=backend, publish=invalidations.publish)
+    return caches['profiles']
+
+
+def zipf_keys(count, keys, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [f'user-{i}' for i in rng.choices(range(keys), cum_weights=list(_accumulate(weights)), k=count)]
+
+
+def _accumulate(values):
+    total = 0
+    for value in values:
+        total += value
+        yield total
+
+
+def worker(backend_name, args, directory, seed, start, results):
+    cache = make_cache(backend_name, args, directory)
+    keys = zipf_keys(args.reads, args.keys, seed)
+    origin_loads = 0
+    start.wait()
+    began = time.perf_counter()
+    for key in keys:
+        if cache.get(key) is None:
+            origin_loads += 1
+            time.sleep(args.origin_latency / 1000)
+            cache.set(key, {'id': key, 'full_name': 'Student ' + key, 'avatar_url': None})
+    results.put((origin_loads, time.perf_counter() - began, cache.stats()))
+
+
+def run(backend_name, workers, args):
+    directory = tempfile.mkdtemp()
+    try:
+        if backend_name == 'sqlite':
+            SQLiteCacheBackend(os.path.join(directory, 'cache.db'))  # create the schema once
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(backend_name, args, directory, seed, start, results))
+            for seed in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(0.5)
+        start.set()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(directory)
+
+    origin = sum(o[0] for o in outcomes)
+    elapsed = max(o[1] for o in outcomes)
+    l1 = sum(o[2]['l1']['hits'] for o in outcomes), sum(o[2]['l1']['misses'] for o in outcomes)
+    l2 = (sum(o[2]['l2']['hits'] for o in outcomes), sum(o[2]['l2']['misses'] for o in outcomes)) \
+        if 'l2' in outcomes[0][2] else None
+    return origin, workers * args.reads / elapsed, l1, l2
+
+
+def rate(hits_misses):
+    if hits_misses is None:
+        return '    -'
+    hits, misses = hits_misses
+    return f"{hits / (hits + misses):5.1%}" if hits + misses else '    -'
+
+
+def propagation(backend_name, args, trials):
+    """Milliseconds from a set in one process to the other process dropping its L1 copy"""
+    directory = tempfile.mkdtemp()
+    try:
+        if backend_name == 'sqlite':
+            SQLiteCacheBackend(os.path.join(directory, 'cache.db'))
+        ready, written, results = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+
+        def reader():
+            cache = make_cache(backend_name, args, directory)
+            delays = []
+            for trial in range(trials):
+                key = f'key-{trial}'
+                cache.l1.set(key, 'old')
+                ready.set()
+                written.wait()
+                written.clear()
+                while cache.l1.get(key) is not None:
+                    time.sleep(0.0005)
+                delays.append((time.time() - results.get()) * 1000)
+            results.put(delays)
+
+        process = multiprocessing.Process(target=reader)
+        process.start()
+        cache = make_cache(backend_name, args, directory)
+        for trial in range(trials):
+            ready.wait()
+            ready.clear()
+            # Writes arrive at random points of the reader's poll cycle
+            time.sleep(random.uniform(0, args.poll))
+            results.put(time.time())
+            cache.set(f'key-{trial}', 'new')
+            written.set()
+        process.join()
+        return results.get()
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--keys', type=int, default=5000, help='distinct keys (users)')
+    parser.add_argument('--reads', type=int, default=5000, help='reads per worker')
+    parser.add_argument('--l1-size', type=int, default=10000)
+    parser.add_argument('--ttl', type=float, default=300)
+    parser.add_argument('--origin-latency', type=float, default=2, help='milliseconds per origin load')
+    parser.add_argument('--poll', type=float, default=0.2, help='sqlite invalidation poll interval, seconds')
+    parser.add_argument('--redis-url', help='also run the redis backend against this server')
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('fork')
+    backends = ['memory', 'sqlite'] + (['redis'] if args.redis_url else [])
+
+    print(f"{'backend':>8} {'workers':>7} {'origin loads':>12} {'L1 hit':>7} {'L2 hit':>7} {'reads/s':>9}")
+    for workers in args.workers:
+        for backend_name in backends:
+            origin, throughput, l1, l2 = run(backend_name, workers, args)
+            print(f"{backend_name:>8} {workers:>7} {origin:>12} {rate(l1):>7} {rate(l2):>7} {throughput:>9,.0f}")
+
+    print('\ninvalidation reaching another process:')
+    for backend_name in backends[1:]:
+        delays = propagation(backend_name, args, trials=20)
+        print(f"{backend_name:>8}: median {statistics.median(delays):.0f} ms, max {max(delays):.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
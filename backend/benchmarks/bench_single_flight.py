@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for SingleFlight request coalescing.
+
+Simulates a class starting: many callers ask for the same room info at the
+same moment, against a fake upstream with fixed latency. Reports upstream
+calls and caller latency with and without coalescing, for threads and for
+asyncio tasks.
+
+Usage:
+    python benchmarks/bench_single_flight.py --callers 50 --rooms 1 5 --latency 40
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.single_flight import SingleFlight
+
+
+class FakeUpstream:
+    """Stand-in for LiveKitService.get_room_info with fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_room_info(self, room_name):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return {'success': True, 'room': {'name': room_name}}
+
+    async def get_room_info_async(self, room_name):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {'success': True, 'room': {'name': room_name}}
+
+
+def run_threads(callers, rooms, latency, coalesce):
+    upstream = FakeUpstream(latency)
+    group = SingleFlight()
+    barrier = threading.Barrier(callers)
+    latencies = []
+
+    def caller(index):
+        room_name = f"room-{index % rooms}"
+        barrier.wait()
+        start = time.perf_counter()
+        if coalesce:
+            group.do(('room_info', room_name), upstream.get_room_info, room_name)
+        else:
+            upstream.get_room_info(room_name)
+        latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return upstream.calls, latencies
+
+
+def run_async(callers, rooms, latency, coalesce):
+    upstream = FakeUpstream(latency)
+    group = SingleFlight()
+    latencies = []
+
+    async def caller(index):
+        room_name = f"room-{index % rooms}"
+        start = time.perf_counter()
+        if coalesce:
+            await group.do_async(('room_info', room_name), upstream.get_room_info_async, room_name)
+        else:
+            await upstream.get_room_info_async(room_name)
+        latencies.append(time.perf_counter() - start)
+
+    async def main():
+        await asyncio.gather(*(caller(i) for i in range(callers)))
+
+    asyncio.run(main())
+    return upstream.calls, latencies
+
+
+def report(label, calls, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"  {label:<22} upstream calls {calls:5d}   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=50)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--latency', type=float, default=40, help='upstream latency in ms')
+    args = parser.parse_args()
+
+    latency = args.latency / 1000
+    for rooms in args.rooms:
+        print(f"callers: {args.callers}, distinct rooms: {rooms}, upstream latency: {args.latency:.0f} ms")
+        report('threads, direct', *run_threads(args.callers, rooms, latency, coalesce=False))
+        report('threads, single-flight', *run_threads(args.callers, rooms, latency, coalesce=True))
+        report('asyncio, direct', *run_async(args.callers, rooms, latency, coalesce=False))
+        report('asyncio, single-flight', *run_async(args.callers, rooms, latency, coalesce=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Worker start-up benchmark: cold import time and time-to-first-request.
+
+Each trial runs in a fresh interpreter. The import profile comes from
+``python -X importtime``; time-to-first-request imports ``app`` and serves
+GET /health through the Flask test client, optionally after ``warm_up()``.
+
+Usage:
+    python benchmarks/bench_startup.py --trials 5 --top 15
+    python benchmarks/bench_startup.py --warm-up --json > startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+warm = imported
+if {warm_up!r}:
+    app.warm_up(app.app)
+    warm = time.perf_counter()
+response = app.app.test_client().get('/health')
+done = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'import': imported - start, 'warm_up': warm - imported, 'first_request': done - warm, 'total': done - start}}))
+"""
+
+
+def run(args, env):
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+
+def import_profile(env):
+    """Return {module: (self_us, cumulative_us)} from -X importtime"""
+    result = run(['-X', 'importtime', '-c', 'import app'], env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def first_request(env, warm_up):
+    result = run(['-c', FIRST_REQUEST_SCRIPT.format(warm_up=warm_up)], env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest top-level imports to list')
+    parser.add_argument('--warm-up', action='store_true', help='call app.warm_up() before the first request')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('LOG_LEVEL', 'WARNING')
+
+    profiles = [import_profile(env) for _ in range(args.trials)]
+    timings = [first_request(env, args.warm_up) for _ in range(args.trials)]
+
+    app_import_ms = statistics.median(p['app'][1] for p in profiles) / 1000
+    cumulative = {}
+    for profile in profiles:
+        for name, (_, cum) in profile.items():
+            if '.' not in name:
+                cumulative.setdefault(name, []).append(cum)
+    slowest = sorted(((statistics.median(v) / 1000, k) for k, v in cumulative.items()), reverse=True)[:args.top]
+    summary = {key: statistics.median(t[key] for t in timings) * 1000 for key in timings[0]}
+
+    if args.json:
+        print(json.dumps({
+            'trials': args.trials,
+            'warm_up': args.warm_up,
+            'import_app_ms': app_import_ms,
+            'time_to_first_request_ms': summary,
+            'slowest_imports_ms': {name: ms for ms, name in slowest}
+        }, indent=2))
+        return
+
+    print(f"import app (-X importtime, median of {args.trials}): {app_import_ms:.1f} ms")
+    print(f"time to first request: import {summary['import']:.1f} ms + warm-up {summary['warm_up']:.1f} ms "
+          f"+ first GET /health {summary['first_request']:.1f} ms = {summary['total']:.1f} ms")
+    print("\nslowest top-level imports (cumulative):")
+    for ms, name in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Ingestion and query benchmark for the FTS5 transcript store.
+
+Fills a fresh TranscriptStore with synthetic tutoring utterances (words drawn
+from a Zipf-like vocabulary, spread over many users and rooms), reporting
+batched ingestion throughput against one transaction per utterance. Then
+times searches for common, mid-frequency and rare words, each scoped to one
+user as the endpoint does, against an unindexed LIKE scan of the same table.
+
+Usage:
+    python benchmarks/bench_transcript_store.py --utterances 1000000 --users 500 --queries 200
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.transcript_store import TranscriptStore
+
+SUBJECT_WORDS = [
+    'fraction', 'equation', 'photosynthesis', 'derivative', 'integral', 'paragraph', 'thesis',
+    'molecule', 'gravity', 'velocity', 'triangle', 'hypotenuse', 'grammar', 'essay', 'vocabulary',
+    'algebra', 'geometry', 'probability', 'chemistry', 'revolution', 'democracy', 'ecosystem',
+]
+
+
+def vocabulary(size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set(SUBJECT_WORDS)
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    words = list(words)
+    rng.shuffle(words)
+    return words
+
+
+def utterances(count, users, rng, words):
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    rows = []
+    for i in range(count):
+        text = ' '.join(rng.choices(words, cum_weights=cumulative, k=rng.randint(6, 20)))
+        user = f"user-{rng.randrange(users)}"
+        rows.append((f"room-{user}-{rng.randrange(20)}", user, {'start': i * 5.0, 'end': i * 5.0 + 5.0, 'text': text}))
+    return rows
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--unbatched', type=int, default=5000, help='utterances inserted one transaction each')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-queries', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = vocabulary(args.vocabulary, rng)
+    directory = tempfile.mkdtemp()
+    try:
+        store = TranscriptStore(os.path.join(directory, 'transcripts.db'), batch_size=args.batch_size)
+
+        sample = utterances(args.unbatched, args.users, rng, words)
+        start = time.perf_counter()
+        for room_name, user_id, segment in sample:
+            store.append(room_name, user_id, [segment])
+            store.flush()
+        unbatched = args.unbatched / (time.perf_counter() - start)
+
+        rows = utterances(args.utterances, args.users, rng, words)
+        start = time.perf_counter()
+        for n, (room_name, user_id, segment) in enumerate(rows, 1):
+            store.append(room_name, user_id, [segment])
+            if n % args.batch_size == 0:
+                store.flush()
+        store.flush()
+        elapsed = time.perf_counter() - start
+        del rows
+        size_mb = os.path.getsize(store.path) / 1e6
+        print(f"ingest: {args.utterances} utterances in {elapsed:.1f}s, {args.utterances / elapsed:,.0f}/s batched "
+              f"({args.batch_size} per transaction), {unbatched:,.0f}/s unbatched, database {size_mb:.0f} MB")
+
+        # Words by frequency rank in the Zipf-like vocabulary
+        bands = {
+            'common': words[:50],
+            'mid': words[len(words) // 10:len(words) // 10 + 200],
+            'rare': words[-500:],
+        }
+        print(f"{'query':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'hits':>6}  {'LIKE scan ms':>12}")
+        conn = store._connect()
+        for band, candidates in bands.items():
+            latencies, hits = [], []
+            for _ in range(args.queries):
+                user_id = f"user-{rng.randrange(args.users)}"
+                query = rng.choice(candidates)
+                start = time.perf_counter()
+                results = store.search(query, user_id, limit=20)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits.append(len(results))
+
+            scans = []
+            for _ in range(args.scan_queries):
+                start = time.perf_counter()
+                conn.execute(
+                    'SELECT id FROM utterances WHERE user_id = ? AND text LIKE ? LIMIT 20',
+                    (f"user-{rng.randrange(args.users)}", f"%{rng.choice(candidates)}%")
+                ).fetchall()
+                scans.append((time.perf_counter() - start) * 1000)
+            print(f"{band:>8} {percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+                  f"{max(latencies):>8.2f} {statistics.mean(hits):>6.1f}  {statistics.median(scans):>12.1f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
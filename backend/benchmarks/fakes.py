@@ -0,0 +1,351 @@
+"""
+Local stand-ins for the upstreams the backend talks to, for load tests.
+
+- FakeLiveKit: Twirp RoomService (CreateRoom, ListRooms, UpdateRoomMetadata,
+  DeleteRoom) over JSON, or protobuf when livekit-protocol is installed
+- FakeSupabase: GoTrue auth endpoints and a PostgREST ``profiles`` table
+- FakeSTT: drop-in for ``load_stt_sdk`` whose transcribe call sleeps, optionally
+  in proportion to the audio length
+
+Each server listens on 127.0.0.1 with an ephemeral port and adds a fixed
+``latency`` to every request, so runs are reproducible across machines
+(optionally with a fraction of slow requests).
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+import wave
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+
+from benchmarks.payloads import make_rooms
+from utils import livekit_protobuf
+from utils.livekit_protobuf import json_format
+
+JWT_SECRET = 'fake-supabase-jwt-secret-for-load-tests'
+
+
+class _FakeServer:
+    """
+    Threaded HTTP server running in a daemon thread. Setting ``slow_ratio``
+    makes that fraction of requests take ``slow_latency`` instead, for tail
+    latency tests.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.slow_ratio = 0.0
+        self.slow_latency = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.slow_ratio and random.random() < fake.slow_ratio:
+                    time.sleep(fake.slow_latency)
+                elif fake.latency:
+                    time.sleep(fake.latency)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                url = urlsplit(self.path)
+                payload = fake.decode(url.path, self.headers, body)
+                status, data = fake.handle(self.command, url.path, parse_qs(url.query), self.headers, payload)
+                content_type, encoded = fake.encode(url.path, self.headers, status, data)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def decode(self, path, headers, body):
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+    def encode(self, path, headers, status, data):
+        return 'application/json', json.dumps(data).encode('utf-8') if data is not None else b''
+
+    def handle(self, method, path, query, headers, payload):
+        raise NotImplementedError
+
+
+class FakeLiveKit(_FakeServer):
+    """
+    Twirp RoomService backed by an in-memory room table. Requests sent as
+    application/protobuf are answered in protobuf when livekit-protocol is
+    installed.
+    """
+
+    TWIRP_PREFIX = '/twirp/livekit.RoomService/'
+
+    def _protobuf(self, path, headers):
+        return (path.startswith(self.TWIRP_PREFIX) and livekit_protobuf.available()
+                and headers.get('Content-Type', '').startswith(livekit_protobuf.CONTENT_TYPE))
+
+    def decode(self, path, headers, body):
+        if self._protobuf(path, headers):
+            request_type, _ = livekit_protobuf.MESSAGES[path[len(self.TWIRP_PREFIX):]]
+            message = request_type()
+            message.ParseFromString(body)
+            return livekit_protobuf.message_to_dict(message)
+        return super().decode(path, headers, body)
+
+    def encode(self, path, headers, status, data):
+        if status == 200 and self._protobuf(path, headers):
+            if path.endswith('/ListRooms'):
+                return livekit_protobuf.CONTENT_TYPE, b''.join(self._encoded_room(room) for room in data['rooms'])
+            _, response_type = livekit_protobuf.MESSAGES[path[len(self.TWIRP_PREFIX):]]
+            message = json_format.ParseDict(data, response_type(), ignore_unknown_fields=True)
+            return livekit_protobuf.CONTENT_TYPE, message.SerializeToString()
+        return super().encode(path, headers, status, data)
+
+    def _encoded_room(self, room):
+        """
+        A room as one ``rooms`` entry of ListRoomsResponse (field 1,
+        length-delimited), cached until its metadata changes so a large
+        listing costs the fake about what it costs a real server
+        """
+        cached = self._encoded.get(room['name'])
+        if cached is None or cached[0] != room.get('metadata'):
+            body = json_format.ParseDict(room, livekit_protobuf.MESSAGES['CreateRoom'][1](),
+                                         ignore_unknown_fields=True).SerializeToString()
+            size, prefix = len(body), bytearray(b'\x0a')
+            while size > 0x7f:
+                prefix.append(size & 0x7f | 0x80)
+                size >>= 7
+            prefix.append(size)
+            cached = self._encoded[room['name']] = (room.get('metadata'), bytes(prefix) + body)
+        return cached[1]
+
+    def __init__(self, rooms=1000, latency=0.005, name_prefix='room', seed=42):
+        super().__init__(latency)
+        self.rooms = {}
+        self._encoded = {}  # room name -> (metadata, ListRoomsResponse entry)
+        for room in make_rooms(rooms, seed):
+            room['name'] = room['name'].replace('room', name_prefix, 1)
+            self.rooms[room['name']] = room
+
+    def handle(self, method, path, query, headers, payload):
+        if path == '/':
+            return 200, 'OK'
+        if method != 'POST' or not path.startswith(self.TWIRP_PREFIX):
+            return 404, {'code': 'bad_route', 'msg': path}
+
+        rpc = path[len(self.TWIRP_PREFIX):]
+        with self._lock:
+            if rpc == 'ListRooms':
+                names = payload.get('names')
+                rooms = [self.rooms[name] for name in names if name in self.rooms] if names else list(self.rooms.values())
+                return 200, {'rooms': rooms}
+            if rpc == 'CreateRoom':
+                room = {
+                    'sid': f"RM_{uuid.uuid4().hex[:12]}",
+                    'name': payload['name'],
+                    'emptyTimeout': payload.get('emptyTimeout', 300),
+                    'maxParticipants': payload.get('maxParticipants', 2),
+                    'creationTime': str(int(time.time())),
+                    'metadata': payload.get('metadata', ''),
+                    'numParticipants': 0
+                }
+                self.rooms[room['name']] = room
+                return 200, room
+            if rpc == 'UpdateRoomMetadata':
+                room = self.rooms.get(payload.get('room'))
+                if room is None:
+                    return 404, {'code': 'not_found', 'msg': 'room not found'}
+                room['metadata'] = payload.get('metadata', '')
+                return 200, room
+            if rpc == 'DeleteRoom':
+                self.rooms.pop(payload.get('room'), None)
+                return 200, {}
+        return 404, {'code': 'bad_route', 'msg': rpc}
+
+
+class FakeSupabase(_FakeServer):
+    """GoTrue password/refresh/user/logout endpoints and PostgREST profiles"""
+
+    def __init__(self, latency=0.005):
+        super().__init__(latency)
+        self.users = {}  # email -> user dict
+        self.refresh_tokens = {}  # refresh token -> (email, session id)
+        self.profiles = {}  # id -> profile row
+
+    @property
+    def anon_key(self):
+        return jwt.encode({'role': 'anon', 'iss': 'supabase'}, JWT_SECRET, algorithm='HS256')
+
+    def _user(self, email, metadata=None):
+        user = self.users.get(email)
+        if user is None:
+            user = {
+                'id': str(uuid.uuid4()),
+                'aud': 'authenticated',
+                'role': 'authenticated',
+                'email': email,
+                'app_metadata': {'provider': 'email'},
+                'user_metadata': metadata or {},
+                'created_at': datetime.now(timezone.utc).isoformat()
+            }
+            self.users[email] = user
+        return user
+
+    def _session(self, user, session_id=None):
+        """A new session, or a refreshed one keeping its ``session_id``"""
+        now = int(time.time())
+        session_id = session_id or str(uuid.uuid4())
+        access_token = jwt.encode({
+            'sub': user['id'],
+            'email': user['email'],
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'user_metadata': user['user_metadata'],
+            'session_id': session_id,
+            'iat': now,
+            'exp': now + 3600
+        }, JWT_SECRET, algorithm='HS256')
+        refresh_token = uuid.uuid4().hex
+        self.refresh_tokens[refresh_token] = (user['email'], session_id)
+        return {
+            'access_token': access_token,
+            'token_type': 'bearer',
+            'expires_in': 3600,
+            'expires_at': now + 3600,
+            'refresh_token': refresh_token,
+            'user': user
+        }
+
+    def _bearer_user(self, headers):
+        token = (headers.get('Authorization') or '').replace('Bearer ', '', 1)
+        try:
+            claims = jwt.decode(token, JWT_SECRET, algorithms=['HS256'], audience='authenticated')
+        except jwt.PyJWTError:
+            return None
+        return self.users.get(claims.get('email'))
+
+    def handle(self, method, path, query, headers, payload):
+        with self._lock:
+            if path.startswith('/auth/v1/'):
+                return self._auth(method, path[len('/auth/v1/'):], query, headers, payload)
+            if path == '/rest/v1/profiles':
+                return self._profiles(method, query, payload)
+        return 404, {'message': f'Not found: {path}'}
+
+    def _auth(self, method, route, query, headers, payload):
+        if route == 'health':
+            return 200, {'name': 'GoTrue', 'description': 'fake'}
+        if route == 'signup':
+            user = self._user(payload['email'], payload.get('data'))
+            return 200, self._session(user)
+        if route == 'token':
+            grant_type = query.get('grant_type', [''])[0]
+            if grant_type == 'password':
+                user = self._user(payload['email'])
+                return 200, self._session(user)
+            if grant_type == 'refresh_token':
+                entry = self.refresh_tokens.get(payload.get('refresh_token'))
+                if entry is None:
+                    return 400, {'error': 'invalid_grant', 'error_description': 'Invalid Refresh Token'}
+                email, session_id = entry
+                return 200, self._session(self.users[email], session_id)
+        if route == 'user':
+            user = self._bearer_user(headers)
+            if user is None:
+                return 401, {'code': 401, 'msg': 'invalid JWT'}
+            return 200, user
+        if route == 'logout':
+            return 204, None
+        return 404, {'message': f'Not found: {route}'}
+
+    def _profiles(self, method, query, payload):
+        user_id = query.get('id', ['eq.'])[0][len('eq.'):]
+        if method == 'GET':
+            profile = self.profiles.get(user_id)
+            return 200, [profile] if profile else []
+        if method == 'POST':
+            rows = payload if isinstance(payload, list) else [payload]
+            for row in rows:
+                self.profiles[row['id']] = dict(row)
+            return 201, rows
+        if method == 'PATCH':
+            profile = self.profiles.get(user_id)
+            if profile is None:
+                return 200, []
+            profile.update(payload)
+            return 200, [profile]
+        return 405, {'message': method}
+
+
+class FakeSTT:
+    """
+    Replacement for routes.assemblyai_stt.load_stt_sdk: returns an
+    (AgentSession, assemblyai) pair whose transcription sleeps ``latency``
+    plus ``per_second`` for every second of audio in a WAV file
+    """
+
+    def __init__(self, latency=0.05, per_second=0.0):
+        self.latency = latency
+        self.per_second = per_second
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def audio_seconds(self, path):
+        try:
+            with wave.open(path, 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError):
+            return 0.0
+
+    def __call__(self):
+        fake = self
+
+        class STT:
+            def transcribe(self, path):
+                with fake._lock:
+                    fake.calls += 1
+                seconds = fake.audio_seconds(path) if fake.per_second else 0.0
+                time.sleep(fake.latency + fake.per_second * seconds)
+                return 'the quick brown fox jumps over the lazy dog'
+
+        class AgentSession:
+            def __init__(self, stt):
+                self.stt = stt
+
+        class assemblyai:
+            pass
+        assemblyai.STT = STT
+
+        return AgentSession, assemblyai
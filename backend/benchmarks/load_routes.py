@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Load test for every backend route against local upstream fakes.
+
+Starts a fake LiveKit RoomService, a fake Supabase (auth + PostgREST) and a
+fake STT SDK, serves the app from a threaded WSGI server, then drives each
+scenario with ``--concurrency`` client threads and reports throughput and
+latency percentiles.
+
+Upstream latency is fixed, so numbers are comparable across commits on the
+same machine. Save a run with --output and compare later runs against it
+with --baseline; the script exits non-zero when a scenario regresses by
+more than --tolerance.
+
+Usage:
+    python benchmarks/load_routes.py --concurrency 16 --requests 400
+    python benchmarks/load_routes.py --only livekit. --output before.json
+    python benchmarks/load_routes.py --baseline before.json --tolerance 0.15
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import wave
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import JWT_SECRET, FakeLiveKit, FakeSTT, FakeSupabase
+
+
+def make_wav(seconds=1.0, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b'\x00\x00' * int(rate * seconds))
+    return buffer.getvalue()
+
+
+class Context:
+    """Per-run state shared by scenarios: base URL, auth sessions, counters"""
+
+    def __init__(self, base_url, rooms):
+        self.base_url = base_url
+        self.rooms = rooms
+        self.counter = itertools.count()
+        self.wav = make_wav()
+        session = requests.post(f"{base_url}/auth/signin", json={'email': 'load@example.com', 'password': 'secret'}).json()['session']
+        self.token = session['access_token']
+        self.refresh_token = session['refresh_token']
+        self.auth = {'Authorization': f"Bearer {self.token}"}
+
+    def signout_auth(self):
+        """
+        Headers for a user of its own: sign-out revokes every token of its
+        user, so signing out the shared user would fail the scenarios after it
+        """
+        email = f"signout-{uuid.uuid4().hex[:12]}@example.com"
+        session = requests.post(f"{self.base_url}/auth/signin", json={'email': email, 'password': 'secret'}).json()['session']
+        return {'Authorization': f"Bearer {session['access_token']}"}
+
+
+# name -> (method, path, request kwargs builder, expected statuses)
+SCENARIOS = {
+    'health': ('GET', lambda ctx: '/health', lambda ctx: {}, {200}),
+    'livez': ('GET', lambda ctx: '/livez', lambda ctx: {}, {200}),
+    'readyz': ('GET', lambda ctx: '/readyz', lambda ctx: {}, {200}),
+    'auth.signup': ('POST', lambda ctx: '/auth/signup', lambda ctx: {
+        'json': {'email': f"user-{uuid.uuid4().hex[:12]}@example.com", 'password': 'secret', 'full_name': 'Load Test'}
+    }, {201}),
+    'auth.signin': ('POST', lambda ctx: '/auth/signin', lambda ctx: {
+        'json': {'email': 'load@example.com', 'password': 'secret'}
+    }, {200}),
+    'auth.refresh': ('POST', lambda ctx: '/auth/refresh', lambda ctx: {
+        'json': {'refresh_token': ctx.refresh_token}
+    }, {200}),
+    'auth.signout': ('POST', lambda ctx: '/auth/signout', lambda ctx: {'headers': ctx.signout_auth()}, {200}),
+    'profile.get': ('GET', lambda ctx: '/profile', lambda ctx: {'headers': ctx.auth}, {200}),
+    'profile.put': ('PUT', lambda ctx: '/profile', lambda ctx: {
+        'headers': ctx.auth, 'json': {'full_name': 'Load Test'}
+    }, {200}),
+    'debug.user': ('GET', lambda ctx: '/debug/user', lambda ctx: {'headers': ctx.auth}, {200}),
+    'livekit.create-room': ('POST', lambda ctx: '/livekit/create-room', lambda ctx: {
+        'headers': ctx.auth, 'json': {'roomName': f"load-{uuid.uuid4().hex[:12]}", 'subject': 'Physics'}
+    }, {201}),
+    'livekit.generate-token': ('POST', lambda ctx: '/livekit/generate-token', lambda ctx: {
+        'headers': ctx.auth, 'json': {'roomName': 'room-000001', 'participantName': 'load'}
+    }, {200}),
+    'livekit.active-rooms': ('GET', lambda ctx: '/livekit/active-rooms', lambda ctx: {
+        'headers': ctx.auth, 'params': {'limit': 100}
+    }, {200}),
+    'livekit.room-info': ('GET', lambda ctx: f"/livekit/room/room-{next(ctx.counter) % ctx.rooms:06d}/info", lambda ctx: {
+        'headers': ctx.auth
+    }, {200}),
+    'livekit.delete-room': ('DELETE', lambda ctx: f"/livekit/room/room-{next(ctx.counter) % ctx.rooms:06d}", lambda ctx: {
+        'headers': ctx.auth
+    }, {200, 404}),
+    'livekit.events': ('GET', lambda ctx: '/livekit/events', lambda ctx: {'headers': ctx.auth, 'stream': True}, {200}),
+    'livekit.health': ('GET', lambda ctx: '/livekit/health', lambda ctx: {}, {200}),
+    'stt.transcribe': ('POST', lambda ctx: '/assemblyai_stt/transcribe', lambda ctx: {
+        'files': {'file': ('sample.wav', ctx.wav, 'audio/wav')}
+    }, {200}),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_scenario(ctx, name, concurrency, total):
+    method, path_fn, kwargs_fn, expected = SCENARIOS[name]
+    latencies = []
+    errors = []
+    remaining = itertools.count()
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while next(remaining) < total:
+            kwargs = kwargs_fn(ctx)
+            start = time.perf_counter()
+            try:
+                response = session.request(method, ctx.base_url + path_fn(ctx), timeout=30, **kwargs)
+                if kwargs.get('stream'):
+                    # Time to the first SSE message, then disconnect
+                    next(response.iter_content(chunk_size=None), None)
+                response.close()
+                status = response.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status not in expected:
+                    errors.append(status)
+        session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'errorStatuses': sorted({str(status) for status in errors}),
+        'throughput': round(len(latencies) / wall, 1),
+        'p50': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99': round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def start_app(livekit, supabase, stt):
+    # Config classes read the environment at import time
+    os.environ.update({
+        'FLASK_CONFIG': 'production',
+        'SUPABASE_URL': supabase.url,
+        'SUPABASE_ANON_KEY': supabase.anon_key,
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'LIVEKIT_API_KEY': 'load-test-key',
+        'LIVEKIT_API_SECRET': 'load-test-secret-load-test-secret',
+        'LIVEKIT_SERVER_URL': livekit.url,
+        'RATE_LIMIT_ENABLED': 'False',
+        'HEALTH_PROBE_INTERVAL': '1',
+        # Event streams disconnect after one message, but hold their slot
+        # until the next heartbeat; the threaded test server needs no cap
+        'ROOM_WATCH_MAX_SUBSCRIBERS': '0'
+    })
+    from werkzeug.serving import make_server
+    import routes.assemblyai_stt
+    from app import create_app, warm_up
+
+    routes.assemblyai_stt.load_stt_sdk = stt
+    app = create_app('production')
+    warm_up(app)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        if result['p50'] > before['p50'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50']:.2f} -> {result['p50']:.2f} ms")
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400, help='requests per scenario')
+    parser.add_argument('--rooms', type=int, default=1000, help='rooms seeded in the fake LiveKit')
+    parser.add_argument('--upstream-latency', type=float, default=5, help='fake LiveKit/Supabase latency in ms')
+    parser.add_argument('--stt-latency', type=float, default=50, help='fake transcription latency in ms')
+    parser.add_argument('--only', nargs='+', default=None, help='scenario names or prefixes to run')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON results from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    names = [
+        name for name in SCENARIOS
+        if not args.only or any(name == only or name.startswith(only) for only in args.only)
+    ]
+    # Destructive scenarios run last so they do not change what others measure
+    names.sort(key=lambda name: {'livekit.delete-room': 1, 'auth.signout': 2}.get(name, 0))
+
+    livekit = FakeLiveKit(rooms=args.rooms, latency=args.upstream_latency / 1000).start()
+    supabase = FakeSupabase(latency=args.upstream_latency / 1000).start()
+    stt = FakeSTT(latency=args.stt_latency / 1000)
+    server, base_url = start_app(livekit, supabase, stt)
+    time.sleep(1.5)  # let the readiness probe run once
+    ctx = Context(base_url, args.rooms)
+
+    print(f"concurrency {args.concurrency}, {args.requests} requests per scenario, "
+          f"upstream latency {args.upstream_latency:.0f} ms, stt latency {args.stt_latency:.0f} ms")
+    print(f"{'scenario':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    results = {}
+    for name in names:
+        result = run_scenario(ctx, name, args.concurrency, args.requests)
+        results[name] = result
+        errors = f"{result['errors']}" + (f" ({','.join(result['errorStatuses'])})" if result['errors'] else '')
+        print(f"{name:<24}{result['throughput']:>9.1f}{result['p50']:>9.2f}{result['p95']:>9.2f}{result['p99']:>9.2f}  {errors:>6}")
+    print(f"upstream requests: livekit {livekit.requests}, supabase {supabase.requests}, stt {stt.calls}")
+
+    server.shutdown()
+    livekit.stop()
+    supabase.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Load test for /livekit/events through HTTP.
+
+Starts a fake LiveKit RoomService and a fake Supabase, serves the app with
+gunicorn and the bundled gunicorn.conf.py (gevent workers when gevent is
+installed, otherwise gthread), then opens many concurrent SSE streams. The
+fake's rooms change every tick. Reports how many streams were admitted or
+refused with 503, time to the first snapshot, fan-out latency from a change
+upstream to its delivery, and upstream ListRooms calls compared with
+per-client polling.
+
+Usage:
+    python benchmarks/load_sse.py --subscribers 500 --rooms 2000 --duration 10
+    python benchmarks/load_sse.py --subscribers 50 --worker-class gthread
+"""
+
+import argparse
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from benchmarks.fakes import JWT_SECRET, FakeLiveKit, FakeSupabase
+
+
+class CountingLiveKit(FakeLiveKit):
+    """FakeLiveKit that counts ListRooms calls and can change participant counts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.list_calls = 0
+
+    def handle(self, method, path, query, headers, payload):
+        if path.endswith('/ListRooms'):
+            with self._lock:
+                self.list_calls += 1
+        return super().handle(method, path, query, headers, payload)
+
+    def mutate(self, rng, changes):
+        with self._lock:
+            names = list(self.rooms)
+            for _ in range(changes):
+                room = self.rooms[rng.choice(names)]
+                room['numParticipants'] = max(0, room.get('numParticipants', 0) + rng.choice([-1, 1]))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(livekit, supabase, args):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'FLASK_CONFIG': 'production',
+        'FLASK_HOST': '127.0.0.1',
+        'FLASK_PORT': str(port),
+        'SUPABASE_URL': supabase.url,
+        'SUPABASE_ANON_KEY': supabase.anon_key,
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'LIVEKIT_API_KEY': 'load-test-key',
+        'LIVEKIT_API_SECRET': 'load-test-secret-load-test-secret',
+        'LIVEKIT_SERVER_URL': livekit.url,
+        'RATE_LIMIT_ENABLED': 'False',
+        'ROOM_WATCH_INTERVAL': str(args.interval),
+        'ROOM_WATCH_HISTORY': str(args.changes * 100),
+        'GUNICORN_WORKERS': str(args.workers),
+        'LOG_LEVEL': 'WARNING'
+    })
+    if args.worker_class:
+        env['GUNICORN_WORKER_CLASS'] = args.worker_class
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'app:app'],
+        cwd=BACKEND, env=env, start_new_session=True,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/livez", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    os.killpg(process.pid, signal.SIGKILL)
+    raise RuntimeError('gunicorn did not start')
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.first_snapshot = []
+        self.arrivals = []  # perf_counter() of each participant change delivered
+        self.events = 0
+
+    def status(self, code):
+        with self.lock:
+            self.statuses[code] = self.statuses.get(code, 0) + 1
+
+
+def subscriber(base_url, headers, stop, results):
+    started = time.perf_counter()
+    try:
+        response = requests.get(f"{base_url}/livekit/events", headers=headers, stream=True, timeout=(10, 30))
+    except requests.RequestException:
+        results.status('error')
+        return
+    results.status(response.status_code)
+    if response.status_code != 200:
+        response.close()
+        return
+
+    buffer = b''
+    try:
+        for chunk in response.iter_content(chunk_size=None):
+            now = time.perf_counter()
+            buffer += chunk
+            *blocks, buffer = buffer.split(b'\n\n')
+            with results.lock:
+                for block in blocks:
+                    if b'event: snapshot' in block:
+                        results.first_snapshot.append(now - started)
+                    elif b'event: participants_changed' in block:
+                        results.events += 1
+                        results.arrivals.append(now)
+            if stop.is_set():
+                break
+    except requests.RequestException:
+        pass
+    finally:
+        response.close()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--changes', type=int, default=50, help='participant changes per tick')
+    parser.add_argument('--interval', type=float, default=0.5, help='watcher poll interval (s)')
+    parser.add_argument('--tick', type=float, default=1.0, help='seconds between upstream changes')
+    parser.add_argument('--client-poll', type=float, default=5.0, help='interval clients would poll at (s)')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', default=None, help='gevent or gthread (default: the gunicorn.conf.py default)')
+    parser.add_argument('--verbose', action='store_true', help="show gunicorn's log")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    livekit = CountingLiveKit(rooms=args.rooms, latency=0.005)
+    supabase = FakeSupabase()
+    livekit.start()
+    supabase.start()
+    process, base_url = start_gunicorn(livekit, supabase, args)
+    try:
+        session = requests.post(f"{base_url}/auth/signin", json={'email': 'sse@example.com', 'password': 'secret'}).json()['session']
+        headers = {'Authorization': f"Bearer {session['access_token']}"}
+
+        stop = threading.Event()
+        results = Results()
+        threads = [
+            threading.Thread(target=subscriber, args=(base_url, headers, stop, results), daemon=True)
+            for _ in range(args.subscribers)
+        ]
+        for thread in threads:
+            thread.start()
+        # Let every stream connect and receive its snapshot before changes start
+        time.sleep(max(2.0, args.interval * 4))
+
+        list_calls_before = livekit.list_calls
+        changed_at = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            livekit.mutate(rng, args.changes)
+            changed_at.append(time.perf_counter())
+            time.sleep(args.tick)
+        time.sleep(args.interval * 2)
+        stop.set()
+        list_calls = livekit.list_calls - list_calls_before
+        for thread in threads:
+            thread.join(timeout=args.tick + 5)
+
+        # Each delivery is attributed to the latest upstream change before it
+        latencies = []
+        for arrival in results.arrivals:
+            previous = [t for t in changed_at if t <= arrival]
+            if previous:
+                latencies.append(arrival - previous[-1])
+    finally:
+        # Quick shutdown: a graceful one would wait out the open streams
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        livekit.stop()
+        supabase.stop()
+
+    admitted = results.statuses.get(200, 0)
+    polling_calls = int(args.subscribers * args.duration / args.client_poll)
+    print(f"worker class:          {args.worker_class or 'gunicorn.conf.py default'} x {args.workers}")
+    print(f"subscribers:           {args.subscribers}")
+    print(f"responses:             {', '.join(f'{code}: {count}' for code, count in sorted(results.statuses.items(), key=str))}")
+    print(f"rooms:                 {args.rooms}")
+    print(f"events delivered:      {results.events} ({results.events / max(admitted, 1):.1f} per admitted stream)")
+    print(f"first snapshot p50:    {statistics.median(results.first_snapshot) * 1000 if results.first_snapshot else 0:.2f} ms")
+    print(f"fan-out latency p50:   {statistics.median(latencies) * 1000 if latencies else 0:.2f} ms")
+    print(f"fan-out latency p99:   {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"upstream ListRooms:    {list_calls} (per-client polling every {args.client_poll}s: {polling_calls})")
+
+
+if __name__ == '__main__':
+    main()
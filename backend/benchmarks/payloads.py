@@ -0,0 +1,67 @@
+"""
+Synthetic LiveKit payloads shared by the benchmark scripts.
+"""
+
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+SUBJECTS = ['Math Tutoring', 'Physics', 'Chemistry', 'Biology', 'English', 'History', 'Computer Science']
+TUTOR_TYPES = ['AI Tutor', 'Human Tutor']
+
+
+def make_rooms(count, seed=42):
+    """Build ListRooms-shaped room dicts as returned by the Twirp JSON API"""
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 1)
+    rooms = []
+    for i in range(count):
+        created = start + timedelta(seconds=rng.randint(0, 86400 * 30))
+        metadata = {
+            'subject': rng.choice(SUBJECTS),
+            'tutorType': rng.choice(TUTOR_TYPES),
+            'createdBy': str(uuid.UUID(int=rng.getrandbits(128))),
+            'createdAt': created.isoformat(),
+            'sessionType': 'tutoring'
+        }
+        rooms.append({
+            'sid': f"RM_{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}",
+            'name': f"room-{i:06d}",
+            'emptyTimeout': 300,
+            'maxParticipants': rng.choice([2, 4, 8]),
+            'creationTime': str(int(created.timestamp())),
+            'turnPassword': '',
+            'enabledCodecs': [{'mime': 'audio/opus'}, {'mime': 'video/VP8'}, {'mime': 'video/H264'}],
+            'metadata': json.dumps(metadata),
+            'numParticipants': rng.randint(0, 4),
+            'numPublishers': rng.randint(0, 2),
+            'activeRecording': False
+        })
+    return rooms
+
+
+def format_room(room):
+    """Format a room the same way /livekit/active-rooms does"""
+    try:
+        metadata = json.loads(room.get('metadata', '{}'))
+    except ValueError:
+        metadata = {}
+    return {
+        'roomName': room.get('name'),
+        'roomId': room.get('sid'),
+        'numParticipants': room.get('numParticipants', 0),
+        'maxParticipants': room.get('maxParticipants', 2),
+        'creationTime': room.get('creationTime'),
+        'subject': metadata.get('subject', 'Unknown'),
+        'tutorType': metadata.get('tutorType', 'AI Tutor'),
+        'sessionType': metadata.get('sessionType', 'tutoring'),
+        'createdBy': metadata.get('createdBy'),
+        'metadata': metadata
+    }
+
+
+def active_rooms_response(count, seed=42):
+    """Full /livekit/active-rooms response body for ``count`` rooms"""
+    rooms = [format_room(room) for room in make_rooms(count, seed)]
+    return {'success': True, 'rooms': rooms, 'totalRooms': len(rooms)}
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Memory soak test: drive a mix of routes for a long time and report growth.
+
+Starts the upstream fakes and the app as load_routes.py does, with the
+memory profiler enabled (MEMORY_PROFILER_ENABLED). --concurrency client
+threads cycle through --scenarios until --duration seconds have passed.
+Every --sample-every seconds, the worker's RSS and traced memory are read
+from the `memory` section of /health.
+
+At the end it prints:
+  - RSS and traced growth after the --warm-up period, and their slope in MB
+    per hour (least squares)
+  - the source lines that grew most since the first tracemalloc snapshot,
+    from /debug/memory
+  - memory retained per route in the sampled requests
+  - live object counts by type
+Pass --no-profiler to measure RSS alone, without tracemalloc's overhead.
+
+Usage:
+    python benchmarks/soak_memory.py --duration 600 --concurrency 8
+    python benchmarks/soak_memory.py --duration 120 --no-profiler
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeLiveKit, FakeSTT, FakeSupabase
+from benchmarks.load_routes import SCENARIOS, Context, start_app
+
+DEFAULT_SCENARIOS = [
+    'profile.get', 'profile.put', 'livekit.active-rooms', 'livekit.room-info', 'livekit.create-room',
+    'livekit.generate-token', 'stt.transcribe', 'auth.signin', 'health'
+]
+SOAK_EMAIL = 'load@example.com'
+
+
+def slope_per_hour(samples):
+    """Least-squares slope of (seconds, bytes) samples, in MB per hour"""
+    if len(samples) < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in samples) / len(samples)
+    mean_v = sum(v for _, v in samples) / len(samples)
+    variance = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not variance:
+        return 0.0
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in samples) / variance
+    return slope * 3600 / 2 ** 20
+
+
+def drive(ctx, names, concurrency, stop, counts):
+    cycle = itertools.cycle(names)
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while not stop.is_set():
+            with lock:
+                name = next(cycle)
+            method, path_fn, kwargs_fn, expected = SCENARIOS[name]
+            try:
+                response = session.request(method, ctx.base_url + path_fn(ctx), timeout=30, **kwargs_fn(ctx))
+                response.close()
+                ok = response.status_code in expected
+            except requests.RequestException:
+                ok = False
+            with lock:
+                counts['requests'] += 1
+                counts['errors'] += not ok
+        session.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=300, help='seconds')
+    parser.add_argument('--warm-up', type=float, default=30, help='seconds excluded from growth')
+    parser.add_argument('--sample-every', type=float, default=5, help='seconds between /health reads')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--upstream-latency', type=float, default=5, help='ms')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--no-profiler', action='store_true')
+    args = parser.parse_args()
+
+    # Config classes read the environment when start_app imports them
+    os.environ.update({
+        'MEMORY_PROFILER_ENABLED': str(not args.no_profiler),
+        'MEMORY_SNAPSHOT_INTERVAL': str(max(args.duration / 10, 5)),
+        # Growth over the whole run needs tracemalloc running throughout
+        'MEMORY_TRACE_WINDOW': '0',
+        'MEMORY_TOP_N': str(args.top),
+        'MEMORY_SAMPLE_RATE': '0.1',
+        'PROFILER_ROLE': 'admin'
+    })
+    livekit = FakeLiveKit(rooms=args.rooms, latency=args.upstream_latency / 1000).start()
+    supabase = FakeSupabase(latency=args.upstream_latency / 1000).start()
+    supabase._user(SOAK_EMAIL)['app_metadata']['role'] = 'admin'
+    server, base_url = start_app(livekit, supabase, FakeSTT(latency=0.01))
+    ctx = Context(base_url, args.rooms)
+
+    stop, counts = threading.Event(), {'requests': 0, 'errors': 0}
+    began = time.monotonic()
+    threads = drive(ctx, args.scenarios, args.concurrency, stop, counts)
+    rss, traced = [], []
+    print(f"{'s':>6} {'requests':>9} {'errors':>7} {'RSS MB':>8} {'traced MB':>10}")
+    while time.monotonic() - began < args.duration:
+        time.sleep(args.sample_every)
+        memory = requests.get(f"{base_url}/health", timeout=30).json()['memory']
+        elapsed = time.monotonic() - began
+        if elapsed >= args.warm_up:
+            rss.append((elapsed, memory['rssBytes']))
+            if 'tracedBytes' in memory:
+                traced.append((elapsed, memory['tracedBytes']))
+        traced_mb = f"{memory['tracedBytes'] / 2**20:>10.1f}" if 'tracedBytes' in memory else f"{'-':>10}"
+        print(f"{elapsed:>6.0f} {counts['requests']:>9} {counts['errors']:>7} {memory['rssBytes'] / 2**20:>8.1f} {traced_mb}")
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - began
+
+    print(f"\n{counts['requests'] / wall:.1f} req/s over {wall:.0f} s, {counts['errors']} errors")
+    for label, samples in (('RSS', rss), ('traced', traced)):
+        if len(samples) >= 2:
+            growth = (samples[-1][1] - samples[0][1]) / 2**20
+            print(f"{label:>7} growth after warm-up: {growth:+.1f} MB ({slope_per_hour(samples):+.1f} MB/hour)")
+
+    if not args.no_profiler:
+        report = requests.get(f"{base_url}/debug/memory", params={'snapshot': 'true', 'objects': 'true'},
+                              headers=ctx.auth, timeout=120).json()
+        print('\ngrowth since the first snapshot:')
+        for line in report['sinceBaseline']:
+            print(f"  {line['sizeDiff'] / 1024:>9.1f} KiB {line['countDiff']:>+8} blocks  {line['where']}")
+        print('\nretained per sampled request:')
+        for endpoint, stats in report['routes'].items():
+            print(f"  {endpoint:<40} {stats['samples']:>6} samples  avg {stats['avgNetBytes'] / 1024:>8.1f} KiB"
+                  f"  max {stats['maxNetBytes'] / 1024:>8.1f} KiB")
+        print(f"\ngc collections {report['gcCollections']}, pause ms {report['gcPauseMs']}, "
+              f"uncollectable {[g['uncollectable'] for g in report['gc']['generations']]}")
+        print('\nlive objects:')
+        for entry in report['objects']:
+            print(f"  {entry['count']:>9}  {entry['type']}")
+
+    server.shutdown()
+    livekit.stop()
+    supabase.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,160 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')  # enables local token checks while Supabase is down
+    
+    # LiveKit settings
+    LIVEKIT_API_KEY = os.getenv('LIVEKIT_API_KEY')
+    LIVEKIT_API_SECRET = os.getenv('LIVEKIT_API_SECRET')
+    LIVEKIT_SERVER_URL = os.getenv('LIVEKIT_SERVER_URL', 'wss://your-livekit-server.com')
+    LIVEKIT_TIMEOUT = float(os.getenv('LIVEKIT_TIMEOUT', 10))  # seconds
+    # RoomService encoding: 'json', or 'protobuf' (needs livekit-protocol)
+    LIVEKIT_TRANSPORT = os.getenv('LIVEKIT_TRANSPORT', 'json')
+    # Optional JSON list of {"url", "apiKey", "apiSecret"}; replaces the single server above
+    LIVEKIT_SERVERS = os.getenv('LIVEKIT_SERVERS')
+    LIVEKIT_SHARD_LOAD_TTL = float(os.getenv('LIVEKIT_SHARD_LOAD_TTL', 5))  # seconds
+    
+    # Request deadlines: every request gets a time budget, and each Supabase
+    # or LiveKit call made for it gets only what is left (0 disables)
+    REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 15))  # seconds
+    REQUEST_DEADLINES = {  # per endpoint, overriding REQUEST_DEADLINE
+        'assemblyai_stt.transcribe_audio': float(os.getenv('REQUEST_DEADLINE_TRANSCRIBE', 600)),
+        'livekit.room_events': 0,  # long-lived event stream
+    }
+    
+    # Request body limits (bytes): a larger Content-Length gets 413 before
+    # anything is read, and a chunked body is cut off once it passes the limit
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 1024 * 1024))
+    BODY_LIMITS = {  # per endpoint, overriding MAX_CONTENT_LENGTH
+        'assemblyai_stt.transcribe_audio': int(os.getenv('STT_MAX_UPLOAD_BYTES', 200 * 1024 * 1024)),
+        'livekit.append_room_history': int(os.getenv('ROOM_HISTORY_MAX_BODY_BYTES', 4 * 1024 * 1024)),
+    }
+    
+    # Hedged reads: ListRooms and profile selects slower than the recent p95
+    # get a second identical request, first answer wins
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'False').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))
+    HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', 0.1))  # share of recent calls that may be hedged
+    
+    # Circuit breakers around Supabase and LiveKit
+    CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+    CIRCUIT_WINDOW = float(os.getenv('CIRCUIT_WINDOW', 30))  # seconds
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 10))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))
+    
+    # Last known profiles, served while Supabase is unavailable
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', 300))  # seconds
+    
+    # Shared caches: a per-process L1 in front of an optional shared L2,
+    # 'sqlite' (workers on one host), 'redis' (across nodes) or 'memory' (L1
+    # only, for a single worker: Idempotency-Key replays are not shared)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+    CACHE_PATH = os.getenv('CACHE_PATH', 'cache.db')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_POLL_INTERVAL = float(os.getenv('CACHE_POLL_INTERVAL', 0.2))  # seconds, sqlite invalidation log
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', 30))  # seconds a verified token is trusted, 0 disables
+    ROOM_CACHE_SIZE = int(os.getenv('ROOM_CACHE_SIZE', 1000))
+    ROOM_CACHE_TTL = float(os.getenv('ROOM_CACHE_TTL', 1))  # seconds room listings are reused, 0 disables
+    
+    # Room listing and change stream settings
+    ROOM_WATCH_INTERVAL = float(os.getenv('ROOM_WATCH_INTERVAL', 2))  # seconds
+    ROOM_WATCH_HISTORY = int(os.getenv('ROOM_WATCH_HISTORY', 1000))  # events
+    # /livekit/events streams per worker, 0 for no limit; under gthread each holds
+    # one of its GUNICORN_THREADS (gunicorn.conf.py raises it for gevent workers)
+    ROOM_WATCH_MAX_SUBSCRIBERS = int(os.getenv('ROOM_WATCH_MAX_SUBSCRIBERS', 4))
+    ROOM_WATCH_RETRY_AFTER = int(os.getenv('ROOM_WATCH_RETRY_AFTER', 30))  # seconds, when streams are full
+    
+    # Chat and whiteboard history (/livekit/room/<room_name>/history)
+    ROOM_HISTORY_PATH = os.getenv('ROOM_HISTORY_PATH', 'room_history.db')
+    ROOM_HISTORY_BATCH_SIZE = int(os.getenv('ROOM_HISTORY_BATCH_SIZE', 500))  # events per insert transaction
+    ROOM_HISTORY_FLUSH_INTERVAL = float(os.getenv('ROOM_HISTORY_FLUSH_INTERVAL', 0.5))  # seconds
+    ROOM_HISTORY_BUFFER_SIZE = int(os.getenv('ROOM_HISTORY_BUFFER_SIZE', 50000))  # unwritten events
+    ROOM_HISTORY_SNAPSHOT_EVERY = int(os.getenv('ROOM_HISTORY_SNAPSHOT_EVERY', 500))  # events
+    ROOM_HISTORY_CHAT_MESSAGES = int(os.getenv('ROOM_HISTORY_CHAT_MESSAGES', 200))  # kept in snapshots
+    ROOM_HISTORY_MAX_DELTA = int(os.getenv('ROOM_HISTORY_MAX_DELTA', 1000))  # events before a snapshot is sent
+    # Users given a token for a room (or who created it) may use its history
+    ROOM_MEMBER_TTL = float(os.getenv('ROOM_MEMBER_TTL', 86400))  # seconds
+    ROOM_MEMBERS_CACHE_SIZE = int(os.getenv('ROOM_MEMBERS_CACHE_SIZE', 10000))
+    ROOM_INDEX_TTL = float(os.getenv('ROOM_INDEX_TTL', 2))  # seconds
+    ROOM_METADATA_CACHE_SIZE = int(os.getenv('ROOM_METADATA_CACHE_SIZE', 50000))
+
+    # Session analytics (/livekit/analytics): counters folded from room polls and webhooks
+    ANALYTICS_ENABLED = os.getenv('ANALYTICS_ENABLED', 'False').lower() == 'true'
+    ANALYTICS_PATH = os.getenv('ANALYTICS_PATH', 'analytics.db')
+    ANALYTICS_POLL_INTERVAL = float(os.getenv('ANALYTICS_POLL_INTERVAL', 30))  # seconds, 0 for webhooks only
+    ANALYTICS_BUCKET_SECONDS = int(os.getenv('ANALYTICS_BUCKET_SECONDS', 3600))
+    ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', 90))
+    # Supabase app_metadata roles that may read /livekit/analytics
+    ANALYTICS_ROLES = {role.strip() for role in os.getenv('ANALYTICS_ROLES', 'tutor,admin').split(',') if role.strip()}
+    ACTIVE_ROOMS_DEFAULT_LIMIT = int(os.getenv('ACTIVE_ROOMS_DEFAULT_LIMIT', 100))
+    ACTIVE_ROOMS_MAX_LIMIT = int(os.getenv('ACTIVE_ROOMS_MAX_LIMIT', 500))
+    
+    # Room creation: Idempotency-Key replay store and pre-created room pool
+    IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', 600))  # seconds
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', 10000))
+    ROOM_POOL_SIZE = int(os.getenv('ROOM_POOL_SIZE', 0))  # rooms per worker, 0 disables the pool
+    ROOM_POOL_MAX_PARTICIPANTS = int(os.getenv('ROOM_POOL_MAX_PARTICIPANTS', 2))
+    ROOM_POOL_EMPTY_TIMEOUT = int(os.getenv('ROOM_POOL_EMPTY_TIMEOUT', 3600))  # seconds
+    ROOM_POOL_MAX_AGE = float(os.getenv('ROOM_POOL_MAX_AGE', 3000))  # seconds, below the empty timeout
+    
+    # Rate limiting (token buckets per user id, or per IP when unauthenticated)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    # 'sqlite' (workers of one host), 'redis' (across nodes) or 'memory' (per
+    # process: each worker grants the full budget)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite')
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', 'rate_limits.db')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))  # proxies whose X-Forwarded-* headers are honoured
+    RATE_LIMITS = {
+        'transcribe': os.getenv('RATE_LIMIT_TRANSCRIBE', '10/minute'),
+        'create_room': os.getenv('RATE_LIMIT_CREATE_ROOM', '20/minute'),
+        'signin': os.getenv('RATE_LIMIT_SIGNIN', '10/minute'),
+        'room_history': os.getenv('RATE_LIMIT_ROOM_HISTORY', '120/minute')
+    }
+    
+    # Readiness probe (/readyz, /livekit/health)
+    HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 10))  # seconds
+    HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', 2))  # seconds
+    
+    # Sampling profiler (/debug/cpu-profile), restricted to users whose
+    # Supabase app_metadata grants PROFILER_ROLE
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'False').lower() == 'true'
+    PROFILER_ROLE = os.getenv('PROFILER_ROLE', 'admin')
+    PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', 30))
+    
+    # Memory instrumentation (/debug/memory, also for PROFILER_ROLE, and
+    # `memory` in /health): tracemalloc snapshot diffs, allocation samples
+    # per route and gc timings per worker. tracemalloc slows every
+    # allocation while it runs, so it is off by default
+    MEMORY_PROFILER_ENABLED = os.getenv('MEMORY_PROFILER_ENABLED', 'False').lower() == 'true'
+    MEMORY_SNAPSHOT_INTERVAL = float(os.getenv('MEMORY_SNAPSHOT_INTERVAL', 300))  # seconds
+    MEMORY_TRACE_WINDOW = float(os.getenv('MEMORY_TRACE_WINDOW', 30))  # seconds traced per interval, 0 traces continuously
+    MEMORY_TOP_N = int(os.getenv('MEMORY_TOP_N', 20))  # source lines per snapshot diff
+    MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', 1))  # traceback depth kept per allocation
+    MEMORY_SAMPLE_RATE = float(os.getenv('MEMORY_SAMPLE_RATE', 0.05))  # share of requests counted per route
+    
+    # Segmented transcription: long WAV uploads are split at silences and
+    # the segments transcribed in parallel
+    STT_SEGMENTED = os.getenv('STT_SEGMENTED', 'False').lower() == 'true'
+    STT_SEGMENT_WORKERS = int(os.getenv('STT_SEGMENT_WORKERS', 4))  # per worker process, 0 disables
+    STT_SEGMENT_MIN_AUDIO_SECONDS = float(os.getenv('STT_SEGMENT_MIN_AUDIO_SECONDS', 60))
+    STT_SEGMENT_TARGET_SECONDS = float(os.getenv('STT_SEGMENT_TARGET_SECONDS', 30))
+    STT_SEGMENT_MAX_SECONDS = float(os.getenv('STT_SEGMENT_MAX_SECONDS', 60))
+    STT_VAD_MIN_SILENCE_MS = int(os.getenv('STT_VAD_MIN_SILENCE_MS', 300))
+    STT_VAD_MARGIN_DB = float(os.getenv('STT_VAD_MARGIN_DB', 12))  # above the noise floor
+    
+    # Transcript store behind /assemblyai_stt/transcripts/search
+    TRANSCRIPT_STORE_ENABLED = os.getenv('TRANSCRIPT_STORE_ENABLED', 'False').lower() == 'true'
+    TRANSCRIPT_STORE_PATH = os.getenv('TRANSCRIPT_STORE_PATH', 'transcripts.db')
+    TRANSCRIPT_BATCH_SIZE = int(os.getenv('TRANSCRIPT_BATCH_SIZE', 500))
+    TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv('TRANSCRIPT_FLUSH_INTERVAL', 1))  # seconds
+    TRANSCRIPT_BUFFER_SIZE = int(os.getenv('TRANSCRIPT_BUFFER_SIZE', 50000))  # unwritten utterances per worker
+    
+    # Warm-up settings
+    WARM_UP_STT = os.getenv('WARM_UP_STT', 'False').lower() == 'true'
     
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
@@ -25,9 +179,21 @@ class Config:
     JWT_SECRET = os.getenv('JWT_SECRET', 'your-jwt-secret-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hour
     
+    # Session registry: refresh coalescing and sign-out revocation
+    SESSION_STORE_BACKEND = os.getenv('SESSION_STORE_BACKEND', 'sqlite')  # 'sqlite', or 'memory' for one worker
+    SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', 'sessions.db')
+    SESSION_REFRESH_TTL = float(os.getenv('SESSION_REFRESH_TTL', 10))  # seconds a refreshed pair is reused
+    SESSION_REVOCATION_TTL = float(os.getenv('SESSION_REVOCATION_TTL', JWT_ACCESS_TOKEN_EXPIRES))  # seconds
+    
     # Logging configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
     
+    # Response compression settings
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))  # bytes
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))  # gzip 1-9
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))  # brotli 0-11
+    
     @classmethod
     def validate_required_config(cls):
         """Validate that required configuration values are present"""
@@ -58,11 +224,16 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     LOG_LEVEL = 'DEBUG'
+    RATE_LIMIT_ENABLED = False
+    RATE_LIMIT_BACKEND = 'memory'
+    SESSION_STORE_BACKEND = 'memory'
+    CACHE_BACKEND = 'memory'
 
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
-    'default': DevelopmentConfig
+    # Debug stays off unless FLASK_DEBUG=True, as it was before the classes were used
+    'default': Config
 }
\ No newline at end of file
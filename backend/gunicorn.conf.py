@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration.
+
+The app is imported once in the master (preload_app) and each worker then
+creates its own upstream clients in post_fork, so no sockets are shared
+across processes and the first request does not pay for initialisation.
+
+Workers are gevent when it is installed: a /livekit/events stream then
+costs a greenlet rather than one of a fixed number of threads, so each
+worker can hold hundreds of subscribers. Without gevent, gthread workers
+admit only ROOM_WATCH_MAX_SUBSCRIBERS (4) streams each.
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+from importlib.util import find_spec
+
+
+def _default_worker_class():
+    return 'gevent' if find_spec('gevent') else 'gthread'
+
+
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}"
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS') or _default_worker_class()
+# gthread: each /livekit/events stream holds a thread; ROOM_WATCH_MAX_SUBSCRIBERS
+# (4) keeps the rest free for other routes, so raise both together
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# gevent: concurrent connections per worker, streams included
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+preload_app = True
+
+if worker_class == 'gevent':
+    # Patch before preload_app imports the app, so the locks and sockets it
+    # creates at import time are cooperative too
+    from gevent import monkey
+    monkey.patch_all()
+    # Leave a quarter of the connections for other routes
+    os.environ.setdefault('ROOM_WATCH_MAX_SUBSCRIBERS', str(worker_connections * 3 // 4))
+
+
+def post_fork(server, worker):
+    from app import app, warm_up
+    warm_up(app)
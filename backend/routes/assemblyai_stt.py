@@ -1,33 +1,118 @@
-from flask import Blueprint, request, jsonify
-from livekit.plugins import assemblyai
-from livekit.agents import AgentSession
-import os
-import tempfile
+from flask import Blueprint, current_app, request, jsonify
+
+from utils.auth import optional_auth, require_auth
+from utils.rate_limit import rate_limit
+from utils.transcript_store import get_transcript_store
+from utils.transcription import get_transcription_pool, transcribe_segmented
+from utils.uploads import AudioUpload, accepts_upload
 
 assemblyai_stt_bp = Blueprint('assemblyai_stt', __name__)
 
+def load_stt_sdk():
+    """
+    Import the LiveKit agents SDK and AssemblyAI plugin on first use.
+    They are large, so importing them lazily keeps worker start-up fast.
+    """
+    from livekit.plugins import assemblyai
+    from livekit.agents import AgentSession
+    return AgentSession, assemblyai
+
+def wants_segmented():
+    """
+    Segmented transcription is on when STT_SEGMENT_WORKERS > 0, and a request
+    can opt in or out with a ``segmented`` form field; the default is
+    STT_SEGMENTED
+    """
+    if current_app.config['STT_SEGMENT_WORKERS'] <= 0:
+        return False
+    value = request.form.get('segmented')
+    if value is None:
+        return current_app.config['STT_SEGMENTED']
+    return value.lower() in ('1', 'true', 'yes')
+
+def current_user_id():
+    user = getattr(request, 'current_user', None)
+    if user is None:
+        return None
+    return user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+
+def save_transcript(result):
+    """
+    Keep the transcript of a signed-in caller who names the room it was
+    recorded in (form field ``roomName``), when the transcript store is enabled
+    """
+    store = get_transcript_store()
+    user_id = current_user_id()
+    room_name = request.form.get('roomName')
+    if store is None or not user_id or not room_name:
+        return
+    segments = result.get('segments') or [{'text': result['transcript']}]
+    store.append(room_name, user_id, segments)
+
 @assemblyai_stt_bp.route('/transcribe', methods=['POST'])
+@optional_auth
+@rate_limit('transcribe')
+@accepts_upload(AudioUpload)
 def transcribe_audio():
+    # Parsing streams the upload into a temporary file, rejecting it with
+    # 415 from its first bytes if it is not audio (see utils/uploads.py)
     if 'file' not in request.files:
         return jsonify({'error': 'No file part in the request'}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-
-    # Save the uploaded file to a temporary location
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-        file.save(temp_audio)
-        temp_audio_path = temp_audio.name
+    # Deleted when the request is closed
+    temp_audio_path = file.stream.name
 
     try:
-        # Set up the session
-        session = AgentSession(
-            stt=assemblyai.STT(),
-        )
-        # Transcribe the audio file
-        transcript = session.stt.transcribe(temp_audio_path)
-        return jsonify({'transcript': transcript})
+        AgentSession, assemblyai = load_stt_sdk()
+
+        def transcribe(path):
+            # Set up the session
+            session = AgentSession(
+                stt=assemblyai.STT(),
+            )
+            return session.stt.transcribe(path)
+
+        result = None
+        if wants_segmented():
+            config = current_app.config
+            result = transcribe_segmented(
+                temp_audio_path,
+                transcribe,
+                get_transcription_pool(),
+                min_audio_seconds=config['STT_SEGMENT_MIN_AUDIO_SECONDS'],
+                target_seconds=config['STT_SEGMENT_TARGET_SECONDS'],
+                max_seconds=config['STT_SEGMENT_MAX_SECONDS'],
+                min_silence_ms=config['STT_VAD_MIN_SILENCE_MS'],
+                margin_db=config['STT_VAD_MARGIN_DB']
+            )
+        if result is None:
+            # Transcribe the audio file
+            result = {'transcript': transcribe(temp_audio_path)}
+
+        save_transcript(result)
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        os.remove(temp_audio_path) 
\ No newline at end of file
+
+@assemblyai_stt_bp.route('/transcripts/search', methods=['GET'])
+@require_auth
+def search_transcripts():
+    """
+    Search the caller's stored transcripts: ?q=words[&room=name][&limit=20]
+    """
+    store = get_transcript_store()
+    if store is None:
+        return jsonify({'error': 'Transcript search is not enabled'}), 404
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    results = store.search(query, current_user_id(), room_name=request.args.get('room'), limit=limit)
+    return jsonify({'results': results, 'count': len(results)})
@@ -1,18 +1,15 @@
 from flask import Blueprint, request, jsonify
-from supabase import create_client
-import os
 import logging
 from datetime import datetime
-from utils.auth import require_auth
+from utils.auth import require_auth, get_shared_supabase_client, supabase_unavailable
+from utils.cache import get_cache
+from utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from utils.session_store import get_session_registry, token_key, token_session
+from utils.rate_limit import rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 logger = logging.getLogger(__name__)
 
-# Initialize Supabase client
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_ANON_KEY')
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     """User registration"""
@@ -35,7 +32,7 @@ def signup():
         
         # Sign up user with Supabase
         try:
-            signup_resp = supabase.auth.sign_up({
+            signup_resp = get_circuit_breaker('supabase').call(get_shared_supabase_client().auth.sign_up, {
                 "email": email,
                 "password": password,
                 "options": {"data": user_metadata} if user_metadata else {}
@@ -83,6 +80,8 @@ def signup():
                 }
             }), 201
             
+        except CircuitOpenError as e:
+            return supabase_unavailable(e)
         except Exception as supabase_error:
             logger.error(f"Supabase signup error: {str(supabase_error)}")
             error_message = str(supabase_error)
@@ -100,6 +99,7 @@ def signup():
         return jsonify({'error': 'Internal server error'}), 500
 
 @auth_bp.route('/signin', methods=['POST'])
+@rate_limit('signin')
 def signin():
     """User login"""
     try:
@@ -111,7 +111,7 @@ def signin():
             return jsonify({'error': 'Email and password required'}), 400
         
         try:
-            response = supabase.auth.sign_in_with_password({
+            response = get_circuit_breaker('supabase').call(get_shared_supabase_client().auth.sign_in_with_password, {
                 'email': email,
                 'password': password
             })
@@ -150,6 +150,8 @@ def signin():
             else:
                 return jsonify({'error': 'Invalid credentials'}), 401
                 
+        except CircuitOpenError as e:
+            return supabase_unavailable(e)
         except Exception as supabase_error:
             logger.error(f"Supabase signin error: {str(supabase_error)}")
             error_message = str(supabase_error)
@@ -175,8 +177,15 @@ def signout():
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
             
-            # Sign out with the specific session
-            supabase.auth.sign_out()
+            user = request.current_user
+            user_id = user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+            get_session_registry().revoke_user(user_id, token_session(token)[1])
+            # Revocation already rejects the token; this frees its cache entry
+            get_cache('tokens').delete(token_key(token))
+            
+            # Revoke this user's refresh tokens upstream; the shared client
+            # holds no per-user session, so sign out by the user's JWT
+            get_circuit_breaker('supabase').call(get_shared_supabase_client().auth.admin.sign_out, token)
             return jsonify({'message': 'Logout successful'}), 200
         else:
             return jsonify({'error': 'No active session found'}), 400
@@ -187,6 +196,28 @@ def signout():
         # since the client will remove the token anyway
         return jsonify({'message': 'Logout completed'}), 200
 
+def refresh_upstream(refresh_token):
+    """Exchange a refresh token with Supabase; None if it was rejected"""
+    response = get_circuit_breaker('supabase').call(get_shared_supabase_client().auth.refresh_session, refresh_token)
+    
+    if not (hasattr(response, 'session') and response.session):
+        return None
+    session = response.session
+    user = response.user
+    access_token = session.access_token if hasattr(session, 'access_token') else session.get('access_token')
+    issued_at, session_id = token_session(access_token)
+    
+    return {
+        'access_token': access_token,
+        'refresh_token': session.refresh_token if hasattr(session, 'refresh_token') else session.get('refresh_token'),
+        'issued_at': issued_at,
+        'session_id': session_id,
+        'user': {
+            'id': user.id if hasattr(user, 'id') else user.get('id'),
+            'email': user.email if hasattr(user, 'email') else user.get('email')
+        } if user else None
+    }
+
 @auth_bp.route('/refresh', methods=['POST'])
 def refresh_token():
     """Refresh access token using refresh token"""
@@ -198,26 +229,23 @@ def refresh_token():
             return jsonify({'error': 'Refresh token required'}), 400
         
         try:
-            response = supabase.auth.refresh_session(refresh_token)
+            # Tabs refreshing the same token at once share one upstream refresh
+            session = get_session_registry().refresh(refresh_token, refresh_upstream)
             
-            if hasattr(response, 'session') and response.session:
-                session = response.session
-                user = response.user
-                
+            if session:
                 return jsonify({
                     'message': 'Token refreshed successfully',
                     'session': {
-                        'access_token': session.access_token if hasattr(session, 'access_token') else session.get('access_token'),
-                        'refresh_token': session.refresh_token if hasattr(session, 'refresh_token') else session.get('refresh_token')
+                        'access_token': session['access_token'],
+                        'refresh_token': session['refresh_token']
                     },
-                    'user': {
-                        'id': user.id if hasattr(user, 'id') else user.get('id'),
-                        'email': user.email if hasattr(user, 'email') else user.get('email')
-                    } if user else None
+                    'user': session['user']
                 }), 200
             else:
                 return jsonify({'error': 'Invalid refresh token'}), 401
                 
+        except CircuitOpenError as e:
+            return supabase_unavailable(e)
         except Exception as supabase_error:
             logger.error(f"Token refresh error: {str(supabase_error)}")
             return jsonify({'error': 'Invalid or expired refresh token'}), 401
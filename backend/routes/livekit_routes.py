@@ -1,15 +1,44 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_cors import cross_origin
 from functools import wraps
+import math
 import uuid
-import json
+import time
+import logging
 from datetime import datetime
 
-from utils.auth import require_auth
-from utils.livekit_service import LiveKitService
+from utils.auth import require_auth, user_roles
+from utils.cache import get_cache
+from utils.health import get_health_probe
+from utils.idempotency import idempotent
+from utils.livekit_service import get_livekit_service
+from utils.rate_limit import rate_limit
+from utils.room_analytics import WebhookError, get_room_analytics, verify_webhook, webhook_secrets
+from utils.room_history import MAX_EVENTS_PER_REQUEST, get_room_history, parse_event, serialize_event
+from utils.room_index import RoomIndex, decode_cursor, encode_cursor
+from utils.room_metadata import FILTER_FIELDS, RoomMetadataCache
+from utils.room_pool import get_room_pool
+from utils.room_watcher import RoomWatcher, WatcherFullError
+from utils.single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
 
 livekit_bp = Blueprint('livekit', __name__)
-livekit_service = LiveKitService()
+
+@livekit_bp.record_once
+def init_room_state(state):
+    """Create the per-app room caches when the blueprint is registered"""
+    app = state.app
+    room_metadata = RoomMetadataCache(max_entries=app.config['ROOM_METADATA_CACHE_SIZE'])
+    app.extensions['room_metadata'] = room_metadata
+    app.extensions['room_index'] = RoomIndex(room_metadata, ttl=app.config['ROOM_INDEX_TTL'])
+    app.extensions['room_watcher'] = RoomWatcher(
+        lambda: get_livekit_service(app),
+        interval=app.config['ROOM_WATCH_INTERVAL'],
+        history=app.config['ROOM_WATCH_HISTORY'],
+        max_subscribers=app.config['ROOM_WATCH_MAX_SUBSCRIBERS'] or None,
+        metadata_cache=room_metadata
+    )
 
 def handle_livekit_errors(f):
     """Decorator to handle LiveKit service errors"""
@@ -24,9 +53,61 @@ def handle_livekit_errors(f):
             }), 500
     return decorated_function
 
+def livekit_error_response(result, status_code=400):
+    """
+    Error response for a failed LiveKitService call. Calls rejected by the
+    open circuit breaker are shed with 503 and a Retry-After hint, and calls
+    the request deadline left no time for get 504.
+    """
+    response = jsonify({
+        'success': False,
+        'error': result['error']
+    })
+    response.status_code = status_code
+    if result.get('unavailable'):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, math.ceil(result.get('retryAfter', 0))))
+    elif result.get('deadlineExceeded'):
+        response.status_code = 504
+    return response
+
+def _current_user_id():
+    user = request.current_user
+    return user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+
+def record_room_member(room_name, user_id):
+    """Remember that a user created or was given a token for a room"""
+    if user_id:
+        get_cache('room_members').set(f"{room_name}\0{user_id}", True)
+
+def room_member_error(room_name):
+    """
+    Error response unless the current user belongs to the room: it was
+    given a token for the room or created it, as its metadata records
+    """
+    user_id = _current_user_id()
+    if user_id and get_cache('room_members').get(f"{room_name}\0{user_id}"):
+        return None
+    
+    result = get_livekit_service().get_room_info(room_name)
+    if not result['success'] and (result.get('unavailable') or result.get('deadlineExceeded')):
+        return livekit_error_response(result)
+    if result['success']:
+        room = result['room']
+        record = current_app.extensions['room_metadata'].get(room.get('sid'), room.get('metadata'))
+        if user_id and record.created_by == str(user_id):
+            record_room_member(room_name, user_id)
+            return None
+    return jsonify({
+        'success': False,
+        'error': 'You are not a participant of this room'
+    }), 403
+
 @livekit_bp.route('/create-room', methods=['POST'])
 @cross_origin(supports_credentials=True)
 @require_auth
+@idempotent
+@rate_limit('create_room')
 @handle_livekit_errors
 def create_room():
     """
@@ -51,6 +132,11 @@ def create_room():
         max_participants = data.get('maxParticipants', 2)
         subject = data.get('subject', 'General Tutoring')
         tutor_type = data.get('tutorType', 'AI Tutor')
+        if not isinstance(subject, str) or not isinstance(tutor_type, str):
+            return jsonify({
+                'success': False,
+                'error': 'subject and tutorType must be strings'
+            }), 400
         
         # Room metadata
         metadata = {
@@ -61,14 +147,26 @@ def create_room():
             'sessionType': 'tutoring'
         }
         
-        # Create room using LiveKit service
-        result = livekit_service.create_room(
-            room_name=room_name,
-            max_participants=max_participants,
-            metadata=metadata
-        )
+        # Unnamed rooms come from the pre-created pool when one is ready
+        pool = get_room_pool() if not data.get('roomName') else None
+        pooled_room = None
+        if pool is not None and max_participants == pool.max_participants:
+            pooled_room = pool.take(metadata)
+        
+        if pooled_room is not None:
+            room_name = pooled_room['name']
+            result = {'success': True, 'room': pooled_room}
+        else:
+            # Create room using LiveKit service
+            result = get_livekit_service().create_room(
+                room_name=room_name,
+                max_participants=max_participants,
+                metadata=metadata
+            )
         
         if result['success']:
+            current_app.extensions['room_index'].invalidate()
+            record_room_member(room_name, metadata['createdBy'])
             return jsonify({
                 'success': True,
                 'room': {
@@ -84,10 +182,7 @@ def create_room():
                 'message': 'Room created successfully'
             }), 201
         else:
-            return jsonify({
-                'success': False,
-                'error': result['error']
-            }), 400
+            return livekit_error_response(result, 400)
             
     except Exception as e:
         return jsonify({
@@ -146,7 +241,7 @@ def generate_token():
             })
         
         # Generate access token
-        access_token = livekit_service.generate_access_token(
+        access_token = get_livekit_service().generate_access_token(
             room_name=room_name,
             participant_name=participant_name,
             permissions=permissions
@@ -156,6 +251,7 @@ def generate_token():
             user_id = request.current_user.get('id')
         else:
             user_id = getattr(request.current_user, 'id', None)
+        record_room_member(room_name, user_id)
         
         return jsonify({
             'success': True,
@@ -167,7 +263,7 @@ def generate_token():
             },
             'room': {
                 'name': room_name,
-                'serverUrl': livekit_service.server_url
+                'serverUrl': get_livekit_service().server_url_for(room_name)
             },
             'expiresAt': datetime.utcnow().timestamp() + 3600  # 1 hour
         }), 200
@@ -184,43 +280,70 @@ def generate_token():
 @handle_livekit_errors
 def get_active_rooms():
     """
-    List all active conference rooms
+    List active conference rooms, one page at a time when a limit or cursor
+    is given, otherwise all of them.
+    
+    Query parameters:
+        limit: page size (default ACTIVE_ROOMS_DEFAULT_LIMIT with a cursor, capped at ACTIVE_ROOMS_MAX_LIMIT)
+        cursor: nextCursor value from the previous page
+        subject, tutorType, createdBy, sessionType: exact-match filters
     """
     try:
-        result = livekit_service.list_active_rooms()
+        room_index = current_app.extensions['room_index']
+        room_metadata = current_app.extensions['room_metadata']
         
-        if result['success']:
-            # Filter and format rooms for response
-            formatted_rooms = []
-            for room in result['rooms']:
-                try:
-                    metadata = json.loads(room.get('metadata', '{}'))
-                except:
-                    metadata = {}
-                
-                formatted_rooms.append({
-                    'roomName': room.get('name'),
-                    'roomId': room.get('sid'),
-                    'numParticipants': room.get('numParticipants', 0),
-                    'maxParticipants': room.get('maxParticipants', 2),
-                    'creationTime': room.get('creationTime'),
-                    'subject': metadata.get('subject', 'Unknown'),
-                    'tutorType': metadata.get('tutorType', 'AI Tutor'),
-                    'sessionType': metadata.get('sessionType', 'tutoring'),
-                    'createdBy': metadata.get('createdBy'),
-                    'metadata': metadata
-                })
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid cursor'
+                }), 400
+        
+        # Clients that ask for neither a page size nor a cursor predate
+        # pagination and still get every room
+        limit = None
+        if 'limit' in request.args or cursor:
+            try:
+                limit = int(request.args.get('limit', current_app.config['ACTIVE_ROOMS_DEFAULT_LIMIT']))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'limit must be an integer'
+                }), 400
             
-            return jsonify({
-                'success': True,
-                'rooms': formatted_rooms,
-                'totalRooms': len(formatted_rooms)
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': result['error']
-            }), 400
+            if limit < 1:
+                return jsonify({
+                    'success': False,
+                    'error': 'limit must be positive'
+                }), 400
+            limit = min(limit, current_app.config['ACTIVE_ROOMS_MAX_LIMIT'])
+        
+        filters = {
+            field: request.args[field]
+            for field in FILTER_FIELDS
+            if field in request.args
+        }
+        
+        # Refresh the index from LiveKit at most once per ROOM_INDEX_TTL
+        if room_index.is_stale():
+            result = get_single_flight().do(('list_rooms',), get_livekit_service().list_active_rooms)
+            if not result['success']:
+                return livekit_error_response(result, 400)
+            room_index.update(result['rooms'])
+        
+        # Only rooms on this page have their metadata decoded and formatted
+        rooms, last_name, total = room_index.query(filters, limit=limit, after=after)
+        
+        return jsonify({
+            'success': True,
+            'rooms': [room_metadata.format_room(room) for room in rooms],
+            'totalRooms': total,
+            'nextCursor': encode_cursor(last_name) if last_name is not None else None
+        }), 200
             
     except Exception as e:
         return jsonify({
@@ -238,9 +361,11 @@ def delete_room(room_id):
     """
     try:
         # Get room info first to verify it exists and get the room name
-        result = livekit_service.list_active_rooms()
+        result = get_livekit_service().list_active_rooms()
         
         if not result['success']:
+            if result.get('unavailable') or result.get('deadlineExceeded'):
+                return livekit_error_response(result)
             return jsonify({
                 'success': False,
                 'error': 'Failed to verify room existence'
@@ -260,19 +385,17 @@ def delete_room(room_id):
             }), 404
         
         # Delete the room
-        delete_result = livekit_service.delete_room(room_name)
+        delete_result = get_livekit_service().delete_room(room_name)
         
         if delete_result['success']:
+            current_app.extensions['room_index'].invalidate()
             return jsonify({
                 'success': True,
                 'message': f'Room {room_name} ended successfully',
                 'roomId': room_id
             }), 200
         else:
-            return jsonify({
-                'success': False,
-                'error': delete_result['error']
-            }), 400
+            return livekit_error_response(delete_result, 400)
             
     except Exception as e:
         return jsonify({
@@ -289,35 +412,16 @@ def get_room_info(room_name):
     Get information about a specific room
     """
     try:
-        result = livekit_service.get_room_info(room_name)
+        # Participants joining a class at once share one RoomService call
+        result = get_single_flight().do(('room_info', room_name), get_livekit_service().get_room_info, room_name)
         
         if result['success']:
-            room = result['room']
-            try:
-                metadata = json.loads(room.get('metadata', '{}'))
-            except:
-                metadata = {}
-            
             return jsonify({
                 'success': True,
-                'room': {
-                    'roomName': room.get('name'),
-                    'roomId': room.get('sid'),
-                    'numParticipants': room.get('numParticipants', 0),
-                    'maxParticipants': room.get('maxParticipants', 2),
-                    'creationTime': room.get('creationTime'),
-                    'subject': metadata.get('subject', 'Unknown'),
-                    'tutorType': metadata.get('tutorType', 'AI Tutor'),
-                    'sessionType': metadata.get('sessionType', 'tutoring'),
-                    'createdBy': metadata.get('createdBy'),
-                    'metadata': metadata
-                }
+                'room': current_app.extensions['room_metadata'].format_room(result['room'])
             }), 200
         else:
-            return jsonify({
-                'success': False,
-                'error': result['error']
-            }), 404
+            return livekit_error_response(result, 404)
             
     except Exception as e:
         return jsonify({
@@ -325,22 +429,223 @@ def get_room_info(room_name):
             'error': f'Failed to get room info: {str(e)}'
         }), 500
 
+@livekit_bp.route('/events', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@require_auth
+def room_events():
+    """
+    Server-Sent Events stream of room add/remove and participant-count changes.
+    All subscribers share one upstream poller, so clients no longer need to
+    poll /active-rooms or /room/<room_name>/info.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    
+    try:
+        stream = current_app.extensions['room_watcher'].stream(last_event_id)
+    except WatcherFullError as e:
+        # Each stream holds a request thread or greenlet; past the cap, clients fall back to polling
+        response = jsonify({'success': False, 'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(current_app.config['ROOM_WATCH_RETRY_AFTER'])
+        return response
+    
+    return Response(
+        stream,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@livekit_bp.route('/room/<room_name>/history', methods=['POST'])
+@cross_origin(supports_credentials=True)
+@require_auth
+@rate_limit('room_history')
+def append_room_history(room_name):
+    """
+    Record chat messages and whiteboard strokes for a room the caller
+    belongs to. The body is one event or {"events": [...]}, so clients can
+    batch strokes. Chat posted here is always from a user, never the AI.
+    """
+    error = room_member_error(room_name)
+    if error is not None:
+        return error
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    payloads = data.get('events') if 'events' in data else [data]
+    if not isinstance(payloads, list) or not 0 < len(payloads) <= MAX_EVENTS_PER_REQUEST:
+        return jsonify({
+            'success': False,
+            'error': f'events must be a list of 1 to {MAX_EVENTS_PER_REQUEST} events'
+        }), 400
+    
+    history = get_room_history()
+    try:
+        events = [parse_event(payload, history.scale) for payload in payloads]
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    stored = history.append(room_name, _current_user_id(), events)
+    return jsonify({
+        'success': True,
+        'ids': [str(event['id']) for event in stored]
+    }), 201
+
+@livekit_bp.route('/room/<room_name>/history', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@require_auth
+def get_room_history_events(room_name):
+    """
+    Chat and whiteboard history of a room. Without ?after= the response
+    starts with a compacted snapshot (recent chat, strokes since the last
+    clear); with ?after=<cursor> it holds only newer events. ?encoding=delta
+    returns stroke points delta-encoded instead of as [x, y] pairs. Only
+    the room's participants can read it.
+    """
+    error = room_member_error(room_name)
+    if error is not None:
+        return error
+    
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'after must be a cursor from a previous response'}), 400
+    encoding = request.args.get('encoding', 'absolute')
+    if encoding not in ('absolute', 'delta'):
+        return jsonify({'success': False, 'error': "encoding must be 'absolute' or 'delta'"}), 400
+    
+    history = get_room_history()
+    result = history.read(room_name, after)
+    
+    def serialize(events):
+        return [serialize_event(event, encoding, history.scale) for event in events]
+    
+    response = {
+        'success': True,
+        'events': serialize(result['events']),
+        'cursor': str(result['cursor']),
+        'encoding': encoding
+    }
+    if 'snapshot' in result:
+        response['snapshot'] = {
+            'chat': serialize(result['snapshot']['chat']),
+            'strokes': serialize(result['snapshot']['strokes']),
+            'cursor': str(result['snapshot']['cursor'])
+        }
+    return jsonify(response), 200
+
+@livekit_bp.route('/analytics', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@require_auth
+def get_room_analytics_rollup():
+    """
+    Room session stats per hour or per UTC day, merged from precomputed
+    buckets: rooms started (total and per subject), sessions ended with
+    their average and longest duration, and peak concurrent participants
+    and rooms.
+    
+    Query parameters:
+        days: how far back to go (default 7, at most ANALYTICS_RETENTION_DAYS)
+        bucket: 'hour' or 'day' (default 'day')
+    """
+    if not current_app.config['ANALYTICS_ROLES'] & user_roles(request.current_user):
+        return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
+    
+    analytics = get_room_analytics()
+    if analytics is None:
+        return jsonify({'success': False, 'error': 'Analytics is not enabled'}), 404
+    
+    try:
+        days = float(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'days must be a number'}), 400
+    if days <= 0:
+        return jsonify({'success': False, 'error': 'days must be positive'}), 400
+    days = min(days, current_app.config['ANALYTICS_RETENTION_DAYS'])
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('hour', 'day'):
+        return jsonify({'success': False, 'error': "bucket must be 'hour' or 'day'"}), 400
+    
+    now = time.time()
+    rollup = analytics.rollup(now - days * 86400, now, 3600 if bucket == 'hour' else 86400)
+    return jsonify({'success': True, 'bucket': bucket, 'days': days, **rollup}), 200
+
+@livekit_bp.route('/analytics/rooms', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@require_auth
+def get_room_analytics_rooms():
+    """
+    Per-room totals (sessions, peak participants, average and longest
+    session) with the room's live session, most recently active first.
+    
+    Query parameters:
+        room: a single room name
+        limit: number of rooms (default 50, at most 500)
+    """
+    if not current_app.config['ANALYTICS_ROLES'] & user_roles(request.current_user):
+        return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
+    
+    analytics = get_room_analytics()
+    if analytics is None:
+        return jsonify({'success': False, 'error': 'Analytics is not enabled'}), 404
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    rooms = analytics.room_stats(room_name=request.args.get('room'), limit=limit)
+    return jsonify({'success': True, 'rooms': rooms, 'count': len(rooms)}), 200
+
+@livekit_bp.route('/webhook', methods=['POST'])
+def livekit_webhook():
+    """
+    Receiver for LiveKit webhooks. Room and participant events feed room
+    analytics. The request is authenticated by the token LiveKit signs with
+    the server's API secret, not by a user session.
+    """
+    analytics = get_room_analytics()
+    if analytics is None:
+        return jsonify({'success': False, 'error': 'Analytics is not enabled'}), 404
+    
+    body = request.get_data()
+    try:
+        verify_webhook(body, request.headers.get('Authorization'), webhook_secrets(get_livekit_service()))
+    except WebhookError as e:
+        logger.warning(f"Rejected LiveKit webhook: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 401
+    
+    event = request.get_json(force=True, silent=True)
+    if not isinstance(event, dict):
+        return jsonify({'success': False, 'error': 'Webhook body must be a JSON object'}), 400
+    analytics.record_webhook(event)
+    return jsonify({'success': True}), 200
+
 # Health check endpoint for LiveKit service
 @livekit_bp.route('/health', methods=['GET'])
 @cross_origin(supports_credentials=True)
 def livekit_health():
     """
-    Check LiveKit service health
+    Check LiveKit service health from the cached background probe
     """
     try:
-        # Test connection by listing rooms
-        result = livekit_service.list_active_rooms()
+        checks = {
+            name: check for name, check in get_health_probe().snapshot().items()
+            if name.split(':', 1)[0] == 'livekit'
+        }
+        healthy = bool(checks) and all(check['ok'] for check in checks.values())
         
         return jsonify({
             'success': True,
             'service': 'LiveKit Video Service',
-            'status': 'healthy' if result['success'] else 'degraded',
-            'serverUrl': livekit_service.server_url,
+            'status': 'healthy' if healthy else 'degraded',
+            'serverUrl': get_livekit_service().server_url,
+            'probe': checks['livekit'] if list(checks) == ['livekit'] else checks,
+            'circuit': get_livekit_service().circuit_snapshot(),
             'timestamp': datetime.utcnow().isoformat()
         }), 200
         
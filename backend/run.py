@@ -6,28 +6,19 @@ This script provides a clean way to start the application with proper configurat
 
 import os
 import sys
-from dotenv import load_dotenv
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Load environment variables
-load_dotenv()
+# Importing config loads the .env file
+from config import config
 
-def check_environment():
+def check_environment(config_name):
     """Check if all required environment variables are set"""
-    required_vars = [
-        'SUPABASE_URL',
-        'SUPABASE_ANON_KEY'
-    ]
-    
-    missing_vars = []
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_vars.append(var)
-    
-    if missing_vars:
-        print(f"Error: Missing required environment variables: {', '.join(missing_vars)}")
+    try:
+        config[config_name].validate_required_config()
+    except ValueError as e:
+        print(f"Error: {e}")
         print("Please check your .env file and ensure all required variables are set.")
         return False
     
@@ -35,20 +26,21 @@ def check_environment():
 
 def main():
     """Main function to run the Flask application"""
-    if not check_environment():
+    config_name = os.getenv('FLASK_CONFIG', 'default')
+    if not check_environment(config_name):
         sys.exit(1)
     
     try:
-        from app import app
+        from app import create_app
+        app = create_app(config_name)
         
-        # Get configuration from environment variables
-        host = os.getenv('FLASK_HOST', '0.0.0.0')
-        port = int(os.getenv('FLASK_PORT', 5000))
-        debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+        host = app.config['HOST']
+        port = app.config['PORT']
+        debug = app.debug
         
         print(f"Starting Flask application on {host}:{port}")
         print(f"Debug mode: {debug}")
-        print(f"CORS enabled for: {os.getenv('CORS_ORIGINS', 'http://localhost:3000')}")
+        print(f"CORS enabled for: {', '.join(app.config['CORS_ORIGINS'])}")
         
         app.run(host=host, port=port, debug=debug)
         
@@ -0,0 +1,173 @@
+"""
+ShardedLiveKitService against several local Twirp fakes (benchmarks/fakes.py):
+placement, owner lookup before and after PLACEMENT_GRACE, and partial
+listings while a shard is down.
+"""
+
+import jwt
+import pytest
+
+from benchmarks.fakes import FakeLiveKit
+from utils.circuit_breaker import CircuitBreaker
+from utils.livekit_service import LiveKitService, ShardedLiveKitService
+
+SEEDED = [4, 2, 0]  # rooms per shard; the last one starts empty
+
+
+def secret(index):
+    return f"secret-{index}-" + 'x' * 24
+
+
+@pytest.fixture
+def fakes():
+    servers = [
+        FakeLiveKit(rooms=count, latency=0, name_prefix=f"shard{i}", seed=i).start()
+        for i, count in enumerate(SEEDED)
+    ]
+    yield servers
+    for server in servers:
+        try:
+            server.stop()
+        except OSError:
+            pass
+
+
+def build(fakes):
+    shards = [
+        LiveKitService(
+            api_key=f"key-{i}",
+            api_secret=secret(i),
+            server_url=fake.url,
+            timeout=2,
+            breaker=CircuitBreaker(f"livekit:{fake.url}", min_calls=2, open_seconds=30)
+        )
+        for i, fake in enumerate(fakes)
+    ]
+    # load_ttl=0: every placement sees current loads
+    return ShardedLiveKitService(shards, load_ttl=0)
+
+
+def owner_of(fakes, room_name):
+    return next(i for i, fake in enumerate(fakes) if room_name in fake.rooms)
+
+
+def calls(fakes, before):
+    return [fake.requests - count for fake, count in zip(fakes, before)]
+
+
+def test_list_active_rooms_merges_every_shard(fakes):
+    result = build(fakes).list_active_rooms()
+
+    assert result['success']
+    assert 'partial' not in result
+    assert sorted(room['name'] for room in result['rooms']) == sorted(name for fake in fakes for name in fake.rooms)
+
+
+def test_create_room_goes_to_the_least_loaded_shard(fakes):
+    service = build(fakes)
+
+    created = service.create_room('placed-0')
+
+    assert created['success']
+    assert owner_of(fakes, 'placed-0') == 2
+    assert created['room']['serverUrl'] == fakes[2].url
+    assert service.server_url_for('placed-0') == fakes[2].url
+
+
+def test_token_is_signed_with_the_owning_shard_credentials(fakes):
+    service = build(fakes)
+    service.create_room('placed-0')
+    owner = owner_of(fakes, 'placed-0')
+
+    claims = jwt.decode(service.generate_access_token('placed-0', 'student'), secret(owner), algorithms=['HS256'])
+
+    assert claims['iss'] == f"key-{owner}"
+
+
+def test_known_room_is_routed_to_its_owner_only(fakes):
+    service = build(fakes)
+    service.create_room('placed-0')
+    owner = owner_of(fakes, 'placed-0')
+
+    before = [fake.requests for fake in fakes]
+    info = service.get_room_info('placed-0')
+
+    assert info['success']
+    expected = [0] * len(fakes)
+    expected[owner] = 1
+    assert calls(fakes, before) == expected
+
+
+def test_unknown_room_is_looked_up_on_every_shard(fakes):
+    service = build(fakes)
+    existing = next(iter(fakes[1].rooms))
+
+    before = [fake.requests for fake in fakes]
+    assert service.get_room_info(existing)['success']
+    assert calls(fakes, before) == [1, 1, 1]
+
+    # The owner is remembered
+    before = [fake.requests for fake in fakes]
+    assert service.get_room_info(existing)['success']
+    assert calls(fakes, before) == [0, 1, 0]
+
+    assert service.get_room_info('no-such-room') == {'success': False, 'error': 'Room not found'}
+
+
+def test_placed_room_stays_mapped_until_the_grace_period_ends(fakes):
+    service = build(fakes)
+    service.create_room('lagging')
+    owner = owner_of(fakes, 'lagging')
+    # LiveKit has not listed the new room yet
+    room = fakes[owner].rooms.pop('lagging')
+
+    service.list_active_rooms()
+    before = [fake.requests for fake in fakes]
+    assert service.server_url_for('lagging') == fakes[owner].url
+    assert calls(fakes, before) == [0, 0, 0]
+
+    # Past the grace period a room missing from the listing is forgotten
+    service.PLACEMENT_GRACE = 0
+    service.list_active_rooms()
+    fakes[owner].rooms['lagging'] = room
+    before = [fake.requests for fake in fakes]
+    assert service.get_room_info('lagging')['success']
+    assert calls(fakes, before) == [1, 1, 1]
+
+
+def test_listing_is_partial_while_a_shard_is_down(fakes):
+    service = build(fakes)
+    service.create_room('on-empty-shard')
+    down = owner_of(fakes, 'on-empty-shard')
+    fakes[down].stop()
+
+    result = service.list_active_rooms()
+
+    assert result['success']
+    assert result['partial'] is True
+    up = [fake for i, fake in enumerate(fakes) if i != down]
+    assert sorted(room['name'] for room in result['rooms']) == sorted(name for fake in up for name in fake.rooms)
+    # The unreachable shard keeps its rooms
+    assert service.server_url_for('on-empty-shard') == fakes[down].url
+
+
+def test_placement_skips_an_unreachable_shard(fakes):
+    service = build(fakes)
+    fakes[2].stop()
+
+    created = service.create_room('after-outage')
+
+    assert created['success']
+    assert created['room']['serverUrl'] != fakes[2].url
+    assert owner_of(fakes, 'after-outage') == 1
+
+
+def test_listing_fails_when_every_shard_is_down(fakes):
+    service = build(fakes)
+    for fake in fakes:
+        fake.stop()
+
+    result = service.list_active_rooms()
+
+    assert not result['success']
+    assert 'partial' not in result
@@ -1,38 +1,159 @@
 from functools import wraps
-from flask import request, jsonify
-from supabase import create_client
-import os
+from flask import current_app, request, jsonify
 import logging
+import math
+import threading
+import time
+import jwt
+
+from utils import deadline
+from utils.cache import get_cache
+from utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from utils.session_store import get_session_registry, token_key, token_session
 
 logger = logging.getLogger(__name__)
 
-def create_supabase_client():
-    """Create and return Supabase client"""
-    SUPABASE_URL = os.getenv('SUPABASE_URL')
-    SUPABASE_KEY = os.getenv('SUPABASE_ANON_KEY')
+_shared_client_lock = threading.Lock()
+
+def create_supabase_client(app=None):
+    """
+    Create and return a Supabase client that is safe to share between
+    requests: it keeps no user session and always queries PostgREST with
+    the anon key
+    """
+    # Imported here: the supabase SDK roughly doubles worker import time
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+    
+    app = app or current_app
+    SUPABASE_URL = app.config.get('SUPABASE_URL')
+    SUPABASE_KEY = app.config.get('SUPABASE_ANON_KEY')
     
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("Missing Supabase configuration")
     
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    client = create_client(SUPABASE_URL, SUPABASE_KEY, ClientOptions(auto_refresh_token=False, persist_session=False))
+    # The SDK rebuilds PostgREST with the last signed-in user's token on
+    # every sign-in; a shared client must not act as that user
+    for subscription in list(client.auth._state_change_emitters.values()):
+        subscription.unsubscribe()
+    # The SDK takes no per-call timeout: cut each call's to what is left of
+    # the request deadline through httpx request hooks
+    client.auth._http_client.event_hooks['request'].append(deadline.clamp_httpx_timeout)
+    client.postgrest.session.event_hooks['request'].append(deadline.clamp_httpx_timeout)
+    return client
+
+def get_shared_supabase_client(app=None):
+    """Return the app's shared Supabase client, creating it on first use"""
+    app = app or current_app._get_current_object()
+    client = app.extensions.get('supabase')
+    if client is None:
+        with _shared_client_lock:
+            client = app.extensions.get('supabase')
+            if client is None:
+                client = create_supabase_client(app)
+                app.extensions['supabase'] = client
+    return client
+
+def supabase_unavailable(error, message='Authentication service temporarily unavailable'):
+    """503 response for requests shed while the Supabase circuit is open"""
+    response = jsonify({'error': message})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+def verify_token_locally(token):
+    """
+    Verify a Supabase access token with the project's JWT secret, without
+    calling Supabase. Used only while the Supabase circuit is open.
+    """
+    secret = current_app.config.get('SUPABASE_JWT_SECRET')
+    if not secret:
+        return None
+    try:
+        claims = jwt.decode(token, secret, algorithms=['HS256'], audience='authenticated')
+    except jwt.PyJWTError as e:
+        logger.error(f"Local token verification failed: {str(e)}")
+        return None
+    
+    return {
+        'id': claims.get('sub'),
+        'email': claims.get('email'),
+        'user_metadata': claims.get('user_metadata', {}),
+        'app_metadata': claims.get('app_metadata', {}),
+        'role': claims.get('role')
+    }
+
+def user_record(user):
+    """
+    JSON-serialisable dict of the Supabase user fields the routes read, as
+    verify_token_locally returns them
+    """
+    if isinstance(user, dict):
+        return user
+    return {
+        'id': getattr(user, 'id', None),
+        'email': getattr(user, 'email', None),
+        'user_metadata': getattr(user, 'user_metadata', None) or {},
+        'app_metadata': getattr(user, 'app_metadata', None) or {},
+        'role': getattr(user, 'role', None)
+    }
+
+def cache_verified_user(token, user):
+    """
+    Trust a token Supabase just verified for TOKEN_CACHE_TTL seconds, or
+    until it expires if sooner, in every worker sharing the cache
+    """
+    try:
+        expires_at = jwt.decode(token, options={'verify_signature': False}).get('exp')
+    except jwt.PyJWTError:
+        return
+    ttl = min(current_app.config['TOKEN_CACHE_TTL'], expires_at - time.time()) if expires_at else 0
+    if ttl > 0:
+        get_cache('tokens').set(token_key(token), user_record(user), ttl=ttl)
 
 def verify_supabase_token(token):
-    """Verify Supabase JWT token and return user"""
+    """
+    Verify Supabase JWT token and return user.
+    Raises CircuitOpenError when Supabase is unavailable and the token
+    cannot be verified locally.
+    """
+    use_cache = current_app.config['TOKEN_CACHE_TTL'] > 0
+    if use_cache:
+        user = get_cache('tokens').get(token_key(token))
+        if user is not None:
+            return user
+    
     try:
-        supabase = create_supabase_client()
+        supabase = get_shared_supabase_client()
         # Use get_user() which accepts the JWT token
-        response = supabase.auth.get_user(token)
+        try:
+            response = get_circuit_breaker('supabase').call(supabase.auth.get_user, token)
+        except CircuitOpenError:
+            user = verify_token_locally(token)
+            if user is None:
+                raise
+            return user
         
         # Check if we have a valid user response
         if hasattr(response, 'user') and response.user:
+            if use_cache:
+                cache_verified_user(token, response.user)
             return response.user
         elif isinstance(response, dict) and response.get('user'):
+            if use_cache:
+                cache_verified_user(token, response['user'])
             return response['user']
         else:
             logger.error(f"No user found in token verification response: {response}")
             return None
             
+    except (CircuitOpenError, deadline.DeadlineExceeded):
+        raise
     except Exception as e:
+        # A timeout cut short by the request deadline says nothing about the token
+        if deadline.expired():
+            raise deadline.DeadlineExceeded() from e
         logger.error(f"Token verification failed: {str(e)}")
         return None
 
@@ -59,14 +180,58 @@ def require_auth(f):
             if not user:
                 return jsonify({'error': 'Invalid or expired token'}), 401
             
+            # Access tokens stay valid upstream until they expire, so tokens
+            # issued before the user signed out are rejected here
+            user_id = user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+            if user_id and get_session_registry().is_revoked(user_id, *token_session(token)):
+                return jsonify({'error': 'Session has been revoked'}), 401
+            
             # Add user to request context
             request.current_user = user
             return f(*args, **kwargs)
             
         except IndexError:
             return jsonify({'error': 'Invalid authorization header format'}), 401
+        except CircuitOpenError as e:
+            return supabase_unavailable(e)
+        except deadline.DeadlineExceeded:
+            # Answered with 504 by the app's error handler
+            raise
         except Exception as e:
             logger.error(f"Authentication error: {str(e)}")
             return jsonify({'error': 'Authentication failed'}), 401
     
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def optional_auth(f):
+    """
+    Decorator for routes that also serve anonymous callers: requests without
+    an Authorization header run with request.current_user set to None, and
+    requests with one are authenticated as by require_auth
+    """
+    authenticated = require_auth(f)
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not request.headers.get('Authorization'):
+            request.current_user = None
+            return f(*args, **kwargs)
+        return authenticated(*args, **kwargs)
+    
+    return decorated_function
+
+def user_roles(user):
+    """
+    Roles granted to a user through Supabase app_metadata ('role' or 'roles').
+    app_metadata can only be changed with the service role key, unlike
+    user_metadata, so it is safe to authorise on.
+    """
+    app_metadata = getattr(user, 'app_metadata', None)
+    if app_metadata is None and isinstance(user, dict):
+        app_metadata = user.get('app_metadata')
+    app_metadata = app_metadata or {}
+    
+    roles = set(app_metadata.get('roles') or [])
+    if app_metadata.get('role'):
+        roles.add(app_metadata['role'])
+    return roles
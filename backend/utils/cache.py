@@ -0,0 +1,414 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_cache_lock = threading.Lock()
+
+# Cache name -> (size, TTL) config keys
+CACHE_SETTINGS = {
+    'profiles': ('PROFILE_CACHE_SIZE', 'PROFILE_CACHE_TTL'),
+    'tokens': ('TOKEN_CACHE_SIZE', 'TOKEN_CACHE_TTL'),
+    'rooms': ('ROOM_CACHE_SIZE', 'ROOM_CACHE_TTL'),
+    'idempotency': ('IDEMPOTENCY_MAX_KEYS', 'IDEMPOTENCY_TTL'),
+    'room_members': ('ROOM_MEMBERS_CACHE_SIZE', 'ROOM_MEMBER_TTL'),
+}
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional TTL, cache-wide or
+    per entry.
+
+    ``get`` can also return stale entries (``allow_stale=True``), which lets
+    callers serve the last known value while an upstream is unavailable.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None, allow_stale: bool = False) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if not allow_stale and expires_at is not None and time.monotonic() > expires_at:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    Shared cache tier in a local SQLite file, for the worker processes of
+    one host. Invalidations are published by appending to a log table that
+    every subscribed process tails each ``poll_interval`` seconds.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (expires_at);
+    CREATE TABLE IF NOT EXISTS cache_invalidations (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL, created_at REAL NOT NULL
+    );
+    """
+
+    LOG_RETENTION = 60  # seconds invalidations stay in the log
+    PRUNE_EVERY = 256  # writes between deletions of expired rows
+
+    def __init__(self, path: str, poll_interval: float = 0.2):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+        # The file holds verified user records and profiles
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl)
+        )
+        self._prune(conn)
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set ``key`` unless a live entry exists; True when this call set it"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('DELETE FROM cache_entries WHERE key = ? AND expires_at < ?', (key, now))
+        added = conn.execute(
+            'INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)', (key, value, now + ttl)
+        ).rowcount == 1
+        self._prune(conn)
+        return added
+
+    def delete(self, key: str):
+        self._connect().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def publish(self, message: str):
+        conn = self._connect()
+        conn.execute('INSERT INTO cache_invalidations (message, created_at) VALUES (?, ?)', (message, time.time()))
+        self._prune(conn)
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]):
+        """
+        Call ``callback(message)`` from a background thread for every message
+        published from now on
+        """
+        start = self._connect().execute('SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations').fetchone()[0]
+        threading.Thread(target=self._tail, args=(start, callback), name='cache-invalidations', daemon=True).start()
+
+    def _tail(self, seq: int, callback: Callable[[Optional[str]], None]):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = self._connect().execute(
+                    'SELECT seq, message FROM cache_invalidations WHERE seq > ? ORDER BY seq', (seq,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Reading cache invalidations failed: {str(e)}")
+                continue
+            for seq, message in rows:
+                callback(message)
+
+    def _prune(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            now = time.time()
+            conn.execute('DELETE FROM cache_entries WHERE expires_at < ?', (now,))
+            conn.execute('DELETE FROM cache_invalidations WHERE created_at < ?', (now - self.LOG_RETENTION,))
+
+
+class RedisCacheBackend:
+    """
+    Shared cache tier on a Redis-compatible server, for workers on several
+    nodes. Entries expire server-side and invalidations go out over
+    PUBLISH/SUBSCRIBE.
+    """
+
+    def __init__(self, url: str, prefix: str = 'cache:'):
+        import redis  # optional dependency, only needed for this backend
+
+        self.prefix = prefix
+        self.channel = prefix + 'invalidations'
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self._client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def publish(self, message: str):
+        self._client.publish(self.channel, message)
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]):
+        """
+        Call ``callback(message)`` from a background thread for every message
+        published from now on, and ``callback(None)`` after a reconnect, as
+        messages may have been missed
+        """
+        threading.Thread(target=self._listen, args=(callback,), name='cache-invalidations', daemon=True).start()
+
+    def _listen(self, callback: Callable[[Optional[str]], None]):
+        reconnecting = False
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if reconnecting:
+                    callback(None)
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        callback(message['data'].decode('utf-8'))
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost: {str(e)}")
+                reconnecting = True
+                time.sleep(1)
+
+
+class TieredCache:
+    """
+    Per-process LRU (L1) in front of an optional shared backend (L2).
+
+    Reads try L1, then L2, filling L1 on an L2 hit. Writes go to both, and
+    ``set`` and ``delete`` publish an invalidation so other processes drop
+    their L1 copy. L2 values are JSON carrying their expiry time, so L1
+    copies expire with them. L2 errors are logged and treated as misses:
+    the cache never fails a request.
+    """
+
+    def __init__(self, name: str, max_entries: int = 10000, ttl: Optional[float] = None,
+                 backend=None, publish: Optional[Callable[[str, str], None]] = None):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend
+        self.l1 = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self._publish = publish
+        self._add_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.l1)
+
+    def get(self, key: str, default: Any = None, allow_stale: bool = False) -> Any:
+        """
+        ``allow_stale`` applies to L1 only; L2 entries are gone once expired
+        """
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(f"{self.name}:{key}")
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"Cache {self.name} L2 read failed: {str(e)}")
+                stored = None
+            if stored is not None:
+                self.l2_hits += 1
+                expires_at, value = json.loads(stored)
+                self.l1.set(key, value, ttl=max(0.0, expires_at - time.time()))
+                return value
+            self.l2_misses += 1
+
+        return self.l1.get(key, default, allow_stale=True) if allow_stale else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.l1.set(key, value, ttl=ttl)
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(f"{self.name}:{key}", json.dumps([time.time() + ttl, value]), ttl)
+            self._publish(self.name, key)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Cache {self.name} L2 write failed: {str(e)}")
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Set ``key`` only if it has no live entry, and return whether this
+        call set it. With a shared tier the check is atomic across
+        processes; if the shared tier fails, nothing is set and False is
+        returned, since the caller cannot know it owns the key.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if self.backend is None:
+            with self._add_lock:
+                if self.l1.get(key, _MISSING) is not _MISSING:
+                    return False
+                self.l1.set(key, value, ttl=ttl)
+                return True
+        try:
+            added = self.backend.add(f"{self.name}:{key}", json.dumps([time.time() + ttl, value]), ttl)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Cache {self.name} L2 add failed: {str(e)}")
+            return False
+        if added:
+            self.l1.set(key, value, ttl=ttl)
+        return added
+
+    def delete(self, key: str):
+        self.l1.delete(key)
+        if self.backend is None:
+            return
+        try:
+            self.backend.delete(f"{self.name}:{key}")
+            self._publish(self.name, key)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Cache {self.name} L2 delete failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Hit and miss counts per tier, as seen by this process"""
+        stats = {'entries': len(self.l1), 'l1': _tier_stats(self.l1.hits, self.l1.misses)}
+        if self.backend is not None:
+            stats['l2'] = _tier_stats(self.l2_hits, self.l2_misses)
+            stats['l2']['errors'] = self.l2_errors
+        return stats
+
+
+_MISSING = object()
+
+
+def _tier_stats(hits: int, misses: int) -> Dict:
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hitRate': round(hits / total, 4) if total else None}
+
+
+class _Invalidations:
+    """
+    Publishes this process's cache writes and applies other processes' to
+    the local L1 tiers. Messages are JSON [origin, cache name, key].
+    """
+
+    def __init__(self, backend, caches: Dict[str, TieredCache]):
+        self.backend = backend
+        self.caches = caches
+        self.origin = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        backend.subscribe(self.receive)
+
+    def publish(self, name: str, key: str):
+        self.backend.publish(json.dumps([self.origin, name, key]))
+
+    def receive(self, message: Optional[str]):
+        if message is None:
+            for cache in list(self.caches.values()):
+                cache.l1.clear()
+            return
+        try:
+            origin, name, key = json.loads(message)
+        except ValueError:
+            return
+        cache = self.caches.get(name)
+        if origin != self.origin and cache is not None:
+            cache.l1.delete(key)
+
+
+def get_cache(name: str, app=None) -> TieredCache:
+    """
+    Return the app's cache ``name`` (see CACHE_SETTINGS), creating it on
+    first use. CACHE_BACKEND selects the shared tier: 'memory' for none,
+    'sqlite' for the workers of one host, 'redis' across nodes.
+    """
+    app = app or current_app._get_current_object()
+    caches = app.extensions.setdefault('caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        with _cache_lock:
+            cache = caches.get(name)
+            if cache is None:
+                invalidations = app.extensions.get('cache_invalidations')
+                if invalidations is None and app.config['CACHE_BACKEND'] != 'memory':
+                    if app.config['CACHE_BACKEND'] == 'redis':
+                        backend = RedisCacheBackend(app.config['CACHE_REDIS_URL'])
+                    else:
+                        backend = SQLiteCacheBackend(app.config['CACHE_PATH'],
+                                                     poll_interval=app.config['CACHE_POLL_INTERVAL'])
+                    invalidations = _Invalidations(backend, caches)
+                    app.extensions['cache_invalidations'] = invalidations
+                size_key, ttl_key = CACHE_SETTINGS[name]
+                cache = TieredCache(
+                    name,
+                    max_entries=app.config[size_key],
+                    ttl=app.config[ttl_key],
+                    backend=invalidations.backend if invalidations is not None else None,
+                    publish=invalidations.publish if invalidations is not None else None
+                )
+                caches[name] = cache
+    return cache
+
+
+def cache_stats(app=None) -> Dict:
+    """Per-tier hit rates of the caches this process has created"""
+    app = app or current_app._get_current_object()
+    return {name: cache.stats() for name, cache in app.extensions.get('caches', {}).items()}
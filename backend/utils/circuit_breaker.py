@@ -0,0 +1,254 @@
+import sys
+import time
+import logging
+import threading
+from typing import Callable, Dict
+
+from flask import current_app
+
+from utils.deadline import DeadlineExceeded, expired as deadline_expired
+
+logger = logging.getLogger(__name__)
+
+_registry_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# SQLSTATE classes (and PostgREST's own connection errors) that mean the
+# database or PostgREST is in trouble rather than the query being wrong
+POSTGREST_SERVER_ERROR_PREFIXES = ('08', '53', '57', '58', 'XX', 'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Decide whether an exception means the upstream is unhealthy.
+    Errors carrying a 4xx status (bad credentials, missing rows) are the
+    caller's fault and must not trip the breaker, and so are timeouts once
+    the request's own deadline has run out.
+    """
+    if isinstance(error, DeadlineExceeded) or deadline_expired():
+        return False
+    # Looked up rather than imported: the supabase SDK is loaded lazily, and
+    # until it is, nothing can raise its errors
+    postgrest_errors = sys.modules.get('postgrest.exceptions')
+    if postgrest_errors is not None and isinstance(error, postgrest_errors.APIError):
+        return _is_postgrest_server_error(error)
+    status = getattr(error, 'status', None)
+    if not isinstance(status, int):
+        status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status >= 500
+    return True
+
+
+def _is_postgrest_server_error(error: Exception) -> bool:
+    """
+    PostgREST's APIError carries no HTTP status. Its ``code`` is the status
+    itself only when the response was not JSON (a gateway error page);
+    otherwise it is a SQLSTATE or PGRST code, and most of those (RLS
+    violations, constraint failures, bad filters) are client errors.
+    """
+    code = error.code
+    if isinstance(code, int):
+        return code >= 500
+    return isinstance(code, str) and code.startswith(POSTGREST_SERVER_ERROR_PREFIXES)
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker over a sliding failure-rate window.
+
+    Outcomes are counted in ``buckets`` time slices spanning ``window``
+    seconds. Once at least ``min_calls`` calls were seen and the failure rate
+    reaches ``failure_rate``, the circuit opens and calls fail fast with
+    CircuitOpenError for ``open_seconds``. It then goes half-open and lets a
+    single probe through: success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: float = 30.0, min_calls: int = 10,
+                 open_seconds: float = 30.0, buckets: int = 10):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+
+        self._bucket_span = window / buckets
+        self._buckets = [[-1, 0, 0] for _ in range(buckets)]  # [slice id, successes, failures]
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def call(self, fn: Callable, *args, is_failure: Callable = is_upstream_failure, **kwargs):
+        """
+        Run ``fn`` through the breaker, raising CircuitOpenError when open
+        """
+        probe = self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e, DeadlineExceeded) or deadline_expired():
+                self.release(probe)
+            elif is_failure(e):
+                self.record_failure(probe)
+            else:
+                self.record_success(probe)
+            raise
+        self.record_success(probe)
+        return result
+
+    def before_call(self) -> bool:
+        """
+        Admit or reject a call, returning whether it is the half-open probe.
+        Every admitted call must be followed by record_success,
+        record_failure or release, passing that flag back.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            retry_after = max(0.0, self._opened_at + self.open_seconds - now)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self, probe: bool = False):
+        """
+        Count a successful call. Only the half-open probe closes the circuit;
+        calls admitted before it opened are ignored until it closes again.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                logger.info(f"Circuit {self.name} closed")
+                self._state = self.CLOSED
+                self._probe_in_flight = False
+                self._reset_window()
+            elif self._state != self.CLOSED:
+                return
+            self._bucket(now)[1] += 1
+
+    def record_failure(self, probe: bool = False):
+        """
+        Count a failed call. A failed half-open probe re-opens the circuit for
+        another period; other calls' failures are ignored while it is not closed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                self._trip(now)
+                return
+            if self._state != self.CLOSED:
+                return
+            self._bucket(now)[2] += 1
+            successes, failures = self._totals(now)
+            calls = successes + failures
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._trip(now)
+
+    def release(self, probe: bool = False):
+        """
+        End an admitted call without counting it, for calls cut short by the
+        request's own deadline. A half-open probe released this way leaves
+        the circuit half-open for the next caller to probe.
+        """
+        if probe:
+            with self._lock:
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        """
+        Breaker state for health endpoints
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            successes, failures = self._totals(now)
+            calls = successes + failures
+            snapshot = {
+                'state': state,
+                'calls': calls,
+                'failureRate': round(failures / calls, 3) if calls else 0.0
+            }
+            if state != self.CLOSED:
+                snapshot['retryAfter'] = round(max(0.0, self._opened_at + self.open_seconds - now), 1)
+            return snapshot
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _trip(self, now: float):
+        if self._state != self.OPEN:
+            logger.warning(f"Circuit {self.name} opened")
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+
+    def _bucket(self, now: float):
+        slice_id = int(now / self._bucket_span)
+        bucket = self._buckets[slice_id % len(self._buckets)]
+        if bucket[0] != slice_id:
+            bucket[0], bucket[1], bucket[2] = slice_id, 0, 0
+        return bucket
+
+    def _totals(self, now: float):
+        oldest = int(now / self._bucket_span) - len(self._buckets) + 1
+        successes = failures = 0
+        for slice_id, ok, failed in self._buckets:
+            if slice_id >= oldest:
+                successes += ok
+                failures += failed
+        return successes, failures
+
+    def _reset_window(self):
+        for bucket in self._buckets:
+            bucket[0], bucket[1], bucket[2] = -1, 0, 0
+
+
+def get_circuit_breaker(name: str, app=None) -> CircuitBreaker:
+    """Return the app's breaker for an upstream, creating it from config on first use"""
+    app = app or current_app._get_current_object()
+    breakers = app.extensions.setdefault('circuit_breakers', {})
+    breaker = breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_rate=app.config['CIRCUIT_FAILURE_RATE'],
+                    window=app.config['CIRCUIT_WINDOW'],
+                    min_calls=app.config['CIRCUIT_MIN_CALLS'],
+                    open_seconds=app.config['CIRCUIT_OPEN_SECONDS']
+                )
+                breakers[name] = breaker
+    return breaker
+
+
+def circuit_snapshots(app=None) -> Dict[str, Dict]:
+    """State of every breaker created so far, keyed by upstream name"""
+    app = app or current_app._get_current_object()
+    return {name: breaker.snapshot() for name, breaker in app.extensions.get('circuit_breakers', {}).items()}
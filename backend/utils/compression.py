@@ -0,0 +1,218 @@
+import zlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/event-stream',
+)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into {coding: q-value}
+    """
+    codings = {}
+    if not header:
+        return codings
+
+    for part in header.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        coding, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported content coding for an Accept-Encoding header.
+    Brotli wins ties when the module is installed.
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+
+    candidates = []
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    """Incremental gzip/brotli encoder with a uniform interface"""
+
+    def __init__(self, encoding: str, level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 produces a gzip container rather than raw zlib
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == 'br':
+            out = self._obj.process(data)
+            if flush:
+                out += self._obj.flush()
+            return out
+        out = self._obj.compress(data)
+        if flush:
+            out += self._obj.flush(zlib.Z_SYNC_FLUSH)
+        return out
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that compresses responses negotiated via Accept-Encoding.
+
+    Responses with a known Content-Length are compressed only when they are at
+    least ``min_size`` bytes. Streamed responses (no Content-Length) are
+    compressed chunk by chunk with a sync flush after each chunk so that
+    clients receive data as soon as the application yields it.
+    """
+
+    def __init__(self, app, min_size: int = 500, level: int = 6, brotli_quality: int = 4,
+                 compressible_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.compressible_types = tuple(compressible_types)
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        captured = {'written': []}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            # Legacy write() callable: buffer and emit ahead of the iterable
+            return captured['written'].append
+
+        app_iter = self.app(environ, capture_start_response)
+        return self._respond(app_iter, captured, encoding, start_response)
+
+    def _should_compress(self, status: str, headers: List) -> bool:
+        status_code = int(status.split(' ', 1)[0])
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+
+        content_type = ''
+        for name, value in headers:
+            lname = name.lower()
+            if lname == 'content-encoding':
+                return False
+            if lname == 'cache-control' and 'no-transform' in value.lower():
+                return False
+            if lname == 'content-type':
+                content_type = value.split(';', 1)[0].strip().lower()
+        return content_type in self.compressible_types
+
+    def _respond(self, app_iter, captured, encoding, start_response):
+        try:
+            # Flask calls start_response before returning, but the spec allows
+            # deferring it until the first chunk, so pull one if needed.
+            iterator = iter(app_iter)
+            pending = []
+            if 'status' not in captured:
+                for chunk in iterator:
+                    pending.append(chunk)
+                    break
+
+            status = captured['status']
+            headers = list(captured['headers'])
+            exc_info = captured.get('exc_info')
+            pending = captured['written'] + pending
+
+            if not self._should_compress(status, headers):
+                start_response(status, headers, exc_info)
+                yield from pending
+                yield from iterator
+                return
+
+            content_length = None
+            for name, value in headers:
+                if name.lower() == 'content-length':
+                    try:
+                        content_length = int(value)
+                    except ValueError:
+                        pass
+
+            if content_length is not None and content_length < self.min_size:
+                start_response(status, headers, exc_info)
+                yield from pending
+                yield from iterator
+                return
+
+            headers = [
+                (name, value) for name, value in headers
+                if name.lower() not in ('content-length', 'vary', 'etag')
+            ]
+            vary = [value for name, value in captured['headers'] if name.lower() == 'vary']
+            vary.append('Accept-Encoding')
+            headers.append(('Vary', ', '.join(vary)))
+            headers.append(('Content-Encoding', encoding))
+
+            compressor = _Compressor(encoding, self.level, self.brotli_quality)
+
+            if content_length is not None:
+                # Buffered response: compress in one pass and advertise the length
+                body = b''.join(pending) + b''.join(iterator)
+                compressed = compressor.compress(body) + compressor.finish()
+                headers.append(('Content-Length', str(len(compressed))))
+                start_response(status, headers, exc_info)
+                yield compressed
+                return
+
+            # Streamed response: emit each chunk as soon as it is produced
+            start_response(status, headers, exc_info)
+            for chunk in pending:
+                if chunk:
+                    yield compressor.compress(chunk, flush=True)
+            for chunk in iterator:
+                if chunk:
+                    yield compressor.compress(chunk, flush=True)
+            yield compressor.finish()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
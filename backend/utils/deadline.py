@@ -0,0 +1,68 @@
+import time
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current request must be answered; None outside
+# requests (background threads) and when REQUEST_DEADLINE is 0
+_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+# Below this, an upstream call is not worth starting
+MIN_CALL_TIMEOUT = 0.05  # seconds
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of calling an upstream once the request's budget is spent"""
+
+    def __init__(self, message: str = 'Request deadline exceeded'):
+        super().__init__(message)
+
+
+def start(budget: float):
+    """Give the current request ``budget`` seconds from now; 0 removes the deadline"""
+    _deadline.set(time.monotonic() + budget if budget > 0 else None)
+
+
+def clear():
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, None when it has none"""
+    deadline = _deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left < MIN_CALL_TIMEOUT
+
+
+def timeout(default: float) -> float:
+    """
+    Timeout for an upstream call: ``default``, cut to what is left of the
+    request's budget. Raises DeadlineExceeded when too little is left.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded()
+    return min(default, left)
+
+
+def clamp_httpx_timeout(request):
+    """
+    httpx request hook applying the deadline to clients that take no
+    per-call timeout (the Supabase SDK's auth and PostgREST clients)
+    """
+    if remaining() is None:
+        return
+    timeouts = request.extensions.get('timeout') or {}
+    defaults = [value for value in timeouts.values() if value is not None]
+    request.extensions['timeout'] = dict.fromkeys(
+        ('connect', 'read', 'write', 'pool'),
+        timeout(min(defaults) if defaults else float('inf'))
+    )
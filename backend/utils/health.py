@@ -0,0 +1,126 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict
+
+import requests
+from flask import current_app
+
+from utils.livekit_service import parse_livekit_servers
+
+logger = logging.getLogger(__name__)
+
+_probe_lock = threading.Lock()
+
+
+class HealthProbe:
+    """
+    Background readiness checks with cached results.
+
+    One daemon thread runs every check every ``interval`` seconds and stores
+    its outcome and latency; ``snapshot`` only reads those results, so
+    readiness endpoints never touch an upstream on the request path.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], None]], interval: float = 10.0):
+        self.checks = checks
+        self.interval = interval
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='health-probe', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def probe_once(self):
+        """
+        Run every check once; a check passes unless it raises
+        """
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                check()
+                result = {'ok': True}
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            result['latencyMs'] = round((time.perf_counter() - start) * 1000, 1)
+            result['checkedAt'] = datetime.utcnow().isoformat()
+            with self._lock:
+                previous = self._results.get(name)
+                self._results[name] = result
+            if not result['ok'] and (previous is None or previous['ok']):
+                logger.warning(f"Readiness check {name} failing: {result['error']}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Last result per check; checks that have not run yet are reported as pending
+        """
+        with self._lock:
+            return {
+                name: dict(self._results[name]) if name in self._results else {'ok': False, 'pending': True}
+                for name in self.checks
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_once()
+            self._stop.wait(self.interval)
+
+
+def _http_check(url: str, timeout: float, headers: Dict = None) -> Callable[[], None]:
+    def check():
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    return check
+
+
+def upstream_checks(app) -> Dict[str, Callable[[], None]]:
+    """
+    Reachability checks for the configured upstreams: the Supabase auth
+    health endpoint and the LiveKit server root, neither of which does any
+    work on the upstream beyond answering
+    """
+    timeout = app.config['HEALTH_PROBE_TIMEOUT']
+    checks = {}
+    if app.config.get('SUPABASE_URL'):
+        checks['supabase'] = _http_check(
+            f"{app.config['SUPABASE_URL'].rstrip('/')}/auth/v1/health",
+            timeout,
+            headers={'apikey': app.config.get('SUPABASE_ANON_KEY') or ''}
+        )
+    servers = parse_livekit_servers(app.config.get('LIVEKIT_SERVERS'))
+    if servers:
+        # One check per shard, grouped under the 'livekit' prefix
+        for server in servers:
+            checks[f"livekit:{server['url']}"] = _http_check(_http_url(server['url']), timeout)
+    elif app.config.get('LIVEKIT_SERVER_URL'):
+        checks['livekit'] = _http_check(_http_url(app.config['LIVEKIT_SERVER_URL']), timeout)
+    return checks
+
+
+def _http_url(server_url: str) -> str:
+    return server_url.replace('wss://', 'https://').replace('ws://', 'http://')
+
+
+def get_health_probe(app=None) -> HealthProbe:
+    """Return the app's readiness probe, starting it on first use"""
+    app = app or current_app._get_current_object()
+    probe = app.extensions.get('health_probe')
+    if probe is None:
+        with _probe_lock:
+            probe = app.extensions.get('health_probe')
+            if probe is None:
+                probe = HealthProbe(upstream_checks(app), interval=app.config['HEALTH_PROBE_INTERVAL'])
+                app.extensions['health_probe'] = probe
+                probe.start()
+    return probe
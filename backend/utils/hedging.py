@@ -0,0 +1,156 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_hedger_lock = threading.Lock()
+
+
+class _Operation:
+    """Recent latencies and hedging decisions of one kind of read"""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.hedged = deque(maxlen=window)  # one bool per call
+        self.delay = None
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+class Hedger:
+    """
+    Hedged requests for idempotent upstream reads.
+
+    Each operation (e.g. 'livekit/ListRooms') keeps its last ``window``
+    latencies. Once ``min_samples`` are known, a call that has not answered
+    after their ``percentile``-th percentile gets an identical second call,
+    and whichever answers first is returned; if it failed, the other is
+    awaited. At most ``max_ratio`` of recent calls are hedged, so a slow
+    upstream sees a bounded amount of extra load. Both attempts run in the
+    caller's context, so they share its request deadline.
+    """
+
+    def __init__(self, enabled: bool = True, percentile: float = 95, min_delay: float = 0.005,
+                 max_ratio: float = 0.1, window: int = 200, min_samples: int = 20, max_workers: int = 64):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.window = window
+        self.min_samples = min_samples
+        self._operations = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged-read')
+
+    def call(self, operation: str, fn: Callable, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)``, hedging it when it runs slower than usual"""
+        delay = self._hedge_delay(operation) if self.enabled else None
+        if delay is None:
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(operation, time.monotonic() - started, hedged=False)
+
+        primary = self._submit(operation, fn, args, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            self._record_call(operation, hedged=False)
+            return primary.result()
+
+        hedge = self._submit(operation, fn, args, kwargs)
+        self._record_call(operation, hedged=True)
+        done, pending = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        first = next(iter(done))
+        if first.exception() is not None and pending:
+            wait(pending)
+            other = next(iter(pending))
+            if other.exception() is None:
+                first = other
+        if first is hedge and first.exception() is None:
+            with self._lock:
+                self._operations[operation].hedge_wins += 1
+        return first.result() if first.exception() is None else primary.result()
+
+    def snapshot(self) -> Dict:
+        """Per-operation hedge delay and counts, for health endpoints"""
+        with self._lock:
+            return {
+                name: {
+                    'hedgeDelayMs': round(op.delay * 1000, 1) if op.delay is not None else None,
+                    'calls': op.calls,
+                    'hedged': op.hedges,
+                    'hedgeWins': op.hedge_wins
+                }
+                for name, op in self._operations.items()
+            }
+
+    def _submit(self, operation: str, fn: Callable, args, kwargs):
+        def timed():
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(operation, time.monotonic() - started)
+        # A fresh copy per attempt: one context cannot be entered by two threads
+        return self._executor.submit(contextvars.copy_context().run, timed)
+
+    def _hedge_delay(self, operation: str) -> Optional[float]:
+        with self._lock:
+            op = self._operations.get(operation)
+            if op is None or op.delay is None:
+                return None
+            if sum(op.hedged) >= self.max_ratio * len(op.hedged):
+                return None
+            return op.delay
+
+    def _operation(self, operation: str) -> _Operation:
+        op = self._operations.get(operation)
+        if op is None:
+            op = self._operations[operation] = _Operation(self.window)
+        return op
+
+    def _record(self, operation: str, latency: float, hedged: Optional[bool] = None):
+        with self._lock:
+            op = self._operation(operation)
+            op.latencies.append(latency)
+            # Recomputing on every sample would sort the window on every call
+            if len(op.latencies) >= self.min_samples and len(op.latencies) % 10 == 0:
+                ordered = sorted(op.latencies)
+                index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+                op.delay = max(self.min_delay, ordered[index])
+        if hedged is not None:
+            self._record_call(operation, hedged)
+
+    def _record_call(self, operation: str, hedged: bool):
+        with self._lock:
+            op = self._operation(operation)
+            op.calls += 1
+            op.hedged.append(hedged)
+            if hedged:
+                op.hedges += 1
+
+
+def get_hedger(app=None) -> Hedger:
+    """Return the app's hedger, creating it from config on first use"""
+    app = app or current_app._get_current_object()
+    hedger = app.extensions.get('hedger')
+    if hedger is None:
+        with _hedger_lock:
+            hedger = app.extensions.get('hedger')
+            if hedger is None:
+                hedger = Hedger(
+                    enabled=app.config['HEDGE_ENABLED'],
+                    percentile=app.config['HEDGE_PERCENTILE'],
+                    max_ratio=app.config['HEDGE_MAX_RATIO']
+                )
+                app.extensions['hedger'] = hedger
+    return hedger
@@ -0,0 +1,129 @@
+import time
+import base64
+import hashlib
+import logging
+from functools import wraps
+
+from flask import Response, current_app, request, jsonify
+
+from utils.cache import TieredCache, get_cache
+from utils.single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+CLAIM_TTL = 60  # seconds a claim holds the key if its worker dies mid-request
+CLAIM_WAIT = 10  # seconds a retry waits for another worker's claim
+CLAIM_POLL_INTERVAL = 0.1
+# Client errors that say "try again later" rather than "this request is wrong"
+TRANSIENT_STATUSES = frozenset({408, 425, 429})
+
+
+def get_idempotency_store(app=None) -> TieredCache:
+    """
+    Return the app's store of completed idempotent responses. It lives in
+    the 'idempotency' cache, so with a shared CACHE_BACKEND every worker
+    replays the same responses.
+    """
+    return get_cache('idempotency', app)
+
+
+def _scope():
+    """Keys are namespaced by route and caller, so clients cannot collide"""
+    user = getattr(request, 'current_user', None)
+    user_id = None
+    if user is not None:
+        user_id = user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+    return request.path, user_id or request.remote_addr
+
+
+def _store_key(scope) -> str:
+    return hashlib.sha256('\0'.join(str(part) for part in scope).encode('utf-8')).hexdigest()
+
+
+def _await_claim(store: TieredCache, key: str):
+    """Wait for another worker's claim on ``key`` to become a response"""
+    deadline = time.monotonic() + CLAIM_WAIT
+    while True:
+        stored = store.get(key)
+        if stored is None or not stored.get('pending') or time.monotonic() >= deadline:
+            return stored
+        time.sleep(CLAIM_POLL_INTERVAL)
+
+
+def idempotent(f):
+    """
+    Decorator honouring an ``Idempotency-Key`` request header.
+
+    The first request with a key claims it in the idempotency store, runs
+    the view, and stores its response for IDEMPOTENCY_TTL seconds. Retries
+    with the same key and body replay it (with ``Idempotent-Replayed:
+    true``). Retries that arrive while the first request is still running
+    wait for it, on any worker sharing the store; one still running after
+    CLAIM_WAIT seconds gets 409. 5xx responses and transient 4xx ones (408,
+    425, 429, e.g. from a rate limit beneath this decorator) are not stored,
+    so those can be retried. Reusing a key with a different body is rejected with 422.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'
+            }), 400
+
+        store = get_idempotency_store()
+        scope = (*_scope(), key)
+        store_key = _store_key(scope)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        def run():
+            stored = store.get(store_key)
+            claimed = False
+            if stored is None:
+                claimed = store.add(store_key, {'fingerprint': fingerprint, 'pending': True}, ttl=CLAIM_TTL)
+            if not claimed:
+                # Another worker holds the key, or the shared tier failed,
+                # in which case the view runs unguarded
+                stored = _await_claim(store, store_key)
+            if stored is not None:
+                return stored, True
+
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+            except Exception:
+                if claimed:
+                    store.delete(store_key)
+                raise
+            stored = {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'body': base64.b64encode(response.get_data()).decode('ascii'),
+                'headers': [[name, value] for name, value in response.headers if name.lower() != 'content-length'],
+            }
+            if response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES:
+                store.set(store_key, stored)
+            elif claimed:
+                store.delete(store_key)
+            return stored, False
+
+        stored, replayed = get_single_flight().do(('idempotency', store_key), run)
+        if stored['fingerprint'] != fingerprint:
+            return jsonify({
+                'success': False,
+                'error': 'Idempotency-Key was already used with a different request body'
+            }), 422
+        if stored.get('pending'):
+            return jsonify({
+                'success': False,
+                'error': 'A request with this Idempotency-Key is still in progress'
+            }), 409
+
+        response = Response(base64.b64decode(stored['body']), status=stored['status'], headers=stored['headers'])
+        if replayed:
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    return decorated_function
@@ -0,0 +1,95 @@
+import uuid
+import decimal
+import dataclasses
+from datetime import date, datetime
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is the fallback
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    """
+    Serialise types the JSON encoders do not handle natively.
+    Dates use ISO 8601, matching the strings the routes already build.
+    """
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes and decodes with orjson when installed
+    and falls back to the stdlib ``json`` module otherwise.
+
+    Used for both ``jsonify`` responses and ``request.get_json``. Keys are not
+    sorted and non-ASCII is emitted as UTF-8 so both backends produce the same
+    output.
+    """
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+    use_orjson = orjson is not None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.use_orjson:
+            encoded = self._orjson_dumps(obj, dict(kwargs))
+            if encoded is not None:
+                return encoded.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so
+            # Flask's bad-request handling is unchanged
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+
+        # Build the body as bytes directly, skipping the str round trip
+        encoded = self._orjson_dumps(obj, dump_args)
+        if encoded is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj: Any, kwargs: dict):
+        """
+        Encode with orjson, returning None when the arguments or the data
+        need the stdlib encoder (unsupported options, ints beyond 64 bits)
+        """
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        if kwargs or indent not in (None, 2):
+            return None
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return None
@@ -0,0 +1,155 @@
+import base64
+from operator import attrgetter
+from typing import Dict
+
+try:
+    from google.protobuf import json_format
+    from google.protobuf.descriptor import FieldDescriptor
+    from livekit.protocol import models as livekit_models
+    from livekit.protocol import room as livekit_room
+except ImportError:  # livekit-protocol is optional, the JSON transport is the fallback
+    json_format = None
+
+CONTENT_TYPE = 'application/protobuf'
+
+# RoomService method -> (request message, response message)
+if json_format is not None:
+    MESSAGES = {
+        'CreateRoom': (livekit_room.CreateRoomRequest, livekit_models.Room),
+        'ListRooms': (livekit_room.ListRoomsRequest, livekit_room.ListRoomsResponse),
+        'DeleteRoom': (livekit_room.DeleteRoomRequest, livekit_room.DeleteRoomResponse),
+        'UpdateRoomMetadata': (livekit_room.UpdateRoomMetadataRequest, livekit_models.Room),
+    }
+else:
+    MESSAGES = {}
+
+# Fields no route reads, left out of decoded messages. Codec lists are most
+# of the cost of converting a room, and the TURN password is a credential.
+OMITTED_FIELDS = {
+    'livekit.Room': {'enabled_codecs', 'turn_password', 'version'},
+}
+
+_plans = {}
+
+
+def available() -> bool:
+    return json_format is not None
+
+
+def encode_request(method: str, payload: Dict) -> bytes:
+    """Serialise a Twirp JSON-shaped request dict as its protobuf message"""
+    request_type, _ = MESSAGES[method]
+    return json_format.ParseDict(payload, request_type(), ignore_unknown_fields=True).SerializeToString()
+
+
+def decode_response(method: str, data: bytes) -> Dict:
+    """Parse a protobuf response into the dict the Twirp JSON API returns"""
+    _, response_type = MESSAGES[method]
+    message = response_type()
+    message.ParseFromString(data)
+    return message_to_dict(message)
+
+
+def message_to_dict(message) -> Dict:
+    """
+    protojson-style dict of a message: camelCase keys, 64-bit integers as
+    strings, enums by name and every scalar field present, as LiveKit's JSON
+    responses have them. Unset message fields and OMITTED_FIELDS are left out.
+
+    Fields are planned once per message type, and plain scalars (most of a
+    Room) are read with a single attrgetter call rather than one by one.
+    """
+    plan = _plans.get(message.DESCRIPTOR)
+    if plan is None:
+        plan = _plans[message.DESCRIPTOR] = _plan(message.DESCRIPTOR)
+    getter, scalar_names, int64_positions, other_fields = plan
+
+    if getter is None:
+        out = {}
+    else:
+        values = getter(message)
+        if len(scalar_names) == 1:
+            values = (values,)
+        if int64_positions:
+            values = list(values)
+            for i in int64_positions:
+                values[i] = str(values[i])
+        out = dict(zip(scalar_names, values))
+
+    for name, json_name, convert, is_message, repeated in other_fields:
+        if is_message and not repeated:
+            if message.HasField(name):
+                out[json_name] = message_to_dict(getattr(message, name))
+            continue
+        value = getattr(message, name)
+        if repeated:
+            out[json_name] = [message_to_dict(item) for item in value] if is_message else [convert(item) for item in value]
+        else:
+            out[json_name] = convert(value)
+    return out
+
+
+_INT64_TYPES = (
+    FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT64, FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED64, FieldDescriptor.TYPE_SFIXED64,
+) if json_format is not None else ()
+
+
+def _identity(value):
+    return value
+
+
+def _bytes(value):
+    return base64.b64encode(value).decode('ascii')
+
+
+def _plan(descriptor):
+    """
+    (attrgetter over the plain scalar fields, their json names, positions of
+    the 64-bit ones among them, per-field plans for everything else)
+    """
+    omitted = OMITTED_FIELDS.get(descriptor.full_name, ())
+    scalars, int64_positions, other_fields = [], [], []
+    for field in descriptor.fields:
+        if field.name in omitted:
+            continue
+        planned = _plan_field(field)
+        name, json_name, convert, is_message, repeated = planned
+        if convert in (_identity, str) and not is_message and not repeated:
+            if convert is str:
+                int64_positions.append(len(scalars))
+            scalars.append((name, json_name))
+        else:
+            other_fields.append(planned)
+    getter = attrgetter(*[name for name, _ in scalars]) if scalars else None
+    return getter, [json_name for _, json_name in scalars], int64_positions, other_fields
+
+
+def _plan_field(field):
+    """(name, json name, scalar converter, is message, is repeated) for one field"""
+    # protobuf 5.28+ has is_repeated; older releases only have label
+    repeated = field.is_repeated if hasattr(field, 'is_repeated') else field.label == FieldDescriptor.LABEL_REPEATED
+    if field.message_type is not None and field.message_type.GetOptions().map_entry:
+        value_field = field.message_type.fields_by_name['value']
+        if value_field.message_type is not None:
+            def convert(value):
+                return {str(k): message_to_dict(v) for k, v in value.items()}
+        else:
+            value_convert = _plan_field(value_field)[2]
+
+            def convert(value):
+                return {str(k): value_convert(v) for k, v in value.items()}
+        return field.name, field.json_name, convert, False, False
+
+    if field.type in _INT64_TYPES:
+        convert = str
+    elif field.type == FieldDescriptor.TYPE_ENUM:
+        values = field.enum_type.values_by_number
+
+        def convert(value):
+            return values[value].name if value in values else value
+    elif field.type == FieldDescriptor.TYPE_BYTES:
+        convert = _bytes
+    else:
+        convert = _identity
+    return field.name, field.json_name, convert, field.type == FieldDescriptor.TYPE_MESSAGE, repeated
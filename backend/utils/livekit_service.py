@@ -1,19 +1,67 @@
 import os
 import time
+import threading
 import jwt
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import requests
 import json
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+from utils import deadline, livekit_protobuf
+from utils.cache import TieredCache, get_cache
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from utils.hedging import Hedger, get_hedger
+
+logger = logging.getLogger(__name__)
+
+class _ProtobufResponse:
+    """
+    requests.Response stand-in whose json() decodes a protobuf Twirp body into
+    the dict the JSON transport would have returned. Twirp errors are JSON
+    whatever the request encoding, so those are passed through.
+    """
+
+    def __init__(self, response: requests.Response, method: str):
+        self._response = response
+        self._method = method
+        self.status_code = response.status_code
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def json(self) -> Dict:
+        if self._response.headers.get('Content-Type', '').startswith(livekit_protobuf.CONTENT_TYPE):
+            return livekit_protobuf.decode_response(self._method, self._response.content)
+        return self._response.json()
+
 
 class LiveKitService:
-    def __init__(self):
-        self.api_key = os.getenv('LIVEKIT_API_KEY')
-        self.api_secret = os.getenv('LIVEKIT_API_SECRET')
-        self.server_url = os.getenv('LIVEKIT_SERVER_URL', 'wss://your-livekit-server.com')
+    def __init__(self, api_key: str = None, api_secret: str = None, server_url: str = None,
+                 timeout: float = 10, breaker: Optional[CircuitBreaker] = None, transport: str = 'json',
+                 cache: Optional[TieredCache] = None, hedger: Optional[Hedger] = None):
+        self.api_key = api_key or os.getenv('LIVEKIT_API_KEY')
+        self.api_secret = api_secret or os.getenv('LIVEKIT_API_SECRET')
+        self.server_url = server_url or os.getenv('LIVEKIT_SERVER_URL', 'wss://your-livekit-server.com')
+        self.timeout = timeout
+        self.breaker = breaker
+        # Room listings and room info, shared with other workers through the
+        # cache's L2; rooms changed through this service are invalidated
+        self.cache = cache
+        # Hedges ListRooms calls that run slower than usual
+        self.hedger = hedger
         
         if not self.api_key or not self.api_secret:
             raise ValueError("LiveKit API credentials not found in environment variables")
+        
+        if transport == 'protobuf' and not livekit_protobuf.available():
+            logger.warning("LIVEKIT_TRANSPORT=protobuf needs the livekit-protocol package; using JSON")
+            transport = 'json'
+        self.transport = transport
     
     def generate_access_token(self, room_name: str, participant_name: str, permissions: Dict = None) -> str:
         """
@@ -48,36 +96,24 @@ class LiveKitService:
         token = jwt.encode(payload, self.api_secret, algorithm='HS256')
         return token
     
-    def create_room(self, room_name: str, max_participants: int = 2, metadata: Dict = None) -> Dict:
+    def create_room(self, room_name: str, max_participants: int = 2, metadata: Dict = None,
+                    empty_timeout: int = 300) -> Dict:
         """
         Create a new LiveKit room
         """
         try:
-            # Generate admin token for API calls
-            admin_token = self._generate_admin_token()
-            
             room_config = {
                 'name': room_name,
-                'emptyTimeout': 300,  # 5 minutes
+                'emptyTimeout': empty_timeout,  # 5 minutes by default
                 'maxParticipants': max_participants,
                 'metadata': json.dumps(metadata or {})
             }
             
-            headers = {
-                'Authorization': f'Bearer {admin_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Make API call to create room
-            response = requests.post(
-                f"{self.server_url.replace('wss://', 'https://')}/twirp/livekit.RoomService/CreateRoom",
-                headers=headers,
-                json=room_config,
-                timeout=10
-            )
+            response = self._twirp('CreateRoom', room_config)
             
             if response.status_code == 200:
                 room_data = response.json()
+                self._invalidate(room_name)
                 return {
                     'success': True,
                     'room': {
@@ -95,6 +131,10 @@ class LiveKitService:
                     'error': f'Failed to create room: {response.text}'
                 }
                 
+        except CircuitOpenError as e:
+            return self._unavailable(e)
+        except deadline.DeadlineExceeded as e:
+            return self._deadline_exceeded(e)
         except Exception as e:
             return {
                 'success': False,
@@ -105,26 +145,23 @@ class LiveKitService:
         """
         List all active LiveKit rooms
         """
-        try:
-            admin_token = self._generate_admin_token()
-            
-            headers = {
-                'Authorization': f'Bearer {admin_token}',
-                'Content-Type': 'application/json'
+        rooms = self._cached('rooms')
+        if rooms is not None:
+            return {
+                'success': True,
+                'rooms': rooms
             }
-            
-            response = requests.post(
-                f"{self.server_url.replace('wss://', 'https://')}/twirp/livekit.RoomService/ListRooms",
-                headers=headers,
-                json={},
-                timeout=10
-            )
+        
+        try:
+            response = self._read('ListRooms', 'ListRooms', {})
             
             if response.status_code == 200:
                 rooms_data = response.json()
+                rooms = rooms_data.get('rooms', [])
+                self._store('rooms', rooms)
                 return {
                     'success': True,
-                    'rooms': rooms_data.get('rooms', [])
+                    'rooms': rooms
                 }
             else:
                 return {
@@ -132,6 +169,10 @@ class LiveKitService:
                     'error': f'Failed to list rooms: {response.text}'
                 }
                 
+        except CircuitOpenError as e:
+            return self._unavailable(e)
+        except deadline.DeadlineExceeded as e:
+            return self._deadline_exceeded(e)
         except Exception as e:
             return {
                 'success': False,
@@ -143,21 +184,10 @@ class LiveKitService:
         Delete a LiveKit room
         """
         try:
-            admin_token = self._generate_admin_token()
-            
-            headers = {
-                'Authorization': f'Bearer {admin_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(
-                f"{self.server_url.replace('wss://', 'https://')}/twirp/livekit.RoomService/DeleteRoom",
-                headers=headers,
-                json={'room': room_name},
-                timeout=10
-            )
+            response = self._twirp('DeleteRoom', {'room': room_name})
             
             if response.status_code == 200:
+                self._invalidate(room_name)
                 return {
                     'success': True,
                     'message': f'Room {room_name} deleted successfully'
@@ -168,6 +198,10 @@ class LiveKitService:
                     'error': f'Failed to delete room: {response.text}'
                 }
                 
+        except CircuitOpenError as e:
+            return self._unavailable(e)
+        except deadline.DeadlineExceeded as e:
+            return self._deadline_exceeded(e)
         except Exception as e:
             return {
                 'success': False,
@@ -178,26 +212,22 @@ class LiveKitService:
         """
         Get information about a specific room
         """
-        try:
-            admin_token = self._generate_admin_token()
-            
-            headers = {
-                'Authorization': f'Bearer {admin_token}',
-                'Content-Type': 'application/json'
+        room = self._cached(f'room:{room_name}')
+        if room is not None:
+            return {
+                'success': True,
+                'room': room
             }
-            
-            response = requests.post(
-                f"{self.server_url.replace('wss://', 'https://')}/twirp/livekit.RoomService/ListRooms",
-                headers=headers,
-                json={'names': [room_name]},
-                timeout=10
-            )
+        
+        try:
+            response = self._read('GetRoom', 'ListRooms', {'names': [room_name]})
             
             if response.status_code == 200:
                 rooms_data = response.json()
                 rooms = rooms_data.get('rooms', [])
                 
                 if rooms:
+                    self._store(f'room:{room_name}', rooms[0])
                     return {
                         'success': True,
                         'room': rooms[0]
@@ -213,12 +243,140 @@ class LiveKitService:
                     'error': f'Failed to get room info: {response.text}'
                 }
                 
+        except CircuitOpenError as e:
+            return self._unavailable(e)
+        except deadline.DeadlineExceeded as e:
+            return self._deadline_exceeded(e)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Failed to get room info: {str(e)}'
             }
     
+    def update_room_metadata(self, room_name: str, metadata: Dict) -> Dict:
+        """
+        Replace the metadata of an existing room
+        """
+        try:
+            response = self._twirp('UpdateRoomMetadata', {'room': room_name, 'metadata': json.dumps(metadata)})
+            
+            if response.status_code == 200:
+                self._invalidate(room_name)
+                return {
+                    'success': True,
+                    'room': response.json()
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f'Failed to update room metadata: {response.text}'
+                }
+                
+        except CircuitOpenError as e:
+            return self._unavailable(e)
+        except deadline.DeadlineExceeded as e:
+            return self._deadline_exceeded(e)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to update room metadata: {str(e)}'
+            }
+    
+    def server_url_for(self, room_name: str) -> str:
+        """
+        URL clients should connect to for ``room_name``
+        """
+        return self.server_url
+    
+    def circuit_snapshot(self) -> Dict:
+        """
+        Circuit breaker state for health endpoints
+        """
+        return self.breaker.snapshot() if self.breaker is not None else {}
+    
+    def _cached(self, key: str):
+        return self.cache.get(f'{self.server_url}|{key}') if self.cache is not None else None
+    
+    def _store(self, key: str, value):
+        if self.cache is not None:
+            self.cache.set(f'{self.server_url}|{key}', value)
+    
+    def _invalidate(self, room_name: str):
+        if self.cache is not None:
+            self.cache.delete(f'{self.server_url}|rooms')
+            self.cache.delete(f'{self.server_url}|room:{room_name}')
+    
+    def _read(self, operation: str, method: str, payload: Dict) -> requests.Response:
+        """
+        Idempotent RoomService call, hedged when a hedger is configured
+        """
+        if self.hedger is None:
+            return self._twirp(method, payload)
+        name = self.breaker.name if self.breaker is not None else 'livekit'
+        return self.hedger.call(f'{name}/{operation}', self._twirp, method, payload)
+    
+    def _twirp(self, method: str, payload: Dict) -> requests.Response:
+        """
+        POST a Twirp RoomService call through the circuit breaker, encoded
+        as JSON or protobuf per ``transport``; either way ``json()`` on the
+        result gives the JSON-shaped dict.
+        Transport errors and 5xx responses count as upstream failures.
+        The timeout is cut to what is left of the request deadline.
+        """
+        timeout = deadline.timeout(self.timeout)
+        probe = self.breaker.before_call() if self.breaker is not None else False
+        
+        url = f"{self.server_url.replace('wss://', 'https://')}/twirp/livekit.RoomService/{method}"
+        headers = {'Authorization': f'Bearer {self._generate_admin_token()}'}
+        try:
+            if self.transport == 'protobuf':
+                headers['Content-Type'] = livekit_protobuf.CONTENT_TYPE
+                response = _ProtobufResponse(
+                    requests.post(url, headers=headers, data=livekit_protobuf.encode_request(method, payload),
+                                  timeout=timeout),
+                    method
+                )
+            else:
+                headers['Content-Type'] = 'application/json'
+                response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        except Exception as e:
+            # A timeout cut short by the request deadline says nothing about LiveKit
+            if deadline.expired():
+                if self.breaker is not None:
+                    self.breaker.release(probe)
+                raise deadline.DeadlineExceeded() from e
+            if self.breaker is not None:
+                self.breaker.record_failure(probe)
+            raise
+        
+        if self.breaker is not None:
+            if response.status_code >= 500:
+                self.breaker.record_failure(probe)
+            else:
+                self.breaker.record_success(probe)
+        return response
+    
+    def _unavailable(self, error: CircuitOpenError) -> Dict:
+        """
+        Result returned without calling LiveKit while its circuit is open
+        """
+        return {
+            'success': False,
+            'error': str(error),
+            'unavailable': True,
+            'retryAfter': error.retry_after
+        }
+    
+    def _deadline_exceeded(self, error: deadline.DeadlineExceeded) -> Dict:
+        """
+        Result returned when the request's deadline left no time for LiveKit
+        """
+        return {
+            'success': False,
+            'error': str(error),
+            'deadlineExceeded': True
+        }
+    
     def _generate_admin_token(self) -> str:
         """
         Generate an admin token for API calls
@@ -234,4 +392,252 @@ class LiveKitService:
             }
         }
         
-        return jwt.encode(payload, self.api_secret, algorithm='HS256') 
\ No newline at end of file
+        return jwt.encode(payload, self.api_secret, algorithm='HS256')
+
+
+class ShardedLiveKitService:
+    """
+    LiveKitService facade over several LiveKit servers.
+
+    New rooms are placed on the least-loaded reachable shard, by participant
+    count and then room count, using the loads seen by the last
+    ``list_active_rooms`` (refreshed once they are older than ``load_ttl``).
+    Shards that failed that listing or whose circuit is open are skipped.
+    Calls for an existing room go to its owning shard through a
+    room name -> shard map; rooms not in the map are looked up on every
+    shard in parallel.
+    """
+    
+    PLACEMENT_GRACE = 60  # seconds a placed room stays mapped before it shows up in listings
+    
+    def __init__(self, shards: List[LiveKitService], load_ttl: float = 5.0):
+        if not shards:
+            raise ValueError("At least one LiveKit server is required")
+        self.shards = shards
+        self.load_ttl = load_ttl
+        self._owners = {}  # room name -> shard index
+        self._placed_at = {}  # room name -> monotonic time, for rooms placed by this process
+        self._loads = [(0, 0)] * len(shards)  # shard index -> (participants, rooms)
+        self._loads_at = None
+        self._unreachable = set()  # shard indexes whose last ListRooms failed
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='livekit-shard')
+    
+    @property
+    def server_url(self) -> str:
+        return self.shards[0].server_url
+    
+    def server_url_for(self, room_name: str) -> str:
+        return self.shards[self._shard_for(room_name)].server_url
+    
+    def circuit_snapshot(self) -> Dict:
+        return {shard.server_url: shard.circuit_snapshot() for shard in self.shards}
+    
+    def generate_access_token(self, room_name: str, participant_name: str, permissions: Dict = None) -> str:
+        """
+        Token signed with the credentials of the shard that owns (or will own) the room
+        """
+        return self.shards[self._shard_for(room_name)].generate_access_token(room_name, participant_name, permissions)
+    
+    def create_room(self, room_name: str, max_participants: int = 2, metadata: Dict = None,
+                    empty_timeout: int = 300) -> Dict:
+        index = self._place(room_name)
+        result = self.shards[index].create_room(room_name, max_participants, metadata, empty_timeout)
+        if not result['success']:
+            with self._lock:
+                if self._owners.get(room_name) == index:
+                    del self._owners[room_name]
+                    self._placed_at.pop(room_name, None)
+        return result
+    
+    def list_active_rooms(self) -> Dict:
+        """
+        ListRooms on every shard in parallel; shards that fail are left out
+        unless all of them fail
+        """
+        results = self._on_every_shard(lambda shard: shard.list_active_rooms())
+        
+        rooms = []
+        owners = {}
+        loads = list(self._loads)
+        failures = []
+        unreachable = set()
+        for index, result in enumerate(results):
+            if not result['success']:
+                failures.append(result)
+                unreachable.add(index)
+                logger.warning(f"ListRooms on {self.shards[index].server_url} failed: {result['error']}")
+                continue
+            shard_rooms = result['rooms']
+            rooms.extend(shard_rooms)
+            owners.update((room.get('name'), index) for room in shard_rooms)
+            loads[index] = (sum(room.get('numParticipants', 0) for room in shard_rooms), len(shard_rooms))
+        
+        if len(failures) == len(self.shards):
+            return failures[0]
+        
+        now = time.monotonic()
+        with self._lock:
+            # Keep rooms placed recently that the listing may not show yet
+            for name, placed_at in list(self._placed_at.items()):
+                if now - placed_at > self.PLACEMENT_GRACE or name in owners:
+                    del self._placed_at[name]
+                elif name in self._owners:
+                    owners[name] = self._owners[name]
+            # Unreachable shards still own their rooms
+            owners.update((name, index) for name, index in self._owners.items() if index in unreachable)
+            self._owners = owners
+            self._loads = loads
+            self._loads_at = now
+            self._unreachable = unreachable
+        
+        result = {
+            'success': True,
+            'rooms': rooms
+        }
+        if failures:
+            result['partial'] = True
+        return result
+    
+    def delete_room(self, room_name: str) -> Dict:
+        result = self.shards[self._shard_for(room_name)].delete_room(room_name)
+        if result['success']:
+            with self._lock:
+                self._owners.pop(room_name, None)
+                self._placed_at.pop(room_name, None)
+        return result
+    
+    def get_room_info(self, room_name: str) -> Dict:
+        with self._lock:
+            index = self._owners.get(room_name)
+        if index is not None:
+            return self.shards[index].get_room_info(room_name)
+        index, result = self._find(room_name)
+        if index is None:
+            return {
+                'success': False,
+                'error': 'Room not found'
+            }
+        return result
+    
+    def update_room_metadata(self, room_name: str, metadata: Dict) -> Dict:
+        return self.shards[self._shard_for(room_name)].update_room_metadata(room_name, metadata)
+    
+    def _on_every_shard(self, fn) -> List:
+        """
+        ``fn(shard)`` for every shard in parallel, each in a copy of the
+        caller's context so the request deadline applies
+        """
+        futures = [self._executor.submit(contextvars.copy_context().run, fn, shard) for shard in self.shards]
+        return [future.result() for future in futures]
+    
+    def _shard_for(self, room_name: str) -> int:
+        """
+        Owning shard of an existing room, or where a new one would be placed
+        """
+        index = self._lookup(room_name)
+        return index if index is not None else self._place(room_name)
+    
+    def _lookup(self, room_name: str) -> Optional[int]:
+        with self._lock:
+            index = self._owners.get(room_name)
+        if index is not None:
+            return index
+        return self._find(room_name)[0]
+    
+    def _find(self, room_name: str) -> Tuple[Optional[int], Optional[Dict]]:
+        """
+        Ask every shard for the room; returns the owner and its answer, and
+        remembers the owner
+        """
+        results = self._on_every_shard(lambda shard: shard.get_room_info(room_name))
+        for index, result in enumerate(results):
+            if result['success']:
+                with self._lock:
+                    self._owners[room_name] = index
+                return index, result
+        return None, None
+    
+    def _place(self, room_name: str) -> int:
+        with self._lock:
+            stale = self._loads_at is None or time.monotonic() - self._loads_at > self.load_ttl
+        if stale:
+            self.list_active_rooms()
+        
+        with self._lock:
+            index = self._owners.get(room_name)
+            if index is not None:
+                return index
+            candidates = [
+                i for i, shard in enumerate(self.shards)
+                if i not in self._unreachable
+                and (shard.breaker is None or shard.breaker.state != shard.breaker.OPEN)
+            ] or list(range(len(self.shards)))
+            index = min(candidates, key=lambda i: self._loads[i])
+            participants, rooms = self._loads[index]
+            self._loads[index] = (participants, rooms + 1)
+            self._owners[room_name] = index
+            self._placed_at[room_name] = time.monotonic()
+        return index
+
+
+def parse_livekit_servers(value: Optional[str]) -> List[Dict]:
+    """
+    Parse LIVEKIT_SERVERS: a JSON list of {"url", "apiKey", "apiSecret"} objects
+    """
+    if not value:
+        return []
+    try:
+        servers = json.loads(value)
+    except ValueError:
+        raise ValueError("LIVEKIT_SERVERS must be a JSON list of {\"url\", \"apiKey\", \"apiSecret\"} objects")
+    if not isinstance(servers, list) or not all(
+        isinstance(server, dict) and server.get('url') and server.get('apiKey') and server.get('apiSecret')
+        for server in servers
+    ):
+        raise ValueError("Every LIVEKIT_SERVERS entry needs url, apiKey and apiSecret")
+    return servers
+
+
+_service_lock = threading.Lock()
+
+def get_livekit_service(app=None):
+    """
+    Return the app's shared LiveKitService, creating it from the app config
+    on first use so that building the app never requires LiveKit credentials
+    """
+    app = app or current_app._get_current_object()
+    service = app.extensions.get('livekit_service')
+    if service is None:
+        with _service_lock:
+            service = app.extensions.get('livekit_service')
+            if service is None:
+                servers = parse_livekit_servers(app.config.get('LIVEKIT_SERVERS'))
+                room_cache = get_cache('rooms', app) if app.config['ROOM_CACHE_TTL'] > 0 else None
+                if servers:
+                    service = ShardedLiveKitService([
+                        LiveKitService(
+                            api_key=server['apiKey'],
+                            api_secret=server['apiSecret'],
+                            server_url=server['url'],
+                            timeout=app.config['LIVEKIT_TIMEOUT'],
+                            breaker=get_circuit_breaker(f"livekit:{server['url']}", app),
+                            transport=app.config['LIVEKIT_TRANSPORT'],
+                            cache=room_cache,
+                            hedger=get_hedger(app)
+                        )
+                        for server in servers
+                    ], load_ttl=app.config['LIVEKIT_SHARD_LOAD_TTL'])
+                else:
+                    service = LiveKitService(
+                        api_key=app.config.get('LIVEKIT_API_KEY'),
+                        api_secret=app.config.get('LIVEKIT_API_SECRET'),
+                        server_url=app.config.get('LIVEKIT_SERVER_URL'),
+                        timeout=app.config['LIVEKIT_TIMEOUT'],
+                        breaker=get_circuit_breaker('livekit', app),
+                        transport=app.config['LIVEKIT_TRANSPORT'],
+                        cache=room_cache,
+                        hedger=get_hedger(app)
+                    )
+                app.extensions['livekit_service'] = service
+    return service
@@ -0,0 +1,295 @@
+import gc
+import os
+import time
+import random
+import logging
+import threading
+import tracemalloc
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_profiler_lock = threading.Lock()
+
+# The import system and the instrumentation itself are not what we are looking for
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process from /proc, None where there is none"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def gc_stats() -> Dict:
+    """Per-generation collection counts and the objects awaiting collection"""
+    return {
+        'generations': [
+            {'collections': stats['collections'], 'collected': stats['collected'],
+             'uncollectable': stats['uncollectable'], 'pending': pending}
+            for stats, pending in zip(gc.get_stats(), gc.get_count())
+        ],
+        'garbage': len(gc.garbage)
+    }
+
+
+def top_types(limit: int = 20) -> List[Tuple[str, int]]:
+    """
+    Most numerous live object types tracked by gc. Walks every object, so it
+    is only computed on request, never periodically.
+    """
+    counts = Counter(f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in gc.get_objects())
+    return counts.most_common(limit)
+
+
+def _group(snapshot) -> Dict[str, Tuple[int, int]]:
+    """Snapshot traces summed per source line: 'file:line' -> (bytes, blocks)"""
+    return {
+        f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}": (stat.size, stat.count)
+        for stat in snapshot.statistics('lineno')
+    }
+
+
+def _diff(current: Dict, previous: Dict, limit: int) -> List[Dict]:
+    """The ``limit`` source lines whose traced memory grew the most"""
+    growth = []
+    for where, (size, count) in current.items():
+        before_size, before_count = previous.get(where, (0, 0))
+        if size > before_size:
+            growth.append((size - before_size, count - before_count, size, where))
+    growth.sort(reverse=True)
+    return [
+        {'where': where, 'sizeDiff': size_diff, 'countDiff': count_diff, 'size': size}
+        for size_diff, count_diff, size, where in growth[:limit]
+    ]
+
+
+class MemoryProfiler:
+    """
+    Memory instrumentation for one worker process.
+
+    tracemalloc slows every allocation while it traces, so by default it
+    only traces in windows: every ``interval`` seconds it traces for
+    ``window`` seconds, with ``frames`` frames of traceback, then snapshots
+    the allocations made in the window that are still held and stops. The
+    overhead is paid for ``window / interval`` of the time. Snapshots are
+    summed per source line, and each keeps the ``top_n`` lines that held
+    the most (the last ``history`` of them). A line near the top of every
+    window is a leak candidate. Summing per line keeps a few thousand
+    counters rather than whole snapshots.
+
+    With ``window`` 0 (or not below ``interval``) it traces continuously, as
+    for a soak test. Each snapshot then keeps the lines that grew most since
+    the previous one, and against the first one (the baseline).
+
+    A ``sample_rate`` share of the requests served while tracing also
+    records the traced memory that is still held when the request ends, per
+    endpoint. tracemalloc counts the whole process, so a sample includes
+    whatever other threads allocated meanwhile. Across many samples,
+    endpoints that retain memory still stand out.
+
+    gc.callbacks times each collection per generation.
+    """
+
+    def __init__(self, interval: float = 300.0, top_n: int = 20, frames: int = 1,
+                 sample_rate: float = 0.05, history: int = 12, window: float = 30.0):
+        self.interval = interval
+        self.window = window if 0 < window < interval else 0
+        self.top_n = top_n
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._routes = {}  # endpoint -> [samples, total net bytes, max net bytes]
+        self._history = deque(maxlen=history)
+        self._baseline = None
+        self._previous = None
+        self._windows = 0  # tracing windows opened, so samples spanning two are dropped
+        self._gc_started = None
+        self._gc_seconds = [0.0] * len(gc.get_count())
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.window and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        gc.callbacks.append(self._on_gc)
+        self._thread = threading.Thread(target=self._run, name='memory-snapshots', daemon=True)
+        self._thread.start()
+        if self.window:
+            logger.info(f"Memory profiler started: tracing {self.window}s every {self.interval}s, "
+                        f"{self.sample_rate:.0%} of traced requests sampled")
+        else:
+            logger.info(f"Memory profiler started: snapshots every {self.interval}s, "
+                        f"{self.sample_rate:.0%} of requests sampled")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+    def begin_request(self) -> Optional[Tuple[int, int]]:
+        """
+        Tracing window and traced bytes at the start of a sampled request,
+        None when it is not sampled
+        """
+        if random.random() >= self.sample_rate or not tracemalloc.is_tracing():
+            return None
+        return self._windows, tracemalloc.get_traced_memory()[0]
+
+    def end_request(self, endpoint: Optional[str], started: Tuple[int, int]):
+        window, before = started
+        if window != self._windows or not tracemalloc.is_tracing():
+            # Tracing stopped or restarted during the request: the counts are unrelated
+            return
+        net = tracemalloc.get_traced_memory()[0] - before
+        with self._lock:
+            stats = self._routes.setdefault(endpoint or 'unmatched', [0, 0, 0])
+            stats[0] += 1
+            stats[1] += net
+            stats[2] = max(stats[2], net)
+
+    def take_snapshot(self) -> Optional[Dict]:
+        """
+        Snapshot now, diff it against the previous one and keep the result.
+        Between tracing windows there is nothing to snapshot: the next
+        window is opened early instead, and None returned.
+        """
+        started = time.perf_counter()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        except RuntimeError:
+            # Not tracing (or a window just closed)
+            self._wake.set()
+            return None
+        grouped = _group(snapshot.filter_traces(SNAPSHOT_FILTERS))
+        with self._lock:
+            previous, self._previous = self._previous, grouped
+            if self._baseline is None and not self.window:
+                self._baseline = grouped
+            entry = {
+                'at': time.time(),
+                'rssBytes': rss_bytes(),
+                'tracedBytes': current,
+                'tracedPeakBytes': peak,
+                'snapshotMs': round((time.perf_counter() - started) * 1000, 1),
+                'top': _diff(grouped, previous, self.top_n) if previous is not None else []
+            }
+            self._history.append(entry)
+        return entry
+
+    def summary(self) -> Dict:
+        """Headline numbers, for health endpoints"""
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'rssBytes': rss_bytes(),
+            'tracedBytes': current,
+            'tracedPeakBytes': peak,
+            'gcCollections': [stats['collections'] for stats in gc.get_stats()],
+            'gcPauseMs': [round(seconds * 1000, 1) for seconds in self._gc_seconds]
+        }
+
+    def report(self) -> Dict:
+        """Everything collected so far: growth since the baseline, recent diffs, routes, gc"""
+        with self._lock:
+            routes = {
+                endpoint: {'samples': samples, 'avgNetBytes': round(total / samples), 'maxNetBytes': largest}
+                for endpoint, (samples, total, largest) in self._routes.items()
+            }
+            since_baseline = _diff(self._previous, self._baseline, self.top_n) if self._baseline is not None else []
+            history = list(self._history)
+        return {
+            **self.summary(),
+            'gc': gc_stats(),
+            'routes': dict(sorted(routes.items(), key=lambda item: -item[1]['avgNetBytes'])),
+            'sinceBaseline': since_baseline,
+            'snapshots': history
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.window:
+                self._trace_window()
+                pause = self.interval - self.window
+            else:
+                # The first snapshot is the baseline later growth is measured against
+                self._snapshot()
+                pause = self.interval
+            self._wake.wait(pause)
+            self._wake.clear()
+
+    def _trace_window(self):
+        """Trace for ``window`` seconds, then snapshot what the window's allocations still hold"""
+        with self._lock:
+            self._windows += 1
+            # The window starts with no traces, so its snapshot is all growth
+            self._previous = {}
+        tracemalloc.start(self.frames)
+        try:
+            if not self._stop.wait(self.window):
+                self._snapshot()
+        finally:
+            tracemalloc.stop()
+
+    def _snapshot(self):
+        try:
+            self.take_snapshot()
+        except Exception as e:
+            logger.error(f"Memory snapshot failed: {e}")
+
+    def _on_gc(self, phase: str, info: Dict):
+        # Collections run with the GIL held, so they never overlap
+        if phase == 'start':
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self._gc_seconds[info['generation']] += time.perf_counter() - self._gc_started
+            self._gc_started = None
+
+
+def get_memory_profiler(app=None) -> Optional[MemoryProfiler]:
+    """Return the app's memory profiler, starting it on first use; None when disabled"""
+    app = app or current_app._get_current_object()
+    if not app.config['MEMORY_PROFILER_ENABLED']:
+        return None
+    profiler = app.extensions.get('memory_profiler')
+    if profiler is None:
+        with _profiler_lock:
+            profiler = app.extensions.get('memory_profiler')
+            if profiler is None:
+                profiler = MemoryProfiler(
+                    interval=app.config['MEMORY_SNAPSHOT_INTERVAL'],
+                    top_n=app.config['MEMORY_TOP_N'],
+                    frames=app.config['MEMORY_TRACE_FRAMES'],
+                    sample_rate=app.config['MEMORY_SAMPLE_RATE'],
+                    window=app.config['MEMORY_TRACE_WINDOW']
+                )
+                app.extensions['memory_profiler'] = profiler
+                profiler.start()
+    return profiler
+
+
+def memory_summary(app=None) -> Dict:
+    """RSS and gc counts, plus tracemalloc totals when the profiler is enabled"""
+    profiler = get_memory_profiler(app)
+    if profiler is not None:
+        return profiler.summary()
+    return {
+        'rssBytes': rss_bytes(),
+        'gcCollections': [stats['collections'] for stats in gc.get_stats()]
+    }
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+# Innermost functions of threads that are blocked rather than running
+IDLE_FUNCTIONS = frozenset({'wait', 'select', 'poll', 'accept', 'readinto', '_wait_for_tstate_lock'})
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+def sample_stacks(duration: float, interval: float = 0.01, include_idle: bool = False,
+                  exclude: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    Sample the Python stacks of all other threads every ``interval`` seconds
+    for ``duration`` seconds.
+
+    Returns collapsed stacks ("thread;file:func;file:func" -> sample count),
+    the input format of flamegraph.pl and speedscope. Threads blocked in I/O
+    or on a lock are skipped unless ``include_idle`` is set. Only one profile
+    runs at a time per process; a concurrent request raises ProfilerBusyError.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running in this worker")
+    try:
+        skip = {threading.get_ident(), *(exclude or ())}
+        stacks = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in skip:
+                    continue
+                if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stacks[_collapse(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+            del frame
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0.0)))
+        return dict(stacks)
+    finally:
+        _profile_lock.release()
+
+
+def format_collapsed(stacks: Dict[str, int]) -> str:
+    """Render collapsed stacks one per line, hottest first"""
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
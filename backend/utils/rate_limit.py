@@ -0,0 +1,261 @@
+import os
+import math
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Tuple
+
+from flask import current_app, request, jsonify
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+_limiter_lock = threading.Lock()
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """
+    Parse a budget such as '10/minute' into (capacity, refill per second)
+    """
+    try:
+        count, period = rate.split('/', 1)
+        capacity = int(count)
+        seconds = PERIODS[period.strip().lower().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{rate}', expected '<count>/<second|minute|hour|day>'")
+    if capacity < 1:
+        raise ValueError(f"Invalid rate limit '{rate}', count must be positive")
+    return capacity, capacity / seconds
+
+
+class MemoryRateLimitBackend:
+    """
+    Single-process token buckets.
+
+    Each active key holds one [tokens, updated_at, refill_time] entry in an
+    OrderedDict kept in last-use order. A bucket idle long enough to have
+    refilled completely is indistinguishable from a new one, so it is evicted
+    from the front; the table is also capped at ``max_keys``.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def consume(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> Tuple[bool, float]:
+        """
+        Take ``cost`` tokens from ``key``'s bucket.
+        Returns (allowed, seconds until enough tokens are available).
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = [tokens, now, capacity / refill_rate]
+            self._evict(now)
+
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / refill_rate
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            _, updated_at, refill_time = next(iter(buckets.values()))
+            if now - updated_at < refill_time and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+
+class SQLiteRateLimitBackend:
+    """
+    Token buckets in a local SQLite file, shared by every worker process on
+    the host, so each user gets the configured budget rather than one per
+    worker. Each bucket is read and written in one IMMEDIATE transaction,
+    and rows are deleted once their bucket would have refilled.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS rate_limit_buckets_expiry ON rate_limit_buckets (expires_at);
+    """
+
+    PRUNE_EVERY = 256  # consumes between deletions of refilled buckets
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+        # The file holds user ids and client addresses
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> Tuple[bool, float]:
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(capacity, row[0] + max(0.0, now - row[1]) * refill_rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / refill_rate)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / refill_rate
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets shared across processes and nodes through a Redis-compatible
+    server. Each bucket is a hash updated atomically by a Lua script and
+    expires once it would have refilled.
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1])
+    if tokens == nil then
+        tokens = capacity
+    else
+        tokens = math.min(capacity, tokens + (now - tonumber(state[2])) * rate)
+    end
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        import redis  # optional dependency, only needed for this backend
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key: str, capacity: int, refill_rate: float, cost: int = 1) -> Tuple[bool, float]:
+        allowed, tokens = self._script(
+            keys=[self.prefix + key],
+            args=[capacity, refill_rate, cost, time.time()]
+        )
+        if int(allowed):
+            return True, 0.0
+        return False, (cost - float(tokens)) / refill_rate
+
+
+def get_rate_limiter(app=None):
+    """Return the app's rate limit backend, creating it from config on first use"""
+    app = app or current_app._get_current_object()
+    backend = app.extensions.get('rate_limiter')
+    if backend is None:
+        with _limiter_lock:
+            backend = app.extensions.get('rate_limiter')
+            if backend is None:
+                if app.config['RATE_LIMIT_BACKEND'] == 'redis':
+                    backend = RedisRateLimitBackend(app.config['RATE_LIMIT_REDIS_URL'])
+                elif app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+                    backend = SQLiteRateLimitBackend(app.config['RATE_LIMIT_PATH'])
+                else:
+                    backend = MemoryRateLimitBackend(max_keys=app.config['RATE_LIMIT_MAX_KEYS'])
+                app.extensions['rate_limiter'] = backend
+    return backend
+
+
+def _client_key():
+    """Authenticated user id when require_auth has run, otherwise the client IP"""
+    user = getattr(request, 'current_user', None)
+    if user is not None:
+        user_id = user.get('id') if isinstance(user, dict) else getattr(user, 'id', None)
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limit(name):
+    """
+    Decorator applying the RATE_LIMITS[name] token-bucket budget per user or IP.
+    Place it below @require_auth so authenticated requests are keyed by user.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            rate = config['RATE_LIMITS'].get(name)
+            if not config['RATE_LIMIT_ENABLED'] or not rate:
+                return f(*args, **kwargs)
+
+            capacity, refill_rate = parse_rate(rate)
+            key = f"{name}:{_client_key()}"
+            try:
+                allowed, retry_after = get_rate_limiter().consume(key, capacity, refill_rate)
+            except Exception as e:
+                # Fail open: a broken shared backend must not take the API down
+                logger.error(f"Rate limiter error: {str(e)}")
+                return f(*args, **kwargs)
+
+            if not allowed:
+                retry_after = max(1, math.ceil(retry_after))
+                response = jsonify({
+                    'error': 'Rate limit exceeded',
+                    'retryAfter': retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
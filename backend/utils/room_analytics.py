@@ -0,0 +1,466 @@
+import os
+import time
+import base64
+import hashlib
+import hmac
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+import jwt
+from flask import current_app
+
+from utils.livekit_service import get_livekit_service
+from utils.room_metadata import POOLED_SESSION_TYPE, RoomMetadata
+
+logger = logging.getLogger(__name__)
+
+_analytics_lock = threading.Lock()
+
+# Distinct subjects counted per bucket; the rest are counted as OTHER_SUBJECT
+MAX_SUBJECTS_PER_BUCKET = 50
+MAX_SUBJECT_LENGTH = 64
+OTHER_SUBJECT = 'Other'
+
+# A session missing from a room list is only ended if nothing has reported
+# it for this long: listings can be cached, and lag behind new rooms
+END_GRACE = 10.0  # seconds
+
+# Counters summed when buckets are rolled up, and those that take the maximum
+SUMMED = ('rooms_started', 'sessions_ended', 'session_seconds')
+MAXED = ('longest_session', 'peak_participants', 'peak_rooms', 'peak_room_participants')
+
+
+class WebhookError(Exception):
+    """Raised for webhook requests whose signature or body does not check out"""
+
+
+def verify_webhook(body: bytes, authorization: Optional[str], secrets: Dict[str, str]) -> Dict:
+    """
+    Check a LiveKit webhook the way LiveKit's WebhookReceiver does. The
+    Authorization header is a JWT, signed with the API secret of the key in
+    its ``iss`` claim. Its ``sha256`` claim is the base64 SHA-256 of the body.
+    Returns the token's claims.
+    """
+    if not authorization:
+        raise WebhookError('Missing Authorization header')
+    token = authorization.split(' ', 1)[1] if authorization.startswith('Bearer ') else authorization
+    try:
+        api_key = jwt.decode(token, options={'verify_signature': False}).get('iss')
+        secret = secrets.get(api_key)
+        if secret is None:
+            raise WebhookError(f'Unknown API key {api_key}')
+        claims = jwt.decode(token, secret, algorithms=['HS256'], options={'verify_aud': False})
+    except jwt.PyJWTError as e:
+        raise WebhookError(f'Invalid webhook token: {e}')
+    digest = base64.b64encode(hashlib.sha256(body).digest()).decode()
+    if not hmac.compare_digest(digest, claims.get('sha256') or ''):
+        raise WebhookError('Webhook body does not match its signature')
+    return claims
+
+
+def _started_at(room: Dict, metadata: RoomMetadata, default: float) -> float:
+    """
+    When a room's session began: the createdAt that /livekit/create-room
+    puts in the metadata, since pooled rooms are created long before they are
+    claimed, then LiveKit's creationTime
+    """
+    created_at = metadata.data.get('createdAt')
+    if isinstance(created_at, str):
+        try:
+            return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    try:
+        return float(room['creationTime']) or default
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+class RoomAnalytics:
+    """
+    Room session analytics folded into fixed-size time buckets.
+
+    Rooms come in from ListRooms snapshots (``observe``) or LiveKit webhooks
+    (``record_webhook``). Each room session (LiveKit room sid) is tracked
+    until it ends. Every update goes straight into the counters of the
+    bucket it falls in: rooms started, and rooms per subject, when a session
+    starts; sessions ended, total and longest duration when it ends; peak
+    concurrent participants and rooms as counts change. Each bucket is one
+    row plus at most MAX_SUBJECTS_PER_BUCKET subject rows, whatever the
+    traffic. A rollup reads only the buckets in its range and never raw
+    events.
+
+    Everything lives in a SQLite file shared by the workers on the host.
+    Updates are keyed by session sid, so several workers polling the same
+    rooms, or a webhook and a poll reporting the same session, count it once.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        sid TEXT PRIMARY KEY, room_name TEXT NOT NULL, subject TEXT NOT NULL,
+        started_at REAL NOT NULL, ended_at REAL, last_seen REAL NOT NULL,
+        participants INTEGER NOT NULL DEFAULT 0, peak_participants INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS sessions_ended_at ON sessions (ended_at);
+    CREATE TABLE IF NOT EXISTS buckets (
+        start INTEGER PRIMARY KEY,
+        rooms_started INTEGER NOT NULL DEFAULT 0, sessions_ended INTEGER NOT NULL DEFAULT 0,
+        session_seconds REAL NOT NULL DEFAULT 0, longest_session REAL NOT NULL DEFAULT 0,
+        peak_participants INTEGER NOT NULL DEFAULT 0, peak_rooms INTEGER NOT NULL DEFAULT 0,
+        peak_room_participants INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS bucket_subjects (
+        start INTEGER NOT NULL, subject TEXT NOT NULL, rooms INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (start, subject)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS room_stats (
+        room_name TEXT PRIMARY KEY, subject TEXT NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0, peak_participants INTEGER NOT NULL DEFAULT 0,
+        session_seconds REAL NOT NULL DEFAULT 0, longest_session REAL NOT NULL DEFAULT 0,
+        last_active REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS room_stats_last_active ON room_stats (last_active);
+    """
+
+    def __init__(self, path: str, get_service: Optional[Callable] = None, poll_interval: float = 30.0,
+                 bucket_seconds: int = 3600, retention_days: float = 90):
+        self.path = path
+        self.get_service = get_service
+        self.poll_interval = poll_interval
+        self.bucket_seconds = int(bucket_seconds)
+        self.retention = retention_days * 86400
+        self.polls = 0
+        self.last_error = None
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pruned_at = 0.0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Poll ListRooms in the background, unless analytics relies on webhooks only"""
+        if self.poll_interval <= 0 or self.get_service is None:
+            return
+        self._thread = threading.Thread(target=self._run, name='room-analytics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Ingestion
+
+    def poll_once(self) -> bool:
+        """Fetch the room list and fold it in; False when the poll failed"""
+        self.polls += 1
+        polled_at = time.time()
+        result = self.get_service().list_active_rooms()
+        if not result['success']:
+            self.last_error = result['error']
+            logger.warning(f"Room analytics poll failed: {result['error']}")
+            return False
+        self.last_error = None
+        # Rooms of an unreachable shard are missing, not finished
+        self.observe(result['rooms'], polled_at, complete=not result.get('partial'))
+        return True
+
+    def observe(self, rooms: Iterable[Dict], polled_at: float, complete: bool = True):
+        """
+        Fold in a ListRooms snapshot taken at ``polled_at``. When it is
+        complete, sessions it no longer lists end at ``polled_at``, unless
+        something (another worker's poll, a webhook) reported them within
+        END_GRACE seconds.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for room in rooms:
+                metadata = RoomMetadata.from_json(room.get('metadata'))
+                if metadata.session_type == POOLED_SESSION_TYPE or not room.get('sid'):
+                    continue
+                self._start(conn, room, metadata, polled_at)
+                self._participants(conn, room['sid'], room.get('numParticipants', 0), polled_at)
+            if complete:
+                ended = conn.execute(
+                    'SELECT sid FROM sessions WHERE ended_at IS NULL AND last_seen < ?', (polled_at - END_GRACE,)
+                ).fetchall()
+                for (sid,) in ended:
+                    self._end(conn, sid, polled_at)
+            self._peaks(conn, polled_at)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._maybe_prune(polled_at)
+
+    def record_webhook(self, event: Dict):
+        """
+        Fold in a LiveKit webhook event: room_started, room_finished,
+        participant_joined or participant_left. Other events are ignored.
+        """
+        kind = event.get('event')
+        room = event.get('room') or {}
+        sid = room.get('sid')
+        if kind not in ('room_started', 'room_finished', 'participant_joined', 'participant_left') or not sid:
+            return
+        try:
+            at = float(event.get('createdAt') or time.time())
+        except (TypeError, ValueError):
+            at = time.time()
+        metadata = RoomMetadata.from_json(room.get('metadata'))
+        if metadata.session_type == POOLED_SESSION_TYPE:
+            return
+
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if kind == 'room_finished':
+                self._end(conn, sid, at)
+            else:
+                # A missed room_started is made up for by the first event of the session
+                self._start(conn, room, metadata, at)
+                if 'numParticipants' in room:
+                    count = room['numParticipants']
+                else:
+                    row = conn.execute('SELECT participants FROM sessions WHERE sid = ?', (sid,)).fetchone()
+                    count = max((row[0] if row else 0) + (1 if kind == 'participant_joined' else -1), 0)
+                self._participants(conn, sid, count, at)
+            self._peaks(conn, at)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._maybe_prune(at)
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds) * self.bucket_seconds
+
+    def _add(self, conn, ts: float, **counters):
+        """Add to the summed counters, and raise the maxed ones, of the bucket holding ``ts``"""
+        columns = list(counters)
+        updates = ', '.join(
+            f"{c} = max({c}, excluded.{c})" if c in MAXED else f"{c} = {c} + excluded.{c}" for c in columns
+        )
+        conn.execute(
+            f"INSERT INTO buckets (start, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+            f"ON CONFLICT (start) DO UPDATE SET {updates}",
+            (self._bucket(ts), *counters.values())
+        )
+
+    def _start(self, conn, room: Dict, metadata: RoomMetadata, seen_at: float):
+        subject = (metadata.subject or 'Unknown')[:MAX_SUBJECT_LENGTH]
+        started_at = min(_started_at(room, metadata, seen_at), seen_at)
+        inserted = conn.execute(
+            'INSERT OR IGNORE INTO sessions (sid, room_name, subject, started_at, last_seen) VALUES (?, ?, ?, ?, ?)',
+            (room['sid'], room.get('name'), subject, started_at, seen_at)
+        ).rowcount
+        if not inserted:
+            return
+        bucket = self._bucket(started_at)
+        self._add(conn, started_at, rooms_started=1)
+        # Only the bucket's counters fold extra subjects into Other; the
+        # room keeps its own subject in room_stats
+        bucket_subject = subject
+        subjects = conn.execute('SELECT count(*) FROM bucket_subjects WHERE start = ?', (bucket,)).fetchone()[0]
+        if subjects >= MAX_SUBJECTS_PER_BUCKET and not conn.execute(
+                'SELECT 1 FROM bucket_subjects WHERE start = ? AND subject = ?', (bucket, subject)).fetchone():
+            bucket_subject = OTHER_SUBJECT
+        conn.execute(
+            'INSERT INTO bucket_subjects (start, subject, rooms) VALUES (?, ?, 1) '
+            'ON CONFLICT (start, subject) DO UPDATE SET rooms = rooms + 1',
+            (bucket, bucket_subject)
+        )
+        conn.execute(
+            'INSERT INTO room_stats (room_name, subject, sessions, last_active) VALUES (?, ?, 1, ?) '
+            'ON CONFLICT (room_name) DO UPDATE SET sessions = sessions + 1, subject = excluded.subject, '
+            'last_active = max(last_active, excluded.last_active)',
+            (room.get('name'), subject, seen_at)
+        )
+
+    def _participants(self, conn, sid: str, count: int, seen_at: float):
+        conn.execute(
+            'UPDATE sessions SET participants = ?, peak_participants = max(peak_participants, ?), '
+            'last_seen = max(last_seen, ?) WHERE sid = ? AND ended_at IS NULL',
+            (count, count, seen_at, sid)
+        )
+        conn.execute(
+            'UPDATE room_stats SET peak_participants = max(peak_participants, ?), last_active = max(last_active, ?) '
+            'WHERE room_name = (SELECT room_name FROM sessions WHERE sid = ?)',
+            (count, seen_at, sid)
+        )
+
+    def _end(self, conn, sid: str, ended_at: float):
+        row = conn.execute(
+            'SELECT room_name, started_at FROM sessions WHERE sid = ? AND ended_at IS NULL', (sid,)
+        ).fetchone()
+        if row is None:
+            return
+        room_name, started_at = row
+        duration = max(ended_at - started_at, 0.0)
+        conn.execute('UPDATE sessions SET ended_at = ?, participants = 0 WHERE sid = ?', (ended_at, sid))
+        self._add(conn, ended_at, sessions_ended=1, session_seconds=duration, longest_session=duration)
+        conn.execute(
+            'UPDATE room_stats SET session_seconds = session_seconds + ?, longest_session = max(longest_session, ?), '
+            'last_active = max(last_active, ?) WHERE room_name = ?',
+            (duration, duration, ended_at, room_name)
+        )
+
+    def _peaks(self, conn, ts: float):
+        rooms, participants, largest = conn.execute(
+            'SELECT count(*), coalesce(sum(participants), 0), coalesce(max(participants), 0) '
+            'FROM sessions WHERE ended_at IS NULL'
+        ).fetchone()
+        self._add(conn, ts, peak_participants=participants, peak_rooms=rooms, peak_room_participants=largest)
+
+    def _maybe_prune(self, now: float):
+        # Buckets, finished sessions and room totals past the retention period
+        if now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        cutoff = now - self.retention
+        conn = self._connect()
+        conn.execute('DELETE FROM buckets WHERE start < ?', (self._bucket(cutoff),))
+        conn.execute('DELETE FROM bucket_subjects WHERE start < ?', (self._bucket(cutoff),))
+        conn.execute('DELETE FROM sessions WHERE ended_at < ?', (cutoff,))
+        conn.execute('DELETE FROM room_stats WHERE last_active < ?', (cutoff,))
+
+    # Queries
+
+    def rollup(self, since: float, until: float, group_seconds: int) -> Dict:
+        """
+        Buckets between ``since`` and ``until`` merged into groups of
+        ``group_seconds`` (a multiple of the bucket size), with totals over
+        the whole range. Reads one row per bucket and per bucket subject.
+        """
+        conn = self._connect()
+        first, last = self._bucket(since), self._bucket(until)
+        columns = SUMMED + MAXED
+        groups = {}
+        for row in conn.execute(
+                f"SELECT start, {', '.join(columns)} FROM buckets WHERE start BETWEEN ? AND ? ORDER BY start",
+                (first, last)):
+            group = groups.setdefault(row[0] // group_seconds * group_seconds, {'subjects': {}})
+            for column, value in zip(columns, row[1:]):
+                group[column] = group.get(column, 0) + value if column in SUMMED else max(group.get(column, 0), value)
+        for start, subject, rooms in conn.execute(
+                'SELECT start, subject, rooms FROM bucket_subjects WHERE start BETWEEN ? AND ?', (first, last)):
+            subjects = groups.setdefault(start // group_seconds * group_seconds, {'subjects': {}})['subjects']
+            subjects[subject] = subjects.get(subject, 0) + rooms
+
+        totals = {'subjects': {}}
+        for group in groups.values():
+            for column in columns:
+                value = group.get(column, 0)
+                totals[column] = totals.get(column, 0) + value if column in SUMMED else max(totals.get(column, 0), value)
+            for subject, rooms in group['subjects'].items():
+                totals['subjects'][subject] = totals['subjects'].get(subject, 0) + rooms
+
+        live_rooms, live_participants = conn.execute(
+            'SELECT count(*), coalesce(sum(participants), 0) FROM sessions WHERE ended_at IS NULL'
+        ).fetchone()
+        return {
+            'buckets': [dict(_format_counters(groups[start]), start=_isoformat(start)) for start in sorted(groups)],
+            'totals': _format_counters(totals),
+            'live': {'activeRooms': live_rooms, 'participants': live_participants}
+        }
+
+    def room_stats(self, room_name: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Per-room totals, most recently active first, with the live session if there is one"""
+        conn = self._connect()
+        query = ('SELECT room_name, subject, sessions, peak_participants, session_seconds, longest_session, '
+                 'last_active FROM room_stats')
+        if room_name is not None:
+            rows = conn.execute(query + ' WHERE room_name = ?', (room_name,)).fetchall()
+        else:
+            rows = conn.execute(query + ' ORDER BY last_active DESC LIMIT ?', (limit,)).fetchall()
+
+        stats = []
+        for name, subject, sessions, peak, seconds, longest, last_active in rows:
+            live = conn.execute(
+                'SELECT started_at, participants, peak_participants FROM sessions '
+                'WHERE room_name = ? AND ended_at IS NULL', (name,)
+            ).fetchone()
+            ended = sessions - (1 if live else 0)
+            stats.append({
+                'roomName': name,
+                'subject': subject,
+                'sessions': sessions,
+                'peakParticipants': peak,
+                'avgSessionSeconds': round(seconds / ended, 1) if ended else None,
+                'longestSessionSeconds': round(longest, 1),
+                'lastActive': _isoformat(last_active),
+                'liveSession': {
+                    'startedAt': _isoformat(live[0]),
+                    'durationSeconds': round(time.time() - live[0], 1),
+                    'participants': live[1],
+                    'peakParticipants': live[2]
+                } if live else None
+            })
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Room analytics error: {str(e)}")
+            self._stop.wait(self.poll_interval)
+
+
+def _isoformat(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _format_counters(counters: Dict) -> Dict:
+    ended = counters.get('sessions_ended', 0)
+    return {
+        'roomsStarted': counters.get('rooms_started', 0),
+        'sessionsEnded': ended,
+        'avgSessionSeconds': round(counters.get('session_seconds', 0) / ended, 1) if ended else None,
+        'longestSessionSeconds': round(counters.get('longest_session', 0), 1),
+        'peakParticipants': counters.get('peak_participants', 0),
+        'peakRooms': counters.get('peak_rooms', 0),
+        'peakRoomParticipants': counters.get('peak_room_participants', 0),
+        'subjects': dict(sorted(counters.get('subjects', {}).items(), key=lambda item: -item[1]))
+    }
+
+
+def webhook_secrets(service) -> Dict[str, str]:
+    """API key -> secret of every LiveKit server the service talks to"""
+    return {shard.api_key: shard.api_secret for shard in getattr(service, 'shards', [service])}
+
+
+def get_room_analytics(app=None) -> Optional[RoomAnalytics]:
+    """Return the app's room analytics, starting its poller on first use; None when disabled"""
+    app = app or current_app._get_current_object()
+    if not app.config['ANALYTICS_ENABLED']:
+        return None
+    analytics = app.extensions.get('room_analytics')
+    if analytics is None:
+        with _analytics_lock:
+            analytics = app.extensions.get('room_analytics')
+            if analytics is None:
+                analytics = RoomAnalytics(
+                    app.config['ANALYTICS_PATH'],
+                    get_service=lambda: get_livekit_service(app),
+                    poll_interval=app.config['ANALYTICS_POLL_INTERVAL'],
+                    bucket_seconds=app.config['ANALYTICS_BUCKET_SECONDS'],
+                    retention_days=app.config['ANALYTICS_RETENTION_DAYS']
+                )
+                app.extensions['room_analytics'] = analytics
+                analytics.start()
+    return analytics
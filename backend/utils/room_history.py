@@ -0,0 +1,464 @@
+import os
+import json
+import time
+import base64
+import atexit
+import logging
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_history_lock = threading.Lock()
+
+# Event ids: milliseconds since 2024-01-01 UTC, 10 bits of process id and a
+# 12-bit counter, which keeps ids apart across workers. They exceed 2**53, so
+# clients receive them as strings. Cursors are not event ids but the seq
+# SQLite assigns when an event is written (see RoomHistory).
+ID_EPOCH_MS = 1704067200000
+MAX_CHAT_LENGTH = 2000
+MAX_STROKE_POINTS = 5000
+MAX_EVENTS_PER_REQUEST = 100
+WHITEBOARD_TOOLS = ('pen', 'eraser')
+
+
+class EventIds:
+    """Time-ordered 64-bit event ids"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def next(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            if now <= self._last_ms:
+                now = self._last_ms
+                self._counter += 1
+                if self._counter >= 4096:
+                    now += 1
+                    self._counter = 0
+            else:
+                self._counter = 0
+            self._last_ms = now
+            return (now << 22) | ((os.getpid() & 0x3FF) << 12) | self._counter
+
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def encode_points(points: List, scale: int = 10) -> bytes:
+    """
+    Delta-encode stroke points: coordinates are quantised to 1/scale pixel,
+    each point stored as its offset from the previous one, and the offsets
+    written as zigzag varints, so a typical pen move takes 2-4 bytes.
+    Raises OverflowError when a quantised coordinate or offset does not fit
+    in 64 bits, which the zigzag step relies on
+    """
+    out = bytearray()
+    previous_x = previous_y = 0
+    for x, y in points:
+        qx, qy = round(x * scale), round(y * scale)
+        for value in (qx, qy, qx - previous_x, qy - previous_y):
+            if not INT64_MIN <= value <= INT64_MAX:
+                raise OverflowError('coordinate out of range')
+        for value in (qx - previous_x, qy - previous_y):
+            value = (value << 1) ^ (value >> 63)
+            while value > 0x7F:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        previous_x, previous_y = qx, qy
+    return bytes(out)
+
+
+def decode_points(data: bytes, scale: int = 10) -> List[List[float]]:
+    """Inverse of encode_points"""
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append((value >> 1) ^ -(value & 1))
+        value = shift = 0
+    points = []
+    x = y = 0
+    for i in range(0, len(values) - 1, 2):
+        x += values[i]
+        y += values[i + 1]
+        points.append([x / scale, y / scale])
+    return points
+
+
+def parse_event(payload: Dict, scale: int = 10, sender: str = 'user') -> Dict:
+    """
+    Validate one client event and return it in stored form; raises ValueError.
+    Chat messages are attributed to ``sender`` ('user' or 'ai'), chosen by
+    the server; a ``sender`` in the payload is ignored.
+
+    Chat:       {"kind": "chat", "text": "..."}
+    Stroke:     {"kind": "whiteboard", "type": "stroke", "tool": "pen" | "eraser",
+                 "width": 2, "color": "#ffffff", "points": [[x, y], ...]}
+    Clear:      {"kind": "whiteboard", "type": "clear"}
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('Each event must be an object')
+    kind = payload.get('kind')
+    if kind == 'chat':
+        text = payload.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError('Chat events need a text')
+        if len(text) > MAX_CHAT_LENGTH:
+            raise ValueError(f'Chat messages are limited to {MAX_CHAT_LENGTH} characters')
+        return {'kind': 'chat', 'type': 'message', 'data': {'text': text, 'sender': sender}}
+
+    if kind == 'whiteboard':
+        event_type = payload.get('type')
+        if event_type == 'clear':
+            return {'kind': 'whiteboard', 'type': 'clear', 'data': {}}
+        if event_type != 'stroke':
+            raise ValueError("Whiteboard events must have type 'stroke' or 'clear'")
+        tool = payload.get('tool', 'pen')
+        if tool not in WHITEBOARD_TOOLS:
+            raise ValueError(f"tool must be one of {', '.join(WHITEBOARD_TOOLS)}")
+        width = payload.get('width', 2)
+        color = payload.get('color', '#ffffff')
+        points = payload.get('points')
+        if not isinstance(width, (int, float)) or not 0 < width <= 100:
+            raise ValueError('width must be a number between 0 and 100')
+        if not isinstance(color, str) or len(color) > 32:
+            raise ValueError('color must be a CSS color string')
+        if not isinstance(points, list) or not 0 < len(points) <= MAX_STROKE_POINTS:
+            raise ValueError(f'Strokes need between 1 and {MAX_STROKE_POINTS} points')
+        try:
+            encoded = encode_points(points, scale)
+        except OverflowError:
+            raise ValueError('points must be finite coordinates within the 64-bit range')
+        except (TypeError, ValueError):
+            raise ValueError('points must be [x, y] number pairs')
+        return {
+            'kind': 'whiteboard',
+            'type': 'stroke',
+            'data': {'tool': tool, 'width': width, 'color': color},
+            'points': encoded
+        }
+
+    raise ValueError("kind must be 'chat' or 'whiteboard'")
+
+
+def compact(state: Dict, events: List[Dict], chat_history: int) -> Dict:
+    """
+    Fold events into a room state: the last ``chat_history`` chat messages
+    and the strokes drawn since the whiteboard was last cleared
+    """
+    chat = list(state.get('chat', []))
+    strokes = list(state.get('strokes', []))
+    for event in events:
+        if event['kind'] == 'chat':
+            chat.append(event)
+        elif event['type'] == 'clear':
+            strokes = []
+        else:
+            strokes.append(event)
+    return {'chat': chat[-chat_history:] if chat_history else [], 'strokes': strokes}
+
+
+def serialize_event(event: Dict, encoding: str = 'absolute', scale: int = 10) -> Dict:
+    """
+    Client form of a stored event; stroke points are absolute [x, y] pairs,
+    or with encoding 'delta' the base64 of their delta encoding
+    """
+    out = {
+        'id': str(event['id']),
+        'kind': event['kind'],
+        'type': event['type'],
+        'userId': event['userId'],
+        'timestamp': datetime.utcfromtimestamp(event['ts']).isoformat(),
+        **event['data']
+    }
+    if event.get('points') is not None:
+        if encoding == 'delta':
+            out['points'] = base64.b64encode(event['points']).decode('ascii')
+        else:
+            out['points'] = decode_points(event['points'], scale)
+    return out
+
+
+class RoomHistory:
+    """
+    Chat and whiteboard history of rooms, for late joiners and reconnects.
+
+    ``append`` assigns ids and puts events in a bounded in-memory buffer,
+    from which a writer thread inserts them into an append-only SQLite
+    table in one transaction per ``batch_size`` events or
+    ``flush_interval`` seconds. If storage falls behind by more than
+    ``buffer_size`` events, the oldest unwritten events are dropped.
+
+    Cursors are the table's ``seq``, which SQLite assigns as rows are
+    inserted. Writers take turns, so seqs follow the order events were
+    committed in, whichever worker wrote them: a cursor never passes an
+    event that is committed later. Event ids, assigned on append, are
+    only in the order each worker received events, since workers write
+    theirs up to ``flush_interval`` late. Events are therefore served
+    once written, not from the memory of the worker that received them.
+
+    Every ``snapshot_every`` written events, the writer compacts a room
+    into a stored snapshot: recent chat plus the strokes since the last
+    clear. Readers without a cursor get that snapshot and the events
+    after it. Readers with a cursor get only newer events, unless there
+    are more than ``max_delta`` of them.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS room_events (
+        seq INTEGER PRIMARY KEY,
+        id INTEGER NOT NULL,
+        room_name TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        type TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        ts REAL NOT NULL,
+        data TEXT NOT NULL,
+        points BLOB
+    );
+    CREATE INDEX IF NOT EXISTS room_events_room ON room_events (room_name, seq);
+    CREATE TABLE IF NOT EXISTS room_snapshots (
+        room_name TEXT PRIMARY KEY,
+        cursor INTEGER NOT NULL,
+        state TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 0.5,
+                 buffer_size: int = 50000, snapshot_every: int = 500,
+                 chat_history: int = 200, max_delta: int = 1000, scale: int = 10):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.snapshot_every = snapshot_every
+        self.chat_history = chat_history
+        self.max_delta = max_delta
+        self.scale = scale
+        self.dropped = 0
+
+        self._ids = EventIds()
+        self._local = threading.local()
+        self._pending = deque()
+        self._since_snapshot = {}  # room name -> events written since its snapshot
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        conn = self._connect()
+        self._migrate(conn)
+        conn.executescript(self.SCHEMA)
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        # Tables from before seq was added used event ids as cursors
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(room_events)')]
+        if not columns or 'seq' in columns:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have migrated while this one waited for the lock
+            if 'seq' in [row[1] for row in conn.execute('PRAGMA table_info(room_events)')]:
+                conn.execute('COMMIT')
+                return
+            logger.info('Adding write sequence to room history')
+            conn.execute('ALTER TABLE room_events RENAME TO room_events_old')
+            conn.execute('DROP INDEX IF EXISTS room_events_room')
+            # executescript would commit the transaction, so one statement at a time
+            for statement in filter(str.strip, self.SCHEMA.split(';')):
+                conn.execute(statement)
+            conn.execute(
+                'INSERT INTO room_events (id, room_name, kind, type, user_id, ts, data, points) '
+                'SELECT id, room_name, kind, type, user_id, ts, data, points FROM room_events_old ORDER BY id'
+            )
+            conn.execute('DROP TABLE room_events_old')
+            conn.execute(
+                'UPDATE room_snapshots SET cursor = '
+                '(SELECT seq FROM room_events WHERE room_events.id = room_snapshots.cursor LIMIT 1)'
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='room-history-writer', daemon=True)
+                self._thread.start()
+
+    def append(self, room_name: str, user_id: str, events: List[Dict]) -> List[Dict]:
+        """
+        Record parsed events (see parse_event) from one user; returns them
+        with ids. They can be read once the writer has stored them.
+        """
+        now = time.time()
+        with self._lock:
+            stored = []
+            for event in events:
+                event = dict(event, id=self._ids.next(), room=room_name, userId=user_id, ts=now)
+                stored.append(event)
+                self._pending.append(event)
+            overflow = len(self._pending) - self.buffer_size
+            for _ in range(max(0, overflow)):
+                self._pending.popleft()
+                self.dropped += 1
+            if overflow > 0:
+                logger.warning(f"Room history buffer full, dropped {overflow} unwritten events")
+
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return stored
+
+    def flush(self) -> int:
+        """Write every buffered event now; returns the number written"""
+        written = 0
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    break
+                conn = self._connect()
+                conn.execute('BEGIN')
+                try:
+                    conn.executemany(
+                        'INSERT INTO room_events (id, room_name, kind, type, user_id, ts, data, points) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        [
+                            (e['id'], e['room'], e['kind'], e['type'], e['userId'], e['ts'],
+                             json.dumps(e['data']), e.get('points'))
+                            for e in batch
+                        ]
+                    )
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    raise
+                written += len(batch)
+                for event in batch:
+                    self._since_snapshot[event['room']] = self._since_snapshot.get(event['room'], 0) + 1
+
+            for room_name in [room for room, count in self._since_snapshot.items() if count >= self.snapshot_every]:
+                self._refresh_snapshot(room_name)
+                self._since_snapshot.pop(room_name, None)
+        return written
+
+    def read(self, room_name: str, after: Optional[int] = None) -> Dict:
+        """
+        Events after ``after``, or the room's snapshot and the events after it.
+        Returns {'events', 'cursor'} plus 'snapshot' ({'chat', 'strokes',
+        'cursor'}) when a snapshot is sent.
+        """
+        conn = self._connect()
+        # A cursor past the last seq was not issued by this table (e.g. an
+        # event id from before seqs existed), so it gets the snapshot
+        if after is not None and after <= (conn.execute('SELECT max(seq) FROM room_events').fetchone()[0] or 0):
+            rows = self._rows_after(room_name, after, self.max_delta + 1)
+            if len(rows) <= self.max_delta:
+                return {'events': [self._from_row(row) for row in rows], 'cursor': rows[-1][0] if rows else after}
+
+        cursor, state = self._load_snapshot(room_name)
+        rows = self._rows_after(room_name, cursor)
+        return {
+            'snapshot': dict(state, cursor=cursor),
+            'events': [self._from_row(row) for row in rows],
+            'cursor': rows[-1][0] if rows else cursor
+        }
+
+    def _rows_after(self, room_name: str, after: int, limit: Optional[int] = None) -> List[Tuple]:
+        return self._connect().execute(
+            'SELECT seq, id, kind, type, user_id, ts, data, points FROM room_events '
+            'WHERE room_name = ? AND seq > ? ORDER BY seq LIMIT ?',
+            (room_name, after, -1 if limit is None else limit)
+        ).fetchall()
+
+    def _from_row(self, row: Tuple) -> Dict:
+        return {
+            'id': row[1], 'kind': row[2], 'type': row[3], 'userId': row[4], 'ts': row[5],
+            'data': json.loads(row[6]), 'points': row[7]
+        }
+
+    def _load_snapshot(self, room_name: str) -> Tuple[int, Dict]:
+        row = self._connect().execute(
+            'SELECT cursor, state FROM room_snapshots WHERE room_name = ?', (room_name,)
+        ).fetchone()
+        if row is None:
+            return 0, {'chat': [], 'strokes': []}
+        state = json.loads(row[1])
+        for stroke in state['strokes']:
+            stroke['points'] = base64.b64decode(stroke['points'])
+        return row[0], state
+
+    def _refresh_snapshot(self, room_name: str):
+        cursor, state = self._load_snapshot(room_name)
+        rows = self._rows_after(room_name, cursor)
+        if not rows:
+            return
+        state = compact(state, [self._from_row(row) for row in rows], self.chat_history)
+        stored = {
+            'chat': state['chat'],
+            'strokes': [dict(s, points=base64.b64encode(s['points']).decode('ascii')) for s in state['strokes']]
+        }
+        self._connect().execute(
+            'INSERT OR REPLACE INTO room_snapshots (room_name, cursor, state) VALUES (?, ?, ?)',
+            (room_name, rows[-1][0], json.dumps(stored))
+        )
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Room history write failed: {str(e)}")
+
+
+def get_room_history(app=None) -> RoomHistory:
+    """Return the app's room history store, starting its writer on first use"""
+    app = app or current_app._get_current_object()
+    history = app.extensions.get('room_history')
+    if history is None:
+        with _history_lock:
+            history = app.extensions.get('room_history')
+            if history is None:
+                history = RoomHistory(
+                    app.config['ROOM_HISTORY_PATH'],
+                    batch_size=app.config['ROOM_HISTORY_BATCH_SIZE'],
+                    flush_interval=app.config['ROOM_HISTORY_FLUSH_INTERVAL'],
+                    buffer_size=app.config['ROOM_HISTORY_BUFFER_SIZE'],
+                    snapshot_every=app.config['ROOM_HISTORY_SNAPSHOT_EVERY'],
+                    chat_history=app.config['ROOM_HISTORY_CHAT_MESSAGES'],
+                    max_delta=app.config['ROOM_HISTORY_MAX_DELTA']
+                )
+                app.extensions['room_history'] = history
+                history.start()
+                # Buffered events are written before the worker exits
+                atexit.register(history.flush)
+    return history
@@ -0,0 +1,122 @@
+import time
+import base64
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.room_metadata import FILTER_FIELDS, POOLED_SESSION_TYPE, RoomMetadataCache
+
+
+def encode_cursor(room_name: str) -> str:
+    """
+    Encode the last room name of a page as an opaque cursor
+    """
+    return base64.urlsafe_b64encode(room_name.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Decode a cursor produced by encode_cursor, raising ValueError if malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return base64.b64decode(padded.encode('ascii'), altchars=b'-_', validate=True).decode('utf-8')
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class RoomIndex:
+    """
+    Name-ordered index over the active room list with per-field posting lists.
+
+    ``update`` takes a raw ListRooms result and reads filter values through the
+    shared RoomMetadataCache, so a room's metadata is decoded only the first
+    time its (sid, metadata) pair is seen. Queries bisect into sorted posting lists, so a page costs
+    O(log n + limit) regardless of how many rooms exist.
+    """
+
+    def __init__(self, metadata_cache: RoomMetadataCache, ttl: float = 2.0):
+        self.metadata_cache = metadata_cache
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._rooms = {}  # room name -> raw room dict
+        self._order = []  # all room names, sorted
+        self._postings = {field: {} for field in FILTER_FIELDS}  # field -> value -> (sorted names, name set)
+
+    def is_stale(self) -> bool:
+        refreshed_at = self._refreshed_at
+        return refreshed_at is None or time.monotonic() - refreshed_at > self.ttl
+
+    def invalidate(self):
+        self._refreshed_at = None
+
+    def update(self, rooms: List[Dict]):
+        """
+        Rebuild the index from a full ListRooms result
+        """
+        by_name = {}
+        records = {}
+        for room in rooms:
+            name = room.get('name')
+            if not name:
+                continue
+            record = self.metadata_cache.get(room.get('sid'), room.get('metadata'))
+            if record.session_type == POOLED_SESSION_TYPE:
+                continue
+            by_name[name] = room
+            records[name] = record
+        order = sorted(by_name)
+
+        postings = {field: {} for field in FILTER_FIELDS}
+        attributes = list(FILTER_FIELDS.items())
+        for name in order:
+            record = records[name]
+            for field, attribute in attributes:
+                postings[field].setdefault(getattr(record, attribute), []).append(name)
+
+        for field in postings:
+            postings[field] = {value: (names, set(names)) for value, names in postings[field].items()}
+
+        with self._lock:
+            self._rooms = by_name
+            self._order = order
+            self._postings = postings
+            self._refreshed_at = time.monotonic()
+
+    def query(self, filters: Optional[Dict] = None, limit: Optional[int] = 100,
+              after: Optional[str] = None) -> Tuple[List[Dict], Optional[str], int]:
+        """
+        Return (raw rooms on this page, name of the last room if more follow,
+        total number of matching rooms); a ``limit`` of None returns them all
+        """
+        with self._lock:
+            rooms, order, postings = self._rooms, self._order, self._postings
+
+        candidates = []
+        for field, value in (filters or {}).items():
+            candidates.append(postings[field].get(value, ([], set())))
+
+        if not candidates:
+            names, members, total = order, None, len(order)
+        else:
+            candidates.sort(key=lambda posting: len(posting[0]))
+            names = candidates[0][0]
+            members = [posting[1] for posting in candidates[1:]]
+            if members:
+                total = len(candidates[0][1].intersection(*members))
+            else:
+                total = len(names)
+
+        start = bisect.bisect_right(names, after) if after is not None else 0
+        page = []
+        last = None
+        for i in range(start, len(names)):
+            name = names[i]
+            if members and not all(name in member for member in members):
+                continue
+            if len(page) == limit:
+                return page, last, total
+            page.append(rooms[name])
+            last = name
+        return page, None, total
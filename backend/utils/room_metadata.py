@@ -0,0 +1,115 @@
+import json
+import threading
+from typing import Dict, Optional
+
+# Filterable API field -> RoomMetadata attribute
+FILTER_FIELDS = {
+    'subject': 'subject',
+    'tutorType': 'tutor_type',
+    'createdBy': 'created_by',
+    'sessionType': 'session_type'
+}
+
+# sessionType of idle rooms held by the room pool, hidden from listings
+POOLED_SESSION_TYPE = 'pooled'
+
+
+class RoomMetadata:
+    """
+    Parsed room metadata with the route defaults already applied
+    """
+
+    __slots__ = ('subject', 'tutor_type', 'session_type', 'created_by', 'data')
+
+    def __init__(self, subject: str, tutor_type: str, session_type: str,
+                 created_by: Optional[str], data: Dict):
+        self.subject = subject
+        self.tutor_type = tutor_type
+        self.session_type = session_type
+        self.created_by = created_by
+        self.data = data
+
+    @classmethod
+    def from_json(cls, metadata: Optional[str]) -> 'RoomMetadata':
+        try:
+            data = json.loads(metadata or '{}')
+        except (TypeError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        created_by = data.get('createdBy')
+        # Attributes are index keys, so they must be hashable whatever the
+        # room's creator put in the JSON
+        return cls(
+            subject=str(data.get('subject', 'Unknown')),
+            tutor_type=str(data.get('tutorType', 'AI Tutor')),
+            session_type=str(data.get('sessionType', 'tutoring')),
+            created_by=str(created_by) if created_by is not None else None,
+            data=data
+        )
+
+    def format_room(self, room: Dict) -> Dict:
+        """
+        Build the API representation of a raw LiveKit room
+        """
+        return {
+            'roomName': room.get('name'),
+            'roomId': room.get('sid'),
+            'numParticipants': room.get('numParticipants', 0),
+            'maxParticipants': room.get('maxParticipants', 2),
+            'creationTime': room.get('creationTime'),
+            'subject': self.subject,
+            'tutorType': self.tutor_type,
+            'sessionType': self.session_type,
+            'createdBy': self.created_by,
+            'metadata': self.data
+        }
+
+
+class RoomMetadataCache:
+    """
+    Decode-once cache of room metadata keyed by (room sid, hash of the metadata string).
+
+    LiveKit never changes a room's metadata after creation, so each room is
+    parsed once per process instead of once per request. The cache is bounded
+    and evicts the oldest entries first.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sid: Optional[str], metadata: Optional[str]) -> RoomMetadata:
+        key = (sid, hash(metadata))
+        record = self._entries.get(key)
+        if record is not None:
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        record = RoomMetadata.from_json(metadata)
+        if sid is None:
+            # Rooms without a sid cannot be keyed reliably
+            return record
+
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = record
+        return record
+
+    def format_room(self, room: Dict) -> Dict:
+        """
+        Format a raw LiveKit room using its cached metadata
+        """
+        return self.get(room.get('sid'), room.get('metadata')).format_room(room)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,152 @@
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+from utils.livekit_service import get_livekit_service
+from utils.room_metadata import POOLED_SESSION_TYPE
+
+logger = logging.getLogger(__name__)
+
+_pool_lock = threading.Lock()
+
+
+class RoomPool:
+    """
+    Pre-created empty LiveKit rooms handed out without a CreateRoom round trip.
+
+    A background thread keeps ``size`` rooms ready. Pooled rooms are created
+    with ``sessionType: pooled`` metadata so listings skip them, and with a
+    long ``empty_timeout`` so LiveKit does not close them while they wait;
+    rooms older than ``max_age`` are deleted and replaced before that
+    happens. ``take`` pops a ready room and applies the caller's metadata
+    before handing it out, so the room is never listed as pooled once its
+    name has been returned; that one UpdateRoomMetadata call replaces the
+    CreateRoom round trip.
+    """
+
+    def __init__(self, get_service: Callable, size: int = 5, max_participants: int = 2,
+                 empty_timeout: int = 3600, max_age: float = 3000.0, refill_interval: float = 5.0):
+        self.get_service = get_service
+        self.size = size
+        self.max_participants = max_participants
+        self.empty_timeout = empty_timeout
+        self.max_age = max_age
+        self.refill_interval = refill_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._ready = deque()  # (created_at, room dict), oldest first
+        self._retired = deque()  # names of rooms to delete
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._ready)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='room-pool', daemon=True)
+                self._thread.start()
+
+    def take(self, metadata: Dict) -> Optional[Dict]:
+        """
+        Hand out a ready room with ``metadata`` applied, or None when the
+        pool is empty or the update failed
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._ready:
+                created_at, room = self._ready.popleft()
+                if now - created_at < self.max_age:
+                    break
+                # Too close to LiveKit's empty timeout to hand out
+                self._retired.append(room['name'])
+            else:
+                room = None
+                self.misses += 1
+        self._wake.set()
+        if room is None:
+            return None
+
+        result = self.get_service().update_room_metadata(room['name'], metadata)
+        if not result['success']:
+            logger.warning(f"Room pool update of {room['name']} failed: {result['error']}")
+            with self._lock:
+                self._retired.append(room['name'])
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return room
+
+    def refill_once(self):
+        """
+        Delete retired rooms and top the pool up
+        """
+        service = self.get_service()
+
+        with self._lock:
+            retired = list(self._retired)
+            self._retired.clear()
+        for room_name in retired:
+            result = service.delete_room(room_name)
+            if not result['success']:
+                logger.warning(f"Room pool delete of {room_name} failed: {result['error']}")
+
+        now = time.monotonic()
+        with self._lock:
+            while self._ready and now - self._ready[0][0] >= self.max_age:
+                _, room = self._ready.popleft()
+                self._retired.append(room['name'])
+            missing = self.size - len(self._ready)
+
+        for _ in range(missing):
+            result = service.create_room(
+                room_name=f"room-{uuid.uuid4().hex[:8]}",
+                max_participants=self.max_participants,
+                metadata={'sessionType': POOLED_SESSION_TYPE},
+                empty_timeout=self.empty_timeout
+            )
+            if not result['success']:
+                logger.warning(f"Room pool refill failed: {result['error']}")
+                break
+            with self._lock:
+                self._ready.append((time.monotonic(), result['room']))
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                self.refill_once()
+            except Exception as e:
+                logger.error(f"Room pool error: {str(e)}")
+            self._wake.wait(self.refill_interval)
+
+
+def get_room_pool(app=None) -> Optional[RoomPool]:
+    """Return the app's room pool, starting it on first use; None when ROOM_POOL_SIZE is 0"""
+    app = app or current_app._get_current_object()
+    if app.config['ROOM_POOL_SIZE'] <= 0:
+        return None
+    pool = app.extensions.get('room_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('room_pool')
+            if pool is None:
+                pool = RoomPool(
+                    lambda: get_livekit_service(app),
+                    size=app.config['ROOM_POOL_SIZE'],
+                    max_participants=app.config['ROOM_POOL_MAX_PARTICIPANTS'],
+                    empty_timeout=app.config['ROOM_POOL_EMPTY_TIMEOUT'],
+                    max_age=app.config['ROOM_POOL_MAX_AGE']
+                )
+                app.extensions['room_pool'] = pool
+                pool.start()
+    return pool
@@ -0,0 +1,248 @@
+import json
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from utils.room_metadata import POOLED_SESSION_TYPE, RoomMetadata
+
+logger = logging.getLogger(__name__)
+
+
+class WatcherFullError(Exception):
+    """Raised when a worker already streams to its maximum number of subscribers"""
+
+
+def format_sse(data: Dict, event: Optional[str] = None, event_id: Optional[int] = None) -> bytes:
+    """
+    Encode a single Server-Sent Events message
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class RoomWatcher:
+    """
+    Single shared poller that turns LiveKit ListRooms snapshots into room deltas.
+
+    One background thread calls ``list_active_rooms`` on the service returned
+    by ``get_service`` every ``interval`` seconds while at least one
+    subscriber is connected. Each change is encoded to SSE bytes exactly once
+    and appended to a bounded event log; subscribers block
+    on a condition variable and read new entries by sequence number, so the
+    work per poll is proportional to the number of changes, not clients.
+    Pre-created pool rooms are left out until they are handed to a session,
+    when they appear as ``room_added``; pass the app's ``metadata_cache`` so
+    their metadata is not parsed on every poll.
+
+    Each subscriber holds a request thread (or greenlet, under gevent) for
+    as long as it is connected, so at most ``max_subscribers`` are admitted
+    (None for no limit).
+    """
+
+    def __init__(self, get_service, interval: float = 2.0, history: int = 1000,
+                 max_subscribers: Optional[int] = None, metadata_cache=None):
+        self.get_service = get_service
+        self.metadata_cache = metadata_cache
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.last_error = None
+        self.polls = 0
+
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)  # encoded SSE messages, oldest first
+        self._seq = 0  # sequence number of the newest event
+        self._rooms = {}  # room name -> compact state dict
+        self._ready = False
+        self._snapshot = None  # (seq, encoded snapshot) cache
+        self._subscribers = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._subscribers
+
+    def stream(self, last_event_id: Optional[str] = None, heartbeat: float = 15.0) -> Iterator[bytes]:
+        """
+        Subscribe one client and return an iterator of its SSE messages,
+        which runs until the client disconnects. The slot is taken now, so a
+        full watcher raises WatcherFullError before any response is sent,
+        and released when the iterator is closed.
+
+        Clients that reconnect with a Last-Event-ID still in the event log only
+        receive what they missed; everyone else starts from a full snapshot.
+        """
+        self._subscribe()
+        return _Subscription(self, self._messages(last_event_id, heartbeat))
+
+    def _messages(self, last_event_id: Optional[str], heartbeat: float) -> Iterator[bytes]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready, timeout=max(self.interval * 2, 5.0))
+            cursor = self._resume_cursor(last_event_id)
+            first = self._snapshot_message() if cursor is None else None
+            if cursor is None:
+                cursor = self._seq
+        if first:
+            yield first
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > cursor, timeout=heartbeat)
+                pending, cursor = self._events_after(cursor)
+            if pending:
+                yield b''.join(pending)
+            else:
+                # Comment line keeps proxies from timing out idle streams
+                yield b': keepalive\n\n'
+
+    def poll_once(self) -> List[Dict]:
+        """
+        Fetch the current room list, publish deltas and return them
+        """
+        self.polls += 1
+        result = self.get_service().list_active_rooms()
+        if not result['success']:
+            self.last_error = result['error']
+            logger.warning(f"Room watcher poll failed: {result['error']}")
+            return []
+        self.last_error = None
+
+        current = {}
+        for room in result['rooms']:
+            if self.metadata_cache is not None:
+                record = self.metadata_cache.get(room.get('sid'), room.get('metadata'))
+            else:
+                record = RoomMetadata.from_json(room.get('metadata'))
+            if record.session_type == POOLED_SESSION_TYPE:
+                continue
+            current[room.get('name')] = {
+                'roomName': room.get('name'),
+                'roomId': room.get('sid'),
+                'numParticipants': room.get('numParticipants', 0),
+                'maxParticipants': room.get('maxParticipants', 2)
+            }
+
+        changes = []
+        with self._cond:
+            previous = self._rooms
+            for name, state in current.items():
+                old = previous.get(name)
+                if old is None or old['roomId'] != state['roomId']:
+                    changes.append(('room_added', state))
+                elif old['numParticipants'] != state['numParticipants']:
+                    changes.append(('participants_changed', {
+                        'roomName': name,
+                        'roomId': state['roomId'],
+                        'numParticipants': state['numParticipants'],
+                        'delta': state['numParticipants'] - old['numParticipants']
+                    }))
+            for name, old in previous.items():
+                new = current.get(name)
+                if new is None or new['roomId'] != old['roomId']:
+                    changes.append(('room_removed', {'roomName': name, 'roomId': old['roomId']}))
+
+            self._rooms = current
+            for event, data in changes:
+                self._seq += 1
+                self._events.append(format_sse(data, event=event, event_id=self._seq))
+            if changes or not self._ready:
+                self._snapshot = None
+                self._ready = True
+                self._cond.notify_all()
+
+        return [{'event': event, 'data': data} for event, data in changes]
+
+    def _resume_cursor(self, last_event_id: Optional[str]) -> Optional[int]:
+        if not last_event_id:
+            return None
+        try:
+            cursor = int(last_event_id)
+        except ValueError:
+            return None
+        oldest = self._seq - len(self._events)
+        if oldest <= cursor <= self._seq:
+            return cursor
+        return None
+
+    def _events_after(self, cursor: int):
+        missed = self._seq - cursor
+        if missed <= 0:
+            return [], cursor
+        if missed > len(self._events):
+            # Subscriber fell behind the event log: resynchronise with a snapshot
+            return [self._snapshot_message()], self._seq
+        size = len(self._events)
+        return list(islice(self._events, size - missed, size)), self._seq
+
+    def _snapshot_message(self) -> bytes:
+        if self._snapshot is None or self._snapshot[0] != self._seq:
+            data = {'rooms': list(self._rooms.values()), 'totalRooms': len(self._rooms)}
+            self._snapshot = (self._seq, format_sse(data, event='snapshot', event_id=self._seq))
+        return self._snapshot[1]
+
+    def _subscribe(self):
+        with self._cond:
+            if self.max_subscribers is not None and self._subscribers >= self.max_subscribers:
+                raise WatcherFullError(f"Room event streams are full ({self.max_subscribers} per worker)")
+            self._subscribers += 1
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='room-watcher', daemon=True)
+                self._thread.start()
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+            if self._subscribers == 0:
+                self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Room watcher error: {str(e)}")
+            self._stop.wait(self.interval)
+            with self._cond:
+                if self._subscribers == 0:
+                    # Idle: stop polling until the next client subscribes
+                    self._thread = None
+                    self._ready = False
+                    return
+                self._stop.clear()
+
+
+class _Subscription:
+    """
+    A subscriber's message iterator. Closing it releases the subscriber
+    slot, even if the WSGI server closes it before the first message
+    (closing a generator that never started skips its finally block).
+    """
+
+    def __init__(self, watcher: RoomWatcher, messages: Iterator[bytes]):
+        self._watcher = watcher
+        self._messages = messages
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._messages)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._messages.close()
+        self._watcher._unsubscribe()
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import jwt
+from flask import current_app
+
+from utils.single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+_registry_lock = threading.Lock()
+
+
+def token_key(refresh_token: str) -> str:
+    """Refresh tokens are only ever stored as their SHA-256 digest"""
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+
+def token_session(access_token: str) -> Tuple[Optional[int], Optional[str]]:
+    """
+    ``iat`` and Supabase ``session_id`` claims of an access token that has
+    already been verified
+    """
+    try:
+        claims = jwt.decode(access_token, options={'verify_signature': False})
+    except jwt.PyJWTError:
+        return None, None
+    return claims.get('iat'), claims.get('session_id')
+
+
+def _prune(entries: Dict, now: float):
+    """
+    Drop expired entries from the front of a dict of (expires_at, value)
+    kept in expiry order, stopping at the first live one
+    """
+    while entries:
+        key, (expires_at, _) = next(iter(entries.items()))
+        if expires_at >= now:
+            return
+        del entries[key]
+
+
+class MemorySessionBackend:
+    """
+    Per-process session store: recently refreshed pairs keyed by token hash,
+    and per-user revocation times, both expiring on their own TTL. Only for
+    a single worker process, since a revocation is not seen by the others.
+
+    Each registry uses one TTL per kind of entry, so re-inserting an entry
+    at the end of its dict keeps the dict in expiry order, and expired
+    entries are pruned from the front.
+    """
+
+    def __init__(self):
+        self._refreshed = {}  # key -> (expires_at, session)
+        self._revoked = {}  # user id -> (expires_at, (revoked_at, session id))
+        self._lock = threading.Lock()
+
+    def get_refreshed(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._refreshed.get(key)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1]
+
+    def set_refreshed(self, key: str, session: Dict, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._refreshed.pop(key, None)
+            self._refreshed[key] = (now + ttl, session)
+            _prune(self._refreshed, now)
+
+    def revoke(self, user_id: str, revoked_at: float, session_id: Optional[str], ttl: float):
+        now = time.time()
+        with self._lock:
+            self._revoked.pop(user_id, None)
+            self._revoked[user_id] = (now + ttl, (revoked_at, session_id))
+            _prune(self._revoked, now)
+
+    def revocation(self, user_id: str) -> Optional[Tuple[float, Optional[str]]]:
+        with self._lock:
+            entry = self._revoked.get(user_id)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1]
+
+
+class SQLiteSessionBackend:
+    """
+    Session store in a local SQLite file, shared by every worker process on
+    the host, so a revocation or a refresh seen by one worker is seen by all.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS refreshed_sessions (
+        key TEXT PRIMARY KEY, session TEXT NOT NULL, expires_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS revoked_users (
+        user_id TEXT PRIMARY KEY, revoked_at REAL NOT NULL, expires_at REAL NOT NULL, session_id TEXT
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(revoked_users)')}
+            if 'session_id' not in columns:
+                # Files written before revocations recorded the session
+                conn.execute('ALTER TABLE revoked_users ADD COLUMN session_id TEXT')
+        # The file holds live access and refresh tokens
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_refreshed(self, key: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            'SELECT session FROM refreshed_sessions WHERE key = ? AND expires_at >= ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_refreshed(self, key: str, session: Dict, ttl: float):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO refreshed_sessions (key, session, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(session), now + ttl)
+        )
+        conn.execute('DELETE FROM refreshed_sessions WHERE expires_at < ?', (now,))
+
+    def revoke(self, user_id: str, revoked_at: float, session_id: Optional[str], ttl: float):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO revoked_users (user_id, revoked_at, expires_at, session_id) VALUES (?, ?, ?, ?)',
+            (user_id, revoked_at, now + ttl, session_id)
+        )
+        conn.execute('DELETE FROM revoked_users WHERE expires_at < ?', (now,))
+
+    def revocation(self, user_id: str) -> Optional[Tuple[float, Optional[str]]]:
+        row = self._connect().execute(
+            'SELECT revoked_at, session_id FROM revoked_users WHERE user_id = ? AND expires_at >= ?',
+            (user_id, time.time())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+
+class SessionRegistry:
+    """
+    Server-side view of auth sessions.
+
+    Refreshes of the same refresh token are coalesced: concurrent requests
+    share one upstream call, and requests arriving within ``refresh_ttl``
+    seconds receive the pair it issued. Revoking a user rejects every access
+    token, and every cached refresh result, issued up to that moment; the
+    record is kept for ``revocation_ttl`` seconds, the access token lifetime.
+    """
+
+    def __init__(self, backend, refresh_ttl: float = 10.0, revocation_ttl: float = 3600.0):
+        self.backend = backend
+        self.refresh_ttl = refresh_ttl
+        self.revocation_ttl = revocation_ttl
+
+    def refresh(self, refresh_token: str, do_refresh: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        """
+        Return a fresh session for ``refresh_token``, calling
+        ``do_refresh(refresh_token)`` only when no recent result can be reused.
+        ``do_refresh`` returns a session dict with 'user', 'issued_at' and
+        'session_id', or None.
+        """
+        key = token_key(refresh_token)
+        session = self._reusable(key)
+        if session is not None:
+            return session
+        return get_single_flight().do(('refresh', key), self._refresh, key, refresh_token, do_refresh)
+
+    def revoke_user(self, user_id: str, session_id: Optional[str] = None):
+        """
+        Revoke every session of ``user_id`` issued up to now; ``session_id``
+        is the session signing out, if known
+        """
+        self.backend.revoke(user_id, time.time(), session_id, self.revocation_ttl)
+
+    def is_revoked(self, user_id: str, issued_at: Optional[int], session_id: Optional[str] = None) -> bool:
+        """
+        Whether a token of ``user_id`` with these ``iat`` and ``session_id``
+        claims was revoked. ``iat`` has whole-second precision, so tokens
+        from earlier seconds than the revocation are revoked, and a token
+        from the same second only if it belongs to the session that signed
+        out (or carries no session id); a sign-in right after a sign-out is
+        not rejected for the whole revocation TTL.
+        """
+        revocation = self.backend.revocation(user_id)
+        if revocation is None:
+            return False
+        if issued_at is None:
+            return True
+        revoked_at, revoked_session = revocation
+        revoked_second = int(revoked_at)
+        if issued_at != revoked_second:
+            return issued_at < revoked_second
+        return session_id is None or revoked_session is None or session_id == revoked_session
+
+    def _reusable(self, key: str) -> Optional[Dict]:
+        session = self.backend.get_refreshed(key)
+        if session is None:
+            return None
+        user_id = (session.get('user') or {}).get('id')
+        if user_id and self.is_revoked(user_id, session.get('issued_at'), session.get('session_id')):
+            return None
+        return session
+
+    def _refresh(self, key: str, refresh_token: str, do_refresh: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        # Another worker may have finished the same refresh meanwhile
+        session = self._reusable(key)
+        if session is not None:
+            return session
+        session = do_refresh(refresh_token)
+        if session is not None:
+            self.backend.set_refreshed(key, session, self.refresh_ttl)
+        return session
+
+
+def get_session_registry(app=None) -> SessionRegistry:
+    """Return the app's session registry, creating its backend from config on first use"""
+    app = app or current_app._get_current_object()
+    registry = app.extensions.get('session_registry')
+    if registry is None:
+        with _registry_lock:
+            registry = app.extensions.get('session_registry')
+            if registry is None:
+                if app.config['SESSION_STORE_BACKEND'] == 'sqlite':
+                    backend = SQLiteSessionBackend(app.config['SESSION_STORE_PATH'])
+                else:
+                    backend = MemorySessionBackend()
+                registry = SessionRegistry(
+                    backend,
+                    refresh_ttl=app.config['SESSION_REFRESH_TTL'],
+                    revocation_ttl=app.config['SESSION_REVOCATION_TTL']
+                )
+                app.extensions['session_registry'] = registry
+    return registry
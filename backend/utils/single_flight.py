@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from flask import current_app
+
+_group_lock = threading.Lock()
+
+
+class _Call:
+    """One in-flight call and the outcome its waiters share"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls.
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it is in flight wait and receive the same result (or the
+    same exception). Nothing is cached: once the call finishes, the next
+    caller starts a fresh one. Results are shared objects, so callers must
+    not mutate them.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` unless a call for ``key`` is already in
+        flight on another thread, in which case wait for its outcome
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Async variant of ``do``: concurrent coroutines on the same event loop
+        with the same key await one task running ``fn(*args, **kwargs)``
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is not None:
+                self.shared += 1
+            else:
+                task = loop.create_task(fn(*args, **kwargs))
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda _: self._forget_task(task_key, task))
+                self.calls += 1
+        # Shielded so one cancelled waiter does not cancel the others' call
+        return await asyncio.shield(task)
+
+    def _forget_task(self, task_key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+
+
+def get_single_flight(app=None) -> SingleFlight:
+    """Return the app's shared SingleFlight group, creating it on first use"""
+    app = app or current_app._get_current_object()
+    group = app.extensions.get('single_flight')
+    if group is None:
+        with _group_lock:
+            group = app.extensions.get('single_flight')
+            if group is None:
+                group = SingleFlight()
+                app.extensions['single_flight'] = group
+    return group
@@ -0,0 +1,278 @@
+import os
+import re
+import time
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_store_lock = threading.Lock()
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_key(prefix: str, value: str) -> str:
+    """
+    Single index token standing for a user id or room name, so owner and
+    room filters are resolved by the full-text index itself
+    """
+    return prefix + hashlib.sha256(value.encode('utf-8')).hexdigest()[:20]
+
+
+def match_expression(query: str, user_id: str, room_name: Optional[str] = None) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a free-text query: every word must appear,
+    the last one as a prefix. Words are quoted, so user input is never
+    parsed as FTS5 syntax. None when the query has no words.
+    """
+    words = _WORD.findall(query.lower())[:16]
+    if not words:
+        return None
+    terms = ' '.join(f'"{word}"' for word in words) + '*'
+    expression = f'user_key : "{search_key("u", user_id)}" AND text : ({terms})'
+    if room_name:
+        expression += f' AND room_key : "{search_key("r", room_name)}"'
+    return expression
+
+
+class TranscriptStore:
+    """
+    Append-only transcript store in a local SQLite file with an FTS5 index.
+
+    ``append`` only queues utterances; a writer thread inserts them in one
+    transaction per batch, of up to ``batch_size`` rows or whatever arrived
+    within ``flush_interval`` seconds. The index is an external-content FTS5
+    table kept in step by an insert trigger, and ranks matches with BM25
+    over the text column.
+
+    While the file cannot be written (locked, disk full), the writer retries
+    with exponential backoff up to ``MAX_RETRY_DELAY`` seconds, and at most
+    ``buffer_size`` utterances are kept queued: beyond that the oldest are
+    dropped.
+    """
+
+    MAX_RETRY_DELAY = 30.0  # seconds between attempts while writes keep failing
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS utterances (
+        id INTEGER PRIMARY KEY,
+        room_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        start REAL,
+        end REAL,
+        text TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        user_key TEXT NOT NULL,
+        room_key TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS utterances_room ON utterances (room_name, created_at);
+    CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+        text, user_key, room_key,
+        content='utterances', content_rowid='id', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS utterances_index AFTER INSERT ON utterances BEGIN
+        INSERT INTO utterances_fts (rowid, text, user_key, room_key)
+        VALUES (new.id, new.text, new.user_key, new.room_key);
+    END;
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 buffer_size: int = 50000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.dropped = 0
+        self._local = threading.local()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        # Only the text column contributes to the score
+        conn.execute("INSERT INTO utterances_fts (utterances_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0, 0.0)')")
+        # The file holds what students and tutors said
+        os.chmod(path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        with self._pending_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+                self._thread.start()
+
+    def append(self, room_name: str, user_id: str, segments: List[Dict]):
+        """
+        Queue the segments (dicts with 'text' and optional 'start'/'end'
+        seconds) of one transcription for insertion
+        """
+        now = time.time()
+        user_key = search_key('u', user_id)
+        room_key = search_key('r', room_name)
+        rows = [
+            (room_name, user_id, segment.get('start'), segment.get('end'), str(segment['text']), now, user_key, room_key)
+            for segment in segments
+            if segment.get('text')
+        ]
+        with self._pending_lock:
+            self._pending.extend(rows)
+            self._trim()
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def _trim(self):
+        """Drop the oldest queued utterances past ``buffer_size``; call with _pending_lock held"""
+        overflow = len(self._pending) - self.buffer_size
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+            logger.warning(f"Transcript queue full, dropped {overflow} unwritten utterances")
+
+    def flush(self) -> int:
+        """
+        Insert every queued utterance now; returns the number written.
+        A batch that fails because the database is busy or unavailable is
+        requeued (within ``buffer_size``) and the error raised; one that fails for its own rows is
+        written row by row, and the rows that still fail are logged and
+        dropped, so they cannot hold up later transcripts.
+        """
+        written = 0
+        with self._write_lock:
+            while True:
+                with self._pending_lock:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                if not batch:
+                    return written
+                try:
+                    self._insert(batch)
+                except sqlite3.OperationalError:
+                    with self._pending_lock:
+                        self._pending[:0] = batch
+                        self._trim()
+                    raise
+                except sqlite3.Error:
+                    written += self._insert_rows(batch)
+                    continue
+                written += len(batch)
+
+    def _insert(self, rows: List[tuple]):
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(
+                'INSERT INTO utterances (room_name, user_id, start, end, text, created_at, user_key, room_key) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _insert_rows(self, rows: List[tuple]) -> int:
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                self._insert([row])
+            except sqlite3.OperationalError:
+                with self._pending_lock:
+                    self._pending[:0] = rows[i:]
+                    self._trim()
+                raise
+            except sqlite3.Error as e:
+                logger.error(f"Dropped transcript utterance of room {row[0]}: {str(e)}")
+                continue
+            written += 1
+        return written
+
+    def search(self, query: str, user_id: str, room_name: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """
+        Best-ranked utterances of ``user_id`` containing every word of ``query``
+        """
+        expression = match_expression(query, user_id, room_name)
+        if expression is None:
+            return []
+        rows = self._connect().execute(
+            """
+            SELECT u.id, u.room_name, u.start, u.end, u.created_at,
+                   snippet(utterances_fts, 0, '**', '**', '…', 16), utterances_fts.rank
+            FROM utterances_fts JOIN utterances u ON u.id = utterances_fts.rowid
+            WHERE utterances_fts MATCH ?
+            ORDER BY utterances_fts.rank
+            LIMIT ?
+            """,
+            (expression, limit)
+        ).fetchall()
+        return [
+            {
+                'id': row[0],
+                'roomName': row[1],
+                'start': row[2],
+                'end': row[3],
+                'createdAt': datetime.utcfromtimestamp(row[4]).isoformat(),
+                'snippet': row[5],
+                'score': round(-row[6], 4)
+            }
+            for row in rows
+        ]
+
+    def _run(self):
+        failures = 0
+        retry_at = 0.0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if time.monotonic() < retry_at:
+                # Backing off: a full queue must not turn into a retry loop
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                failures += 1
+                delay = min(self.flush_interval * 2 ** failures, self.MAX_RETRY_DELAY)
+                retry_at = time.monotonic() + delay
+                logger.error(f"Transcript store write failed, retrying in {delay:.1f}s: {str(e)}")
+            else:
+                failures = 0
+
+
+def get_transcript_store(app=None) -> Optional[TranscriptStore]:
+    """Return the app's transcript store, starting its writer on first use; None when disabled"""
+    app = app or current_app._get_current_object()
+    if not app.config['TRANSCRIPT_STORE_ENABLED']:
+        return None
+    store = app.extensions.get('transcript_store')
+    if store is None:
+        with _store_lock:
+            store = app.extensions.get('transcript_store')
+            if store is None:
+                store = TranscriptStore(
+                    app.config['TRANSCRIPT_STORE_PATH'],
+                    batch_size=app.config['TRANSCRIPT_BATCH_SIZE'],
+                    flush_interval=app.config['TRANSCRIPT_FLUSH_INTERVAL'],
+                    buffer_size=app.config['TRANSCRIPT_BUFFER_SIZE']
+                )
+                app.extensions['transcript_store'] = store
+                store.start()
+                # Queued utterances are written before the worker exits
+                atexit.register(store.flush)
+    return store
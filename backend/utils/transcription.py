@@ -0,0 +1,91 @@
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+from utils import vad
+
+logger = logging.getLogger(__name__)
+
+_pool_lock = threading.Lock()
+
+
+def get_transcription_pool(app=None) -> ThreadPoolExecutor:
+    """
+    Return the app's segment transcription pool. It is shared by all
+    requests, so STT_SEGMENT_WORKERS bounds the STT calls in flight per worker.
+    """
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('transcription_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('transcription_pool')
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=app.config['STT_SEGMENT_WORKERS'], thread_name_prefix='stt')
+                app.extensions['transcription_pool'] = pool
+    return pool
+
+
+def transcribe_segmented(path: str, transcribe: Callable[[str], str], pool: ThreadPoolExecutor,
+                         min_audio_seconds: float = 60.0, target_seconds: float = 30.0,
+                         max_seconds: float = 60.0, min_silence_ms: int = 300,
+                         margin_db: float = 12.0) -> Optional[Dict]:
+    """
+    Transcribe a WAV file as silence-separated segments in parallel.
+
+    Each segment is written to its own temporary WAV and passed to
+    ``transcribe(path)`` on ``pool``; the texts are joined in audio order.
+    Returns ``{'transcript', 'segments'}`` with per-segment start and end
+    times in seconds, or None when the file should be sent whole: numpy is
+    missing, the file is not a readable PCM WAV, it is shorter than
+    ``min_audio_seconds``, or no speech was found in it. Continuous speech
+    and speech over steady noise can look like no speech to the energy
+    VAD, so that case is left to the STT service too.
+    """
+    if vad.np is None:
+        return None
+    audio = vad.read_wav(path)
+    if audio is None:
+        return None
+    rate = audio['params'].framerate
+    if audio['params'].nframes < min_audio_seconds * rate:
+        return None
+
+    segments = vad.split_on_silence(audio, target_seconds, max_seconds, min_silence_ms, margin_db)
+    if not segments:
+        return None
+    paths = []
+    try:
+        for segment in segments:
+            fd, segment_path = tempfile.mkstemp(suffix='.wav')
+            os.close(fd)
+            paths.append(segment_path)
+            vad.write_segment(audio, segment, segment_path)
+
+        futures = [pool.submit(transcribe, segment_path) for segment_path in paths]
+        try:
+            texts = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    finally:
+        for segment_path in paths:
+            os.remove(segment_path)
+
+    logger.info(f"Transcribed {len(segments)} segments of {audio['params'].nframes / rate:.1f}s audio")
+    return {
+        'transcript': ' '.join(text.strip() for text in texts if text and text.strip()),
+        'segments': [
+            {
+                'start': round(segment['start'] / rate, 3),
+                'end': round(segment['end'] / rate, 3),
+                'text': text
+            }
+            for segment, text in zip(segments, texts)
+        ]
+    }
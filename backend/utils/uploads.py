@@ -0,0 +1,171 @@
+import os
+import struct
+import logging
+import tempfile
+from typing import Optional
+
+from flask import Request, current_app
+from werkzeug.exceptions import UnsupportedMediaType
+
+logger = logging.getLogger(__name__)
+
+# Bytes held back from an upload until its format is known
+HEADER_BYTES = 64
+
+# WAV format tags the STT service decodes: PCM, IEEE float, A-law, mu-law, extensible
+WAV_FORMAT_TAGS = {1, 3, 6, 7, 0xFFFE}
+
+
+def identify_audio(header: bytes) -> str:
+    """
+    Name the audio container the first bytes of a file belong to ('wav',
+    'flac', 'ogg', 'mp3', 'aac', 'webm' or 'mp4'). Raises
+    UnsupportedMediaType for anything else, and for WAV headers whose format
+    chunk could not be decoded.
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        check_wav_header(header)
+        return 'wav'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[:4] == b'OggS':
+        return 'ogg'
+    if header[:3] == b'ID3':
+        return 'mp3'
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        # MPEG frame sync; layer bits 00 mark an ADTS AAC stream
+        return 'aac' if header[1] & 0x06 == 0 else 'mp3'
+    if header[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    raise UnsupportedMediaType('Upload is not a supported audio file')
+
+
+def check_wav_header(header: bytes):
+    """
+    Validate the ``fmt `` chunk when it directly follows the RIFF header, as
+    it does in files written by browsers and recorders. Files with other
+    chunks first are left to the STT service.
+    """
+    if header[12:16] != b'fmt ':
+        return
+    if len(header) < 36:
+        raise UnsupportedMediaType('WAV header is truncated')
+    size, tag, channels, sample_rate, byte_rate, block_align, bits = struct.unpack('<IHHIIHH', header[16:36])
+    if size < 16:
+        raise UnsupportedMediaType('WAV format chunk is truncated')
+    if tag not in WAV_FORMAT_TAGS:
+        raise UnsupportedMediaType(f'Unsupported WAV sample format {tag:#06x}')
+    if not 1 <= channels <= 32 or not 1 <= sample_rate <= 768000 or block_align == 0 or bits == 0:
+        raise UnsupportedMediaType('WAV header has invalid parameters')
+
+
+class AudioUpload:
+    """
+    Upload container that checks an audio file's header before storing it.
+
+    The multipart parser writes the file part into this object as it reads
+    the request body. The first HEADER_BYTES are held in memory and passed
+    to identify_audio; only then is a temporary file (named after the
+    format) created. A file that is not audio raises 415 from the parser, so
+    the rest of the body is never read or written to disk.
+    """
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+        self.format = None
+        self.name = None  # path of the temporary file once created
+        self._head = bytearray()
+        self._file = None
+
+    def write(self, data: bytes) -> int:
+        if self._file is not None:
+            return self._file.write(data)
+        self._head += data
+        if len(self._head) >= HEADER_BYTES:
+            self._open()
+        return len(data)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # The parser rewinds the container once the part is complete, which
+        # is when a file shorter than HEADER_BYTES gets checked
+        if self._file is None:
+            self._open()
+        return self._file.seek(offset, whence)
+
+    def __getattr__(self, name):
+        # read, readline, tell, flush... once the temporary file exists
+        file = self.__dict__.get('_file')
+        if file is None:
+            raise AttributeError(name)
+        return getattr(file, name)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self):
+        """Close and delete the temporary file"""
+        self.close()
+        if self.name is not None:
+            try:
+                os.remove(self.name)
+            except FileNotFoundError:
+                pass
+
+    def _open(self):
+        head, self._head = bytes(self._head), None
+        if not head:
+            raise UnsupportedMediaType('Uploaded file is empty')
+        try:
+            self.format = identify_audio(head[:HEADER_BYTES])
+        except UnsupportedMediaType as e:
+            logger.info(f"Rejected upload {self.filename}: {e.description}")
+            raise
+        self._file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{self.format}')
+        self.name = self._file.name
+        self._file.write(head)
+
+
+def accepts_upload(upload_class):
+    """
+    Mark a view as storing its file uploads in ``upload_class`` containers
+    (e.g. AudioUpload) instead of werkzeug's spooled temporary files
+    """
+    def decorator(f):
+        f.upload_class = upload_class
+        return f
+    return decorator
+
+
+class BoundedRequest(Request):
+    """
+    Request whose body limit is chosen per endpoint (BODY_LIMITS, falling
+    back to MAX_CONTENT_LENGTH). Werkzeug rejects a larger Content-Length
+    before reading anything and stops a chunked body once it passes the
+    limit. File parts of views marked with accepts_upload are written into
+    their upload class, and deleted when the request is closed.
+    """
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        if not current_app:
+            return None
+        config = current_app.config
+        return config['BODY_LIMITS'].get(self.endpoint, config['MAX_CONTENT_LENGTH'])
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint) if current_app else None
+        upload_class = getattr(view, 'upload_class', None)
+        # A part without a filename is an empty file input, which the view rejects itself
+        if upload_class is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        upload = upload_class(filename)
+        self.__dict__.setdefault('_uploads', []).append(upload)
+        return upload
+
+    def close(self):
+        super().close()
+        for upload in self.__dict__.get('_uploads', ()):
+            upload.discard()
@@ -0,0 +1,119 @@
+import wave
+import logging
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, long recordings are sent whole without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+# Silence is judged against the quiet end of the recording, never below this
+MIN_THRESHOLD_DB = -60.0
+
+
+def read_wav(path: str) -> Optional[Dict]:
+    """
+    Read a PCM WAV file into its parameters and raw frame bytes, or None
+    when the file is not a WAV the ``wave`` module can read
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            params = wav.getparams()
+            frames = wav.readframes(params.nframes)
+    except (wave.Error, EOFError) as e:
+        logger.info(f"Not segmenting {path}: {e}")
+        return None
+    if params.sampwidth not in (1, 2, 4):
+        return None
+    return {'params': params, 'frames': frames}
+
+
+def frame_energy_db(audio: Dict, frame_ms: int = FRAME_MS):
+    """
+    Energy in dBFS of each ``frame_ms`` frame of the audio, channels mixed down
+    """
+    params = audio['params']
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[params.sampwidth]
+    samples = np.frombuffer(audio['frames'], dtype=dtype).astype(np.float32)
+    if params.sampwidth == 1:
+        samples -= 128.0  # 8-bit WAV is unsigned
+    samples /= float(2 ** (8 * params.sampwidth - 1))
+    samples = samples.reshape(-1, params.nchannels).mean(axis=1)
+
+    frame_len = max(1, params.framerate * frame_ms // 1000)
+    count = len(samples) // frame_len
+    frames = samples[:count * frame_len].reshape(count, frame_len)
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+def speech_frames(energy_db, margin_db: float = 12.0):
+    """
+    Frames louder than the recording's noise floor (its 10th percentile
+    frame energy) by more than ``margin_db``
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(float(np.percentile(energy_db, 10)) + margin_db, MIN_THRESHOLD_DB)
+    return energy_db > threshold
+
+
+def split_on_silence(audio: Dict, target_seconds: float = 30.0, max_seconds: float = 60.0,
+                     min_silence_ms: int = 300, margin_db: float = 12.0) -> List[Dict]:
+    """
+    Split the audio into segments of about ``target_seconds``, cutting in the
+    middle of silences of at least ``min_silence_ms``. Audio with no such
+    silence is split hard every ``max_seconds``. Segments without any
+    speech are dropped. Returns ``{'start', 'end'}`` dicts in frames
+    (samples per channel), in order.
+    """
+    params = audio['params']
+    energy = frame_energy_db(audio)
+    speech = speech_frames(energy, margin_db)
+    total = params.nframes
+    frame_len = max(1, params.framerate * FRAME_MS // 1000)
+    if not speech.any():
+        return []
+
+    # Runs of silent frames: starts where speech turns off, ends where it turns on
+    edges = np.diff(np.concatenate(([True], speech, [True])).astype(np.int8))
+    run_starts = np.flatnonzero(edges == -1)
+    run_ends = np.flatnonzero(edges == 1)
+    long_enough = (run_ends - run_starts) * FRAME_MS >= min_silence_ms
+    cuts = ((run_starts[long_enough] + run_ends[long_enough]) // 2) * frame_len
+
+    target = int(target_seconds * params.framerate)
+    limit = int(max_seconds * params.framerate)
+    boundaries = [0]
+    while total - boundaries[-1] > target:
+        start = boundaries[-1]
+        # Leave at least half a target for the last segment
+        lo, hi = np.searchsorted(cuts, [start, min(start + limit, total - target // 2)], side='right')
+        candidates = cuts[lo:hi]
+        if len(candidates):
+            cut = int(candidates[np.argmin(np.abs(candidates - (start + target)))])
+        elif total - start > limit:
+            cut = start + limit
+        else:
+            break
+        boundaries.append(cut)
+    boundaries.append(total)
+
+    segments = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        if speech[start // frame_len:-(-end // frame_len)].any():
+            segments.append({'start': start, 'end': end})
+    return segments
+
+
+def write_segment(audio: Dict, segment: Dict, path: str):
+    """Write one segment as a WAV file with the source's parameters"""
+    params = audio['params']
+    frame_size = params.sampwidth * params.nchannels
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(params.nchannels)
+        wav.setsampwidth(params.sampwidth)
+        wav.setframerate(params.framerate)
+        wav.writeframes(audio['frames'][segment['start'] * frame_size:segment['end'] * frame_size])
@@ -14,6 +14,7 @@ export const API_ENDPOINTS = {
     ACTIVE_ROOMS: '/livekit/active-rooms',
     ROOM_INFO: (roomName: string) => `/livekit/room/${roomName}/info`,
     DELETE_ROOM: (roomId: string) => `/livekit/room/${roomId}`,
+    EVENTS: '/livekit/events',
   },
   HEALTH: '/health',
 } as const;
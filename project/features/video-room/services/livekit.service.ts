@@ -6,17 +6,15 @@ export class LiveKitService {
   async createRoom(data: CreateRoomData): Promise<Room> {
     console.log('🎥 Creating LiveKit room with data:', data);
     
-    const response = await apiService.post<any>(API_ENDPOINTS.LIVEKIT.CREATE_ROOM, {
-      ...data,
-      serverUrl: API_CONFIG.LIVEKIT_URL
-    });
+    const response = await apiService.post<any>(API_ENDPOINTS.LIVEKIT.CREATE_ROOM, data);
 
     if (response.success && response.room) {
       console.log('✅ Room created successfully:', response.room);
       
+      // With several LiveKit servers each room lives on its own one
       return {
         ...response.room,
-        serverUrl: API_CONFIG.LIVEKIT_URL
+        serverUrl: response.room.serverUrl || API_CONFIG.LIVEKIT_URL
       };
     } else {
       throw new Error(response.error || 'Failed to create room - invalid response');
@@ -35,7 +33,7 @@ export class LiveKitService {
         ...response,
         room: {
           ...response.room,
-          serverUrl: API_CONFIG.LIVEKIT_URL
+          serverUrl: response.room?.serverUrl || API_CONFIG.LIVEKIT_URL
         }
       };
     } else {